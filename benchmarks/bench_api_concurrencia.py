@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import base_temporal
+
+# Base y bar_store temporales si no se configuraron (el benchmark escribe en la base)
+base_temporal("bench_api")
+
+import httpx
+import uvicorn
+from src.main import app
+from src.models import SessionLocal, init_db, StockList, RSI_1D
+from src.core import polygon_async
+
+PUERTO = int(os.getenv("BENCH_PORT", 8765))
+LATENCIA_POLYGON = float(os.getenv("BENCH_LATENCIA", 0.02))
+
+def velas_sinteticas(symbol, barras=300):
+    rng = np.random.default_rng(abs(hash(symbol)) % (2 ** 32))
+    close = 50 * np.exp(np.cumsum(rng.normal(-0.002, 0.025, barras)))
+    return pd.DataFrame({
+        "datetime": pd.bdate_range(end="2025-06-30", periods=barras, tz="UTC"),
+        "open": close, "high": close, "low": close, "close": close,
+        "volume": rng.integers(1_000, 5_000_000, barras).astype(float),
+    })
+
+async def descarga_simulada(client, stock, intervalo, fecha_inicio, fecha_fin, permitir_vacio=False):
+    # Sin red: latencia fija de Polygon + velas sintéticas
+    await asyncio.sleep(LATENCIA_POLYGON)
+    return velas_sinteticas(stock)
+
+def preparar_base(n_symbols):
+    init_db()
+    db = SessionLocal()
+    try:
+        db.query(StockList).delete()
+        db.query(RSI_1D).delete()
+        db.add_all(StockList(symbol=f"SYM{i:05d}") for i in range(n_symbols))
+        db.add_all(RSI_1D(symbol=f"SYM{i:05d}", rsi_value=25.0) for i in range(0, n_symbols, 5))
+        db.commit()
+    finally:
+        db.close()
+
+def latencias(cliente, n, mientras=None):
+    """Latencias de GET /api/data; con `mientras` solo cuenta las medidas con el evento sin setear."""
+    tiempos = []
+    for _ in range(n):
+        if mientras is not None and mientras.is_set():
+            break
+        inicio = time.perf_counter()
+        r = cliente.get("/api/data")
+        assert r.status_code == 200, r.text
+        tiempos.append(time.perf_counter() - inicio)
+    return np.array(tiempos) * 1000
+
+def resumen(nombre, ms):
+    print(f"{nombre:<22} {len(ms):>6} {np.percentile(ms, 50):>8.1f} {np.percentile(ms, 95):>8.1f} {ms.max():>8.1f}")
+
+def main():
+    n = int(os.getenv("BENCH_SYMBOLS", 500))
+    polygon_async._descargar_velas_async = descarga_simulada
+    preparar_base(n)
+
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PUERTO, log_level="warning"))
+    hilo = threading.Thread(target=servidor.run, daemon=True)
+    hilo.start()
+    while not servidor.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{PUERTO}"
+    try:
+        with httpx.Client(base_url=base, timeout=120) as cliente:
+            print(f"{n} símbolos, latencia simulada de Polygon {LATENCIA_POLYGON * 1000:.0f} ms")
+            print(f"{'GET /api/data':<22} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+            reposo = latencias(cliente, 50)
+            resumen("en reposo", reposo)
+
+            # El scan corre como job; se mide /api/data hasta que termina
+            termino = threading.Event()
+            respuesta = {}
+            def scan():
+                with httpx.Client(base_url=base, timeout=60) as c:
+                    inicio = time.perf_counter()
+                    r = c.post("/scan-rsi")
+                    assert r.status_code == 202, r.text
+                    respuesta["encolado_ms"] = (time.perf_counter() - inicio) * 1000
+                    while True:
+                        job = c.get(f"/api/jobs/{r.json()['job_id']}").json()
+                        if job["estado"] in ("completado", "error"):
+                            break
+                        time.sleep(0.2)
+                    respuesta["job"] = job
+                    respuesta["segundos"] = time.perf_counter() - inicio
+                termino.set()
+            threading.Thread(target=scan).start()
+            time.sleep(0.2)
+            durante = latencias(cliente, 100_000, mientras=termino)
+            termino.wait()
+
+            assert respuesta["job"]["estado"] == "completado", respuesta["job"]
+            assert len(durante) >= 10, "el scan terminó antes de poder medir"
+            resumen("durante /scan-rsi", durante)
+            print(f"/scan-rsi respondió en {respuesta['encolado_ms']:.0f} ms; el job tardó {respuesta['segundos']:.2f}s")
+            print(respuesta["job"]["mensaje"])
+
+            # Con el loop bloqueado, /api/data esperaría al scan entero
+            limite = max(10 * np.percentile(reposo, 95), 250)
+            assert np.percentile(durante, 95) < limite, "la latencia de /api/data no se mantuvo durante el scan"
+    finally:
+        servidor.should_exit = True
+        hilo.join()
+
+if __name__ == "__main__":
+    main()
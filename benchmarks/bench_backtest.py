@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import universo_sintetico, a_largo
+from src.core.indicators import hma, calcular_rsi
+from src.core.panel import Panel
+from src.core.backtest import backtest_cruce_hma, backtest_rsi, barrer
+
+# Backtest vectorizado (src/core/backtest.py) sobre un universo sintético de BENCH_SYMBOLS
+# símbolos x BENCH_BARRAS velas 1D (~5 años): mide la grilla de parámetros completa y compara
+# las operaciones contra un recorrido vela a vela por símbolo en un subconjunto.
+
+SYMBOLS = int(os.getenv("BENCH_SYMBOLS", 1000))
+BARRAS = int(os.getenv("BENCH_BARRAS", 1260))
+VERIFICAR = int(os.getenv("BENCH_VERIFICAR", 40))
+GRILLA_HMA_A = (5, 10, 15, 20)
+GRILLA_HMA_B = (20, 30, 50, 90)
+GRILLA_LIMITES = (20, 25, 30, 35)
+
+def _operacion(close, entrada, salida, abierta):
+    tramo = close[entrada:salida + 1]
+    minimo = int(np.argmin(tramo))
+    return (entrada, salida, abierta, round(close[salida] / close[entrada] - 1, 12), tramo[minimo], len(tramo) - 1 - minimo)
+
+def referencia(close, en_posicion, entra):
+    """Recorrido vela a vela: entra cuando entra(i) y sale en la primera vela sin en_posicion(i)."""
+    operaciones = []
+    entrada = None
+    for i in range(len(close)):
+        if entrada is None:
+            if entra(i):
+                entrada = i
+        elif not en_posicion(i):
+            operaciones.append(_operacion(close, entrada, i, False))
+            entrada = None
+    if entrada is not None:
+        operaciones.append(_operacion(close, entrada, len(close) - 1, True))
+    return operaciones
+
+def referencia_hma(close, hma_a, hma_b):
+    s = pd.Series(close)
+    a, b = hma(s, hma_a).to_numpy(), hma(s, hma_b).to_numpy()
+    alcista = lambda i: not np.isnan(a[i]) and not np.isnan(b[i]) and a[i] >= b[i]
+    return referencia(close, alcista, lambda i: i > 0 and alcista(i) and not np.isnan(a[i - 1]) and not np.isnan(b[i - 1]) and not alcista(i - 1))
+
+def referencia_rsi(close, limite, rsi_salida):
+    rsi = calcular_rsi(pd.DataFrame({"close": close})).to_numpy()
+    return referencia(close, lambda i: not rsi[i] >= rsi_salida, lambda i: i >= 19 and rsi[i] <= limite)
+
+def comparar(panel, ops, funcion, *args):
+    for fila, symbol in enumerate(panel.symbols[:VERIFICAR]):
+        n = int(panel.conteos[fila])
+        close = panel.close[fila, -n:]
+        esperado = funcion(close, *args)
+        propias = ops[ops["symbol"] == symbol]
+        vela = {t: j for j, t in enumerate(panel.t[fila, -n:].tolist())}
+        obtenido = [
+            (vela[op.entrada.value], vela[op.salida.value], bool(op.abierta), round(op.retorno / 100, 12), op.min_price, int(op.candles_since_min))
+            for op in propias.itertuples()
+        ]
+        assert len(esperado) == len(obtenido), f"{symbol}: {len(obtenido)} operaciones, se esperaban {len(esperado)}"
+        for e, o in zip(esperado, obtenido):
+            assert e[:3] == o[:3] and e[5] == o[5] and abs(e[3] - o[3]) < 1e-9 and e[4] == o[4], f"{symbol}: {o} != {e}"
+
+def main():
+    # Formato largo, con listados recientes de al menos 60 velas
+    largo = a_largo(universo_sintetico(SYMBOLS, BARRAS, seed=11, deriva=0.0002, min_barras=60))
+    inicio = time.perf_counter()
+    panel = Panel.desde_largo(largo)
+    t_panel = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    grilla = barrer(panel, GRILLA_HMA_A, GRILLA_HMA_B, GRILLA_LIMITES)
+    t_grilla = time.perf_counter() - inicio
+    print(f"{SYMBOLS} símbolos x {BARRAS} velas: panel en {t_panel:.2f}s, grilla de {len(grilla)} combinaciones en {t_grilla:.2f}s "
+          f"({t_grilla / len(grilla) * 1000:.0f} ms por combinación)")
+    print(grilla[["regla", "hma_a", "hma_b", "limite", "operaciones", "ganadoras", "retorno_medio", "drawdown_medio"]].round(2).to_string(index=False))
+
+    # Operaciones iguales al recorrido vela a vela en los primeros VERIFICAR símbolos
+    inicio = time.perf_counter()
+    comparar(panel, backtest_cruce_hma(panel, 10, 20), referencia_hma, 10, 20)
+    comparar(panel, backtest_cruce_hma(panel, 15, 90), referencia_hma, 15, 90)
+    comparar(panel, backtest_rsi(panel, 30, 50), referencia_rsi, 30, 50)
+    t_ref = time.perf_counter() - inicio
+    print(f"Operaciones iguales al recorrido vela a vela en {VERIFICAR} símbolos (3 configuraciones, {t_ref:.1f}s)")
+
+    assert t_grilla < 60, "la grilla tardó más de un minuto"
+    print("✅ Grilla completa sobre el universo en menos de un minuto")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import sys
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import base_temporal
+
+# Base temporal si no se configuró (el chequeo escribe en la base)
+base_temporal("bench_delta")
+
+from fastapi.testclient import TestClient
+from src.main import app
+from src.models import SessionLocal, engine, init_db, purgar_tombstones, RSI_1D, TableVersion, FilaBorrada
+
+# Chequeo del delta-sync (?since=) de /api/data: sellar_cambios (updated_version y tombstones
+# en cada commit), listados.delta y purgar_tombstones. Cada paso hace un commit y compara lo
+# que ve un cliente que venía de la versión anterior.
+
+def commit(funcion):
+    db = SessionLocal()
+    try:
+        funcion(db)
+        db.commit()
+    finally:
+        db.close()
+
+def version(cliente):
+    return int(cliente.get("/api/data").headers["X-Version"])
+
+def pedir_delta(cliente, since):
+    r = cliente.get("/api/data", params={"since": since})
+    assert r.status_code == 200, r.text
+    datos = r.json()
+    return {fila[0] for fila in datos["filas"]}, set(datos["borrados"]), datos["reset"], datos["version"]
+
+def esperar(nombre, obtenido, filas=(), borrados=(), reset=False):
+    esperado = (set(filas), set(borrados), reset)
+    assert obtenido[:3] == esperado, f"{nombre}: {obtenido[:3]} != {esperado}"
+    print(f"✅ {nombre}: filas={sorted(filas)} borrados={sorted(borrados)} reset={reset}")
+
+def main():
+    init_db()
+    with engine.begin() as conexion:
+        for modelo in (FilaBorrada, TableVersion, RSI_1D):
+            conexion.execute(modelo.__table__.delete())
+    cliente = TestClient(app)
+
+    commit(lambda db: db.add_all([RSI_1D(symbol="AAA", rsi_value=20.0), RSI_1D(symbol="BBB", rsi_value=25.0)]))
+    v_inicio = version(cliente)
+    esperar("sin cambios", pedir_delta(cliente, v_inicio))
+    esperar("desde 0", pedir_delta(cliente, 0), filas=["AAA", "BBB"])
+
+    commit(lambda db: db.add(RSI_1D(symbol="CCC", rsi_value=30.0)))
+    esperar("insert", pedir_delta(cliente, v_inicio), filas=["CCC"])
+    v_insert = version(cliente)
+
+    def actualizar(valor):
+        def cambiar(db):
+            db.query(RSI_1D).filter(RSI_1D.symbol == "AAA").one().rsi_value = valor
+        return cambiar
+    commit(actualizar(21.0))
+    esperar("update", pedir_delta(cliente, v_insert), filas=["AAA"])
+    esperar("insert + update", pedir_delta(cliente, v_inicio), filas=["AAA", "CCC"])
+    v_update = version(cliente)
+
+    commit(lambda db: db.delete(db.query(RSI_1D).filter(RSI_1D.symbol == "BBB").one()))
+    esperar("delete", pedir_delta(cliente, v_update), borrados=["BBB"])
+    v_delete = version(cliente)
+
+    commit(lambda db: db.add(RSI_1D(symbol="BBB", rsi_value=26.0)))
+    esperar("re-insert después del delete", pedir_delta(cliente, v_update), filas=["BBB"])
+    esperar("re-insert", pedir_delta(cliente, v_delete), filas=["BBB"])
+    v_reinsert = version(cliente)
+
+    # La misma versión con su ETag: 304
+    r = cliente.get("/api/data", params={"since": v_reinsert})
+    assert cliente.get("/api/data", params={"since": v_reinsert}, headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+    esperar("since futuro", pedir_delta(cliente, v_reinsert + 10), reset=True)
+
+    # UPDATE masivo: no se sabe qué filas tocó, el cliente recarga la tabla
+    commit(lambda db: db.query(RSI_1D).update({RSI_1D.variation: 0.0}))
+    esperar("update masivo", pedir_delta(cliente, v_reinsert), reset=True)
+    v_masivo = version(cliente)
+    commit(actualizar(22.0))
+    esperar("después del masivo", pedir_delta(cliente, v_masivo), filas=["AAA"])
+
+    # Tombstones purgados: un since anterior ya no puede saber qué se borró
+    commit(lambda db: db.delete(db.query(RSI_1D).filter(RSI_1D.symbol == "CCC").one()))
+    v_purga = version(cliente)
+    purgados = []
+    commit(lambda db: purgados.append(purgar_tombstones(db, dias=0)))
+    assert purgados[0] >= 2, purgados
+    esperar("since purgado", pedir_delta(cliente, v_delete), reset=True)
+    esperar("since en el límite de la purga", pedir_delta(cliente, v_purga))
+    commit(lambda db: db.delete(db.query(RSI_1D).filter(RSI_1D.symbol == "AAA").one()))
+    esperar("delete después de la purga", pedir_delta(cliente, v_purga), borrados=["AAA"])
+    print("✅ Delta-sync OK")
+
+if __name__ == "__main__":
+    main()
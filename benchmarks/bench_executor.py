@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import universo_sintetico
+from src.core.executor import mapear_velas, cpus_disponibles
+from src.core.regla_rsi_1d import tarea_rsi_1d
+
+def fuente(historias):
+    # Mismo formato que iterar_velas_1d, sin red
+    for symbol, df in historias.items():
+        yield symbol, {"1D": df}, None
+
+def correr(historias, workers):
+    filas = {}
+    for symbol, resultado, error in mapear_velas(fuente(historias), tarea_rsi_1d, workers=workers):
+        assert error is None, f"{symbol}: {error}"
+        _, fila = resultado
+        if fila:
+            fila.pop("timestamp")
+            fila.pop("entry_date")
+            filas[symbol] = fila
+    return filas
+
+def main():
+    n = int(os.getenv("BENCH_SYMBOLS", 5000))
+    historias = universo_sintetico(n, seed=11, deriva=-0.002, volatilidad=0.025, min_barras=300)
+    print(f"{n} símbolos x 300 velas | CPUs disponibles: {cpus_disponibles()}")
+    print(f"{'workers':>8} {'tiempo':>9} {'símbolos/s':>11} {'speedup':>8} {'filas':>6}")
+
+    referencia, t_base = None, None
+    for workers in (1, 2, 4, 8):
+        inicio = time.perf_counter()
+        filas = correr(historias, workers)
+        transcurrido = time.perf_counter() - inicio
+        if referencia is None:
+            referencia, t_base = filas, transcurrido
+        assert filas == referencia, f"resultados distintos con {workers} workers"
+        print(f"{workers:>8} {transcurrido:>8.2f}s {n / transcurrido:>11.0f} {t_base / transcurrido:>7.2f}x {len(filas):>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import random
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import base_temporal
+
+# Base temporal si no se configuró (el benchmark escribe en favorites)
+base_temporal("bench_favoritos")
+
+from sqlalchemy import insert
+from src.models import SessionLocal, engine, init_db, Favorite
+from src.core import polygon_client
+from src.reglas_favoritos import evaluate_rules
+
+# Evaluación de alertas de favoritos (alert_favoritos_cronjob) con BENCH_FAVORITOS favoritos:
+# el snapshot se simula con latencia fija por request; el resto (comparación y UPDATE) es real.
+
+FAVORITOS = int(os.getenv("BENCH_FAVORITOS", 1000))
+LATENCIA_POLYGON = float(os.getenv("BENCH_LATENCIA", 0.05))
+LIMITE_SEGUNDOS = float(os.getenv("BENCH_LIMITE", 1.0))
+
+requests_snapshot = []
+
+class RespuestaSimulada:
+    def __init__(self, datos):
+        self._datos = datos
+
+    def json(self):
+        return self._datos
+
+def get_simulado(url, params):
+    # Sin red: un request del snapshot multi-ticker con precios deterministas
+    requests_snapshot.append(url)
+    time.sleep(LATENCIA_POLYGON)
+    tickers = params["tickers"].split(",")
+    return RespuestaSimulada({"tickers": [
+        {"ticker": t, "lastTrade": {"p": round(random.Random(t).uniform(1, 500), 2), "t": time.time_ns()}} for t in tickers
+    ]})
+
+def poblar():
+    init_db()
+    rng = random.Random(11)
+    with engine.begin() as conexion:
+        conexion.execute(Favorite.__table__.delete())
+        conexion.execute(insert(Favorite), [{
+            "symbol": f"F{n:05d}", "current_value": 0.0, "alert_value": rng.uniform(1, 500),
+            "alert_direction": rng.choice(["encima", "debajo"]),
+        } for n in range(FAVORITOS)])
+
+def main():
+    polygon_client._get = get_simulado
+    poblar()
+
+    salida = sys.stdout
+    inicio = time.perf_counter()
+    # Los prints por favorito van a /dev/null para medir solo la evaluación
+    with open(os.devnull, "w") as nulo:
+        sys.stdout = nulo
+        try:
+            mensajes = evaluate_rules()
+        finally:
+            sys.stdout = salida
+    segundos = time.perf_counter() - inicio
+
+    db = SessionLocal()
+    try:
+        favoritos = db.query(Favorite).all()
+    finally:
+        db.close()
+    esperadas = 0
+    for fav in favoritos:
+        precio = round(random.Random(fav.symbol).uniform(1, 500), 2)
+        assert fav.current_value == precio, (fav.symbol, fav.current_value, precio)
+        esperadas += (precio >= fav.alert_value) if fav.alert_direction == "encima" else (precio < fav.alert_value)
+    assert len(mensajes) == esperadas, (len(mensajes), esperadas)
+
+    print(f"{FAVORITOS} favoritos, latencia simulada del snapshot {LATENCIA_POLYGON * 1000:.0f} ms")
+    print(f"{len(requests_snapshot)} requests al snapshot, {len(mensajes)} alertas, {segundos:.3f}s")
+    assert segundos < LIMITE_SEGUNDOS, f"la evaluación tardó más de {LIMITE_SEGUNDOS}s"
+    print(f"✅ Evaluación de favoritos en menos de {LIMITE_SEGUNDOS}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import math
+import time
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src.core.indicators import hma
+
+def hma_rolling_apply(series, length):
+    """
+    Implementación anterior (rolling.apply con lambda), usada como referencia.
+    """
+    def wma(s, l):
+        l = int(l)
+        weights = np.arange(1, l + 1)
+        return s.rolling(l).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+
+    half_length = int(length / 2)
+    sqrt_length = int(math.floor(math.sqrt(length)))
+    diff = 2 * wma(series, half_length) - wma(series, length)
+    return wma(diff, sqrt_length)
+
+def serie_sintetica(n, seed=42):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    close[rng.integers(0, n, max(1, n // 100))] = np.nan  # huecos para validar el NaN
+    return pd.Series(close, name="close")
+
+def medir(fn, *args, repeticiones=5):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def main():
+    longitudes = [5, 9, 10, 20, 90]
+    print(f"{'barras':>7} {'len':>4} {'rolling.apply':>14} {'convolución':>12} {'speedup':>8}")
+    for n in (300, 5000):
+        serie = serie_sintetica(n)
+        for length in longitudes:
+            esperado = hma_rolling_apply(serie, length)
+            obtenido = hma(serie, length)
+            assert esperado.isna().equals(obtenido.isna()), f"warm-up NaN distinto (n={n}, len={length})"
+            assert np.allclose(esperado.dropna(), obtenido.dropna(), rtol=1e-12, atol=1e-9), \
+                f"valores distintos (n={n}, len={length})"
+
+            t_old = medir(hma_rolling_apply, serie, length)
+            t_new = medir(hma, serie, length)
+            print(f"{n:>7} {length:>4} {t_old * 1000:>12.2f}ms {t_new * 1000:>10.3f}ms {t_old / t_new:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import random
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src.core.regla_favoritos import IndiceAlertas
+
+# Costo por tick de IndiceAlertas contra recorrer todos los niveles (como el loop por favorito),
+# con BENCH_NIVELES alertas repartidas en BENCH_SYMBOLS símbolos. También verifica que ambos
+# disparen exactamente las mismas alertas.
+
+NIVELES = int(os.getenv("BENCH_NIVELES", 20_000))
+SYMBOLS = int(os.getenv("BENCH_SYMBOLS", 2_000))
+TICKS = int(os.getenv("BENCH_TICKS", 50_000))
+
+def disparadas_recorriendo(niveles, ultimos, symbol, precio):
+    # Referencia: revisa cada nivel y se queda con los cruzados desde el precio anterior
+    previo = ultimos.get(symbol)
+    ultimos[symbol] = precio
+    resultado = []
+    for s, valor, direccion in niveles:
+        if s != symbol:
+            continue
+        cumple = precio >= valor if direccion == "encima" else precio < valor
+        cumplia = previo is not None and (previo >= valor if direccion == "encima" else previo < valor)
+        if cumple and not cumplia:
+            resultado.append((direccion, valor))
+    return sorted(resultado)
+
+def main():
+    rng = random.Random(3)
+    symbols = [f"S{i:05d}" for i in range(SYMBOLS)]
+    niveles = [
+        (rng.choice(symbols), round(rng.uniform(90, 110), 2), rng.choice(["encima", "debajo"]))
+        for _ in range(NIVELES)
+    ]
+    # cargar acepta varios niveles por símbolo
+    indice = IndiceAlertas()
+    indice.cargar(niveles)
+
+    ticks = [(rng.choice(symbols), round(rng.uniform(85, 115), 2)) for _ in range(TICKS)]
+
+    # Verificación contra la referencia en una muestra (la referencia es lenta)
+    ultimos = {}
+    muestra = IndiceAlertas()
+    muestra.cargar(niveles)
+    for symbol, precio in ticks[:2_000]:
+        assert sorted(muestra.precio(symbol, precio)) == disparadas_recorriendo(niveles, ultimos, symbol, precio), symbol
+
+    inicio = time.perf_counter()
+    disparadas = 0
+    for symbol, precio in ticks:
+        disparadas += len(indice.precio(symbol, precio))
+    indice_us = (time.perf_counter() - inicio) / TICKS * 1e6
+
+    ultimos = {}
+    inicio = time.perf_counter()
+    for symbol, precio in ticks[:500]:
+        disparadas_recorriendo(niveles, ultimos, symbol, precio)
+    recorrido_us = (time.perf_counter() - inicio) / 500 * 1e6
+
+    print(f"{NIVELES} niveles en {SYMBOLS} símbolos, {TICKS} ticks ({disparadas} alertas disparadas)")
+    print(f"IndiceAlertas: {indice_us:.1f} µs/tick; recorriendo los niveles: {recorrido_us:.1f} µs/tick "
+          f"({recorrido_us / indice_us:.0f}x)")
+    assert indice_us < recorrido_us / 10, "el índice no es más rápido que recorrer los niveles"
+    print("✅ Mismas alertas que recorrer todos los niveles")
+
+if __name__ == "__main__":
+    main()
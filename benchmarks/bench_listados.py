@@ -0,0 +1,115 @@
+import os
+import sys
+import random
+import datetime
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import base_temporal
+
+# Base temporal si no se configuró (el chequeo escribe en la base)
+base_temporal("bench_listados")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from src.main import app, ORDENES_RSI_1D
+from src.models import SessionLocal, engine, init_db, RSI_1D, TableVersion, FilaBorrada
+
+# Chequeo de los listados de la API (src/listados.py) sobre /api/data con TestClient:
+# - recorrer todas las páginas por cursor da cada fila una vez y en el orden pedido, también
+#   con columnas con NULL y muchos empates (desempate por id);
+# - ETag / If-None-Match: 304 mientras la tabla no cambia, 200 con ETag nuevo después de un commit.
+
+FILAS = int(os.getenv("BENCH_FILAS", 1_000))
+LIMITE = int(os.getenv("BENCH_LIMITE", 97))
+
+def poblar():
+    init_db()
+    rng = random.Random(3)
+    inicio = datetime.datetime(2025, 1, 1)
+    with engine.begin() as conexion:
+        for modelo in (FilaBorrada, TableVersion, RSI_1D):
+            conexion.execute(modelo.__table__.delete())
+        conexion.execute(insert(RSI_1D), [{
+            "symbol": f"S{i:05d}",
+            # NULL en rsi_value y variation, y bloques de 10 filas con el mismo timestamp
+            "rsi_value": None if i % 7 == 0 else round(rng.uniform(10, 90), 1),
+            "variation": None if i % 5 == 0 else rng.choice([-1.5, 0.0, 2.5]),
+            "entry_date": inicio,
+            "timestamp": inicio + datetime.timedelta(minutes=i // 10),
+        } for i in range(FILAS)])
+
+def orden_esperado(orden):
+    """Símbolos en el orden de `orden`: NULL como el menor valor y desempate por id."""
+    descendente = orden.startswith("-")
+    columna = ORDENES_RSI_1D[orden.lstrip("-")]
+    db = SessionLocal()
+    try:
+        filas = db.query(RSI_1D.symbol, RSI_1D.id, columna).all()
+    finally:
+        db.close()
+    clave = lambda fila: (fila[2] is not None, fila[2] if fila[2] is not None else 0, fila[1])
+    return [fila[0] for fila in sorted(filas, key=clave, reverse=descendente)]
+
+def recorrer(cliente, orden):
+    symbols, cursor, paginas = [], None, 0
+    while True:
+        params = {"orden": orden, "limite": LIMITE}
+        if cursor:
+            params["cursor"] = cursor
+        r = cliente.get("/api/data", params=params)
+        assert r.status_code == 200, r.text
+        symbols.extend(fila[0] for fila in r.json())
+        paginas += 1
+        cursor = r.headers.get("X-Cursor-Siguiente")
+        if not cursor:
+            return symbols, paginas
+
+def chequear_paginas(cliente):
+    for orden in ("-timestamp", "timestamp", "rsi_value", "-rsi_value", "-variation", "symbol", "-id"):
+        obtenido, paginas = recorrer(cliente, orden)
+        assert len(obtenido) == len(set(obtenido)), f"{orden}: filas repetidas entre páginas"
+        assert obtenido == orden_esperado(orden), f"{orden}: orden o filas distintos a los esperados"
+        print(f"✅ orden={orden}: {len(obtenido)} filas en {paginas} páginas de {LIMITE}")
+
+    assert cliente.get("/api/data", params={"cursor": "no-es-un-cursor"}).status_code == 400
+    assert cliente.get("/api/data", params={"limite": 0}).status_code == 400
+    assert cliente.get("/api/data", params={"orden": "precio"}).status_code == 400
+    print("✅ cursor, límite y orden inválidos: 400")
+
+def chequear_etag(cliente):
+    r = cliente.get("/api/data")
+    etag = r.headers["ETag"]
+    assert r.status_code == 200 and r.json()
+
+    for valor in (etag, f"W/{etag}", f'"otro", {etag}', "*"):
+        r = cliente.get("/api/data", headers={"If-None-Match": valor})
+        assert r.status_code == 304 and not r.content, (valor, r.status_code)
+        assert r.headers["ETag"] == etag
+    # Otra página u otro orden es otro ETag
+    assert cliente.get("/api/data", params={"orden": "symbol"}, headers={"If-None-Match": etag}).status_code == 200
+    print("✅ If-None-Match con el ETag vigente: 304 sin cuerpo")
+
+    db = SessionLocal()
+    try:
+        fila = db.query(RSI_1D).filter(RSI_1D.symbol == "S00001").one()
+        fila.rsi_value = 12.3
+        db.commit()
+    finally:
+        db.close()
+    r = cliente.get("/api/data", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag, "el ETag no cambió después del commit"
+    assert int(r.headers["X-Version"]) >= 1
+    assert cliente.get("/api/data", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+    print(f"✅ después de un commit: 200 con ETag nuevo ({etag} -> {r.headers['ETag']})")
+
+def main():
+    poblar()
+    cliente = TestClient(app)
+    chequear_paginas(cliente)
+    chequear_etag(cliente)
+    print("✅ Listados OK")
+
+if __name__ == "__main__":
+    main()
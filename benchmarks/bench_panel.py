@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import datetime
+import numpy as np
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import universo_sintetico, a_largo
+from src.core.indicators import procesar_indicadores, promedio_variacion_3m
+from src.core.panel import Panel
+from src.core.regla_rsi_1d import estadisticas_desde_entrada
+
+COLUMNAS = ["RSI", "RSI_EMA_5", "hma_a", "hma_b", "rvol", "var"]
+
+def por_simbolo(historias):
+    resultados = {}
+    for symbol, df in historias.items():
+        proc = procesar_indicadores(df, columnas=COLUMNAS + ["promedio_variacion_3m"])
+        resultados[symbol] = (proc, promedio_variacion_3m(proc))
+    return resultados
+
+def en_panel(largo):
+    return Panel.desde_largo(largo).calcular(COLUMNAS + ["promedio_variacion_3m"])
+
+def verificar(historias, resultados, panel):
+    for i, symbol in enumerate(panel.symbols):
+        proc, prom = resultados[symbol]
+        n = len(proc)
+        for columna in COLUMNAS:
+            esperado = proc[columna].to_numpy()
+            obtenido = panel.columnas[columna][i, -n:]
+            assert np.array_equal(np.isnan(esperado), np.isnan(obtenido)), f"NaN distinto en {symbol}/{columna}"
+            assert np.allclose(esperado, obtenido, rtol=1e-9, atol=1e-9, equal_nan=True), f"{symbol}/{columna} distinto"
+        assert abs(prom - panel.promedio_variacion_3m[i]) < 1e-9, f"{symbol}/promedio_variacion_3m distinto"
+
+    # Estadísticas desde la entrada (existentes de RSI_1D)
+    filas = list(range(0, len(panel.symbols), 97))
+    entradas = [datetime.datetime(2025, 3, 1) + datetime.timedelta(days=3 * k) for k in range(len(filas))]
+    minimos, velas = panel.estadisticas_desde(filas, entradas)
+    for fila, entrada, minimo, n_velas in zip(filas, entradas, minimos, velas):
+        esperado = estadisticas_desde_entrada(historias[panel.symbols[fila]], entrada)
+        obtenido = (None, None) if np.isnan(minimo) else (float(minimo), int(n_velas))
+        assert esperado == obtenido, f"estadísticas distintas en {panel.symbols[fila]}"
+
+def main():
+    print(f"{'símbolos':>9} {'por símbolo':>12} {'panel':>10} {'speedup':>8}")
+    for n in (500, 5000):
+        historias = universo_sintetico(n, huecos=True)
+        # Formato largo, como lo entrega bar_store.leer_velas_largas en modo bulk
+        largo = a_largo(historias)
+
+        inicio = time.perf_counter()
+        resultados = por_simbolo(historias)
+        t_loop = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        panel = en_panel(largo)
+        t_panel = time.perf_counter() - inicio
+
+        verificar(historias, resultados, panel)
+        print(f"{n:>9} {t_loop:>11.2f}s {t_panel:>9.2f}s {t_loop / t_panel:>7.1f}x")
+
+        sobrevendidos = panel.top_k("RSI", 5)
+        print(f"          top 5 RSI: {', '.join(f'{s} ({v:.1f})' for s, v in sobrevendidos.items())}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import os
+import re
+import sys
+import time
+import random
+import datetime
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import base_temporal
+
+# Base temporal si no se configuró (con DATABASE_URL de Postgres se revisan sus planes)
+base_temporal("bench_planes")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, text
+from src.main import app
+from src.models import (
+    SessionLocal, engine, init_db, actualizar_por_simbolo, RSI_1D, StockTracking, Favorite, TableVersion, FilaBorrada,
+    TRACKING_ACTUALIZABLES,
+)
+
+# Revisa que cada endpoint de los dashboards resuelva sus consultas con índices sobre tablas
+# de BENCH_FILAS filas: captura el SQL que ejecuta cada request y corre EXPLAIN sobre él.
+# Antes de medir corre un ciclo de tracking (UPDATE de todos los seguidos), así los planes
+# son los de una tabla que los scans ya reescribieron.
+
+FILAS = int(os.getenv("BENCH_FILAS", 100_000))
+VERSION = 1000
+# Los cruces son raros: la mayoría de los seguidos está en tendencia
+ESTADOS = ["cruce_alcista", "alcista", "bajista", "cruce_bajista", None]
+PESOS_ESTADOS = [1, 45, 45, 1, 8]
+
+def poblar():
+    init_db()
+    rng = random.Random(7)
+    inicio = datetime.datetime(2025, 1, 1)
+    with engine.begin() as conexion:
+        for modelo in (FilaBorrada, TableVersion, Favorite, StockTracking, RSI_1D):
+            conexion.execute(modelo.__table__.delete())
+        for i in range(0, FILAS, 10_000):
+            rango = range(i, min(i + 10_000, FILAS))
+            conexion.execute(insert(RSI_1D), [{
+                "symbol": f"R{n:06d}", "rsi_value": rng.uniform(5, 60), "variation": rng.uniform(-9, 9),
+                "rvol_1": rng.random(), "rvol_2": rng.random(), "valor_actual": rng.uniform(1, 500),
+                "entry_date": inicio, "timestamp": inicio + datetime.timedelta(seconds=rng.randrange(10_000_000)),
+                "updated_version": rng.randrange(VERSION + 1),
+            } for n in rango])
+            conexion.execute(insert(StockTracking), [{
+                "symbol": f"T{n:06d}", "current_price": rng.uniform(1, 500), "rsi_value": rng.uniform(5, 60),
+                "hma_a": rng.uniform(1, 500), "hma_b": rng.uniform(1, 500), "estado": rng.choices(ESTADOS, PESOS_ESTADOS)[0],
+                "alert_alcista": rng.randrange(2), "alert_bajista": rng.randrange(2),
+                "timestamp": inicio, "updated_version": rng.randrange(VERSION + 1),
+            } for n in rango])
+            conexion.execute(insert(Favorite), [{
+                "symbol": f"F{n:06d}", "current_value": rng.uniform(1, 500), "alert_value": rng.uniform(1, 500),
+                "timestamp": inicio, "updated_version": rng.randrange(VERSION + 1),
+            } for n in rango])
+        conexion.execute(insert(TableVersion), [
+            {"tabla": tabla, "version": VERSION, "minima_delta": 0} for tabla in ("rsi_1d", "stock_tracking", "favorites")
+        ])
+        conexion.execute(insert(FilaBorrada), [
+            {"tabla": "stock_tracking", "symbol": f"X{n:06d}", "version": rng.randrange(VERSION + 1)} for n in range(5_000)
+        ])
+        for modelo in (RSI_1D, StockTracking, Favorite, FilaBorrada):
+            conexion.execute(text(f"ANALYZE {modelo.__tablename__}"))
+
+def ciclo_de_tracking(limite=None):
+    """
+    Una corrida de tracking como reglas_tracking: UPDATE por símbolo de TRACKING_ACTUALIZABLES
+    en todos los seguidos (o los primeros `limite`), con pocos cambios de estado. Sin ANALYZE
+    después, como en producción.
+    """
+    rng = random.Random(11)
+    ahora = datetime.datetime.utcnow()
+    db = SessionLocal()
+    try:
+        seguidos = db.query(StockTracking.symbol, StockTracking.estado).order_by(StockTracking.id).limit(limite).all()
+        filas = [{
+            "symbol": symbol, "current_price": rng.uniform(1, 500), "rsi_value": rng.uniform(5, 60),
+            "variation": rng.uniform(-9, 9), "rvol_1": rng.random(), "rvol_2": rng.random(),
+            "hma_a": rng.uniform(1, 500), "hma_b": rng.uniform(1, 500),
+            "estado": rng.choices(ESTADOS, PESOS_ESTADOS)[0] if rng.random() < 0.02 else estado,
+            "timestamp": ahora,
+        } for symbol, estado in seguidos]
+        assert set(filas[0]) == {"symbol", *TRACKING_ACTUALIZABLES}
+        inicio = time.perf_counter()
+        actualizar_por_simbolo(db, StockTracking, filas)
+        db.commit()
+        print(f"Ciclo de tracking: {len(filas)} filas actualizadas en {time.perf_counter() - inicio:.2f}s")
+    finally:
+        db.close()
+
+def planes(sentencias):
+    """[(sql, plan)] de las sentencias capturadas."""
+    postgres = engine.dialect.name == "postgresql"
+    resultado = []
+    conexion = engine.raw_connection()
+    try:
+        cursor = conexion.cursor()
+        for sql, parametros in sentencias:
+            if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            if postgres:
+                cursor.execute("EXPLAIN " + sql, parametros)
+                plan = [fila[0] for fila in cursor.fetchall()]
+            else:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, parametros)
+                plan = [fila[-1] for fila in cursor.fetchall()]
+            resultado.append((sql, plan))
+        conexion.rollback()
+    finally:
+        conexion.close()
+    return resultado
+
+def escaneo_completo(linea):
+    # SQLite: "SCAN tabla" sin índice; Postgres: Seq Scan
+    return bool(re.match(r"^\s*SCAN \w+\s*$", linea)) or "Seq Scan" in linea
+
+def recorrido_por_id(sql, plan):
+    # SQLite: "SCAN tabla" de una consulta ORDER BY tabla.id ... LIMIT sin ordenar aparte recorre
+    # la tabla en orden de rowid y corta en el LIMIT (no es un escaneo completo)
+    orden = re.search(r"ORDER BY (\w+)\.id (ASC|DESC)", sql)
+    return bool(orden) and " LIMIT " in sql and not any("TEMP B-TREE FOR ORDER BY" in linea for linea in plan) \
+        and any(re.match(rf"^\s*SCAN {orden.group(1)}\s*$", linea) for linea in plan)
+
+def main():
+    print(f"Poblando {FILAS} filas por tabla ({engine.dialect.name})...")
+    poblar()
+    ciclo_de_tracking()
+    # Y unos cambios después, para que ?since= desde el ciclo traiga filas
+    ciclo_de_tracking(limite=50)
+    cliente = TestClient(app)
+
+    capturadas = []
+    @event.listens_for(engine, "before_cursor_execute")
+    def capturar(conn, cursor, sql, parametros, context, executemany):
+        capturadas.append((sql, parametros))
+
+    def pedir(nombre, metodo, url, **kwargs):
+        capturadas.clear()
+        inicio = time.perf_counter()
+        r = cliente.request(metodo, url, **kwargs)
+        ms = (time.perf_counter() - inicio) * 1000
+        assert r.status_code == 200, (url, r.status_code, r.text)
+        return nombre, ms, r, list(capturadas)
+
+    casos = []
+    casos.append(pedir("/api/data (top 100)", "GET", "/api/data"))
+    cursor = casos[-1][2].headers["X-Cursor-Siguiente"]
+    casos.append(pedir("/api/data (página 2)", "GET", f"/api/data?cursor={cursor}"))
+    casos.append(pedir("/api/data?since", "GET", f"/api/data?since={VERSION - 5}"))
+    casos.append(pedir("/api/track_data (página 1)", "GET", "/api/track_data?limite=200"))
+    cursor = casos[-1][2].headers["X-Cursor-Siguiente"]
+    casos.append(pedir("/api/track_data (página 2)", "GET", f"/api/track_data?limite=200&cursor={cursor}"))
+    casos.append(pedir("/api/track_data (estado+alerta)", "GET", "/api/track_data?estado=cruce_alcista&alert_alcista=1&limite=200"))
+    casos.append(pedir("/api/track_data (estado+alertas)", "GET",
+                       "/api/track_data?estado=cruce_alcista&alert_alcista=1&alert_bajista=1&limite=200"))
+    # El ciclo de tracking cambió todos los seguidos: un cliente al día pide desde esa versión
+    casos.append(pedir("/api/track_data?since", "GET", f"/api/track_data?since={VERSION + 1}"))
+    casos.append(pedir("/api/favoritos_data (symbol)", "GET", "/api/favoritos_data?orden=symbol&limite=200"))
+    casos.append(pedir("/api/favoritos_data?since", "GET", f"/api/favoritos_data?since={VERSION - 5}"))
+    casos.append(pedir("toggle_alert (commit)", "POST", "/api/track/toggle_alert",
+                       json={"symbol": "T000123", "field": "alert_alcista", "value": False}))
+    event.remove(engine, "before_cursor_execute", capturar)
+
+    fallas = []
+    recorridos = []
+    for nombre, ms, _, sentencias in casos:
+        print(f"\n=== {nombre}: {ms:.1f} ms")
+        for sql, plan in planes(sentencias):
+            por_id = recorrido_por_id(sql, plan)
+            print("  " + " ".join(sql.split())[:110])
+            for linea in plan:
+                marca = "  "
+                if escaneo_completo(linea):
+                    marca = "↻ " if por_id else "❌"
+                    (recorridos if por_id else fallas).append((nombre, linea))
+                print(f"    {marca} {linea}")
+
+    print()
+    for nombre, linea in recorridos:
+        print(f"↻  {nombre}: {linea.strip()} en orden de id hasta el LIMIT")
+    if fallas:
+        for nombre, linea in fallas:
+            print(f"❌ {nombre}: {linea}")
+    assert not fallas, "hay consultas de endpoints que recorren la tabla completa"
+    print("✅ Todas las consultas de los endpoints usan índices")
+
+if __name__ == "__main__":
+    main()
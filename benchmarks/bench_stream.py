@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import base_temporal
+
+# Base temporal si no se configuró (el benchmark escribe en favorites y stock_tracking)
+base_temporal("bench_stream", STREAM_GUARDAR_CADA="0.5")
+
+from sqlalchemy import insert
+from src.models import SessionLocal, engine, init_db, Favorite, StockTracking, IndicadorEstado
+from src.core import regla_cruce_hma as modulo_hma
+from src.core.polygon_stream import StreamPolygon
+from src.script.servidor_stream_falso import ServidorFalso
+from websockets.asyncio.server import serve
+from src import alert_stream
+
+# Ingesta en vivo de punta a punta sin red: el servidor falso reproduce una sesión sintética
+# de BENCH_MINUTOS minutos y alert_stream aplica las reglas. Mide la latencia entre que el
+# servidor manda el minuto y la alerta queda lista, y compara con las reglas por polling:
+# - favoritos: los niveles cruzados según la grabación
+# - tracking: las métricas finales contra regla_cruce_hma con el historial completo
+
+PUERTO = int(os.getenv("BENCH_PORT", 8766))
+FAVORITOS = int(os.getenv("BENCH_FAVORITOS", 300))
+SEGUIDOS = int(os.getenv("BENCH_SEGUIDOS", 40))
+MINUTOS = int(os.getenv("BENCH_MINUTOS", 60))
+INTERVALO = float(os.getenv("BENCH_INTERVALO", 0.05))
+DIA = pd.Timestamp("2025-06-30 13:30", tz="UTC")
+
+def historia_1d(symbol):
+    # Bajada suave: hma_a < hma_b al cierre de ayer
+    rng = np.random.default_rng(abs(hash(symbol)) % (2 ** 32))
+    close = 100 * np.exp(np.cumsum(rng.normal(-0.004, 0.01, 300)))
+    return pd.DataFrame({
+        "datetime": pd.bdate_range(end=DIA.normalize() - pd.Timedelta(days=1), periods=300, tz="UTC"),
+        "open": close, "high": close, "low": close, "close": close,
+        "volume": rng.integers(100_000, 5_000_000, 300).astype(float),
+    })
+
+HISTORIAS = {}
+
+def velas_1d(symbol, intervalo, fecha_inicio=None, fecha_fin=None):
+    return HISTORIAS[symbol].copy()
+
+def sesion():
+    """Agregados AM sintéticos: favoritos con caminata aleatoria; la mitad de los seguidos salta en el minuto 2/3."""
+    rng = random.Random(5)
+    eventos = []
+    favoritos = [f"F{i:04d}" for i in range(FAVORITOS)]
+    seguidos = [f"T{i:04d}" for i in range(SEGUIDOS)]
+    precios = {symbol: 100.0 for symbol in favoritos}
+    for symbol in seguidos:
+        precios[symbol] = float(HISTORIAS[symbol]["close"].iloc[-1])
+    volumen = {symbol: 0.0 for symbol in precios}
+    for minuto in range(MINUTOS):
+        inicio = int((DIA + pd.Timedelta(minutes=minuto)).value // 1_000_000)
+        for symbol in favoritos:
+            precios[symbol] = round(precios[symbol] * (1 + rng.gauss(0, 0.004)), 2)
+        for i, symbol in enumerate(seguidos):
+            if i % 2 == 0 and minuto == MINUTOS * 2 // 3:
+                precios[symbol] = round(precios[symbol] * 1.25, 2)
+        for symbol, precio in precios.items():
+            volumen[symbol] += 10_000
+            eventos.append({"ev": "AM", "sym": symbol, "o": precio, "h": precio, "l": precio, "c": precio,
+                            "v": 10_000, "av": volumen[symbol], "s": inicio, "e": inicio + 60_000})
+    return favoritos, seguidos, eventos
+
+def poblar(favoritos, seguidos):
+    init_db()
+    rng = random.Random(9)
+    with engine.begin() as conexion:
+        for modelo in (Favorite, StockTracking, IndicadorEstado):
+            conexion.execute(modelo.__table__.delete())
+        conexion.execute(insert(Favorite), [{
+            "symbol": symbol, "alert_value": round(rng.uniform(97, 103), 2),
+            "alert_direction": rng.choice(["encima", "debajo"]),
+        } for symbol in favoritos])
+        conexion.execute(insert(StockTracking), [{"symbol": symbol, "estado": "cruce_bajista"} for symbol in seguidos])
+
+def favoritos_esperados(eventos):
+    # Referencia: niveles cruzados desde el minuto anterior (el primer minuto, los que ya cumplen)
+    db = SessionLocal()
+    try:
+        niveles = {f.symbol: (f.alert_value, f.alert_direction) for f in db.query(Favorite)}
+    finally:
+        db.close()
+    previos, esperadas = {}, []
+    for evento in eventos:
+        if evento["sym"] not in niveles:
+            continue
+        valor, direccion = niveles[evento["sym"]]
+        cumple = lambda p: p >= valor if direccion == "encima" else p < valor
+        previo = previos.get(evento["sym"])
+        if cumple(evento["c"]) and (previo is None or not cumple(previo)):
+            esperadas.append((evento["sym"], evento["s"]))
+        previos[evento["sym"]] = evento["c"]
+    return esperadas
+
+class ServidorMedido(ServidorFalso):
+    # Manda cada minuto serializado de antemano y guarda cuándo lo mandó
+    def __init__(self, eventos, intervalo):
+        super().__init__(eventos, intervalo=intervalo)
+        self.textos = [json.dumps(minuto) for minuto in self.minutos]
+        self.enviado = {}
+
+    async def _reproducir(self, ws, canales):
+        for minuto, texto in zip(self.minutos, self.textos):
+            self.enviado[minuto[0]["s"]] = time.perf_counter()
+            await ws.send(texto)
+            self.enviados += len(minuto)
+            await asyncio.sleep(self.intervalo)
+
+async def correr(eventos):
+    servidor = ServidorMedido(eventos, INTERVALO)
+    ingesta = alert_stream.IngestaEnVivo(StreamPolygon(url=f"ws://localhost:{PUERTO}", api_key="bench"))
+    alertas = {"favoritos": [], "tracking": []}
+    latencias = []
+    procesar = ingesta.procesar
+    def procesar_medido(evento):
+        mensajes_favoritos, mensajes_tracking = procesar(evento)
+        listo = time.perf_counter()
+        for clave, mensajes in (("favoritos", mensajes_favoritos), ("tracking", mensajes_tracking)):
+            for _ in mensajes:
+                alertas[clave].append((evento["sym"], evento["s"]))
+                latencias.append(listo - servidor.enviado[evento["s"]])
+        return mensajes_favoritos, mensajes_tracking
+    ingesta.procesar = procesar_medido
+
+    async with serve(servidor.atender, "localhost", PUERTO):
+        tarea = asyncio.create_task(ingesta.correr())
+        limite = time.monotonic() + MINUTOS * INTERVALO + 30
+        while ingesta.velas < len(eventos) and time.monotonic() < limite:
+            await asyncio.sleep(0.05)
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            pass
+    assert ingesta.velas == len(eventos), f"llegaron {ingesta.velas} de {len(eventos)} agregados"
+    return ingesta, alertas, np.array(latencias) * 1000
+
+def main():
+    # Sin red: historial 1D sintético y alertas sin POST
+    HISTORIAS.update({f"T{i:04d}": historia_1d(f"T{i:04d}") for i in range(SEGUIDOS)})
+    modulo_hma.obtener_velas_polygon = velas_1d
+    alert_stream.send_alert = lambda mensajes: None
+    alert_stream.send_tracking_alert = lambda mensajes: None
+
+    favoritos, seguidos, eventos = sesion()
+    poblar(favoritos, seguidos)
+    esperadas = favoritos_esperados(eventos)
+
+    inicio = time.perf_counter()
+    ingesta, alertas, latencias = asyncio.run(correr(eventos))
+    segundos = time.perf_counter() - inicio
+
+    print(f"{len(favoritos)} favoritos y {len(seguidos)} seguidos, {MINUTOS} minutos ({len(eventos)} agregados) en {segundos:.1f}s")
+    assert sorted(alertas["favoritos"]) == sorted(esperadas), "las alertas de favoritos no coinciden con la referencia"
+    print(f"Favoritos: {len(alertas['favoritos'])} alertas, iguales a la referencia")
+
+    # Tracking: métricas finales guardadas contra la regla con el historial completo
+    ultimos = {}
+    for evento in eventos:
+        ultimos[evento["sym"]] = (evento["c"], pd.Timestamp(evento["s"], unit="ms", tz="UTC").to_pydatetime())
+    db = SessionLocal()
+    try:
+        filas = {f.symbol: f for f in db.query(StockTracking)}
+        guardados = {f.symbol: f.current_value for f in db.query(Favorite)}
+    finally:
+        db.close()
+    cruzaron = set()
+    for symbol in seguidos:
+        referencia = modulo_hma.regla_cruce_hma(symbol, ultimos[symbol])
+        fila = filas[symbol]
+        for campo in ("current_price", "rsi_value", "variation", "hma_a", "hma_b", "estado"):
+            assert getattr(fila, campo) == referencia[campo], (symbol, campo, getattr(fila, campo), referencia[campo])
+        if referencia["estado"] == "cruce_alcista":
+            cruzaron.add(symbol)
+    assert {symbol for symbol, _ in alertas["tracking"]} == cruzaron, "los cruces avisados no coinciden"
+    assert all(guardados[symbol] == ultimos[symbol][0] for symbol in favoritos)
+    print(f"Tracking: {len(cruzaron)} cruces alcistas avisados; métricas iguales a regla_cruce_hma con historial completo")
+
+    print(f"Latencia minuto enviado -> alerta: p50 {np.percentile(latencias, 50):.1f} ms, "
+          f"p95 {np.percentile(latencias, 95):.1f} ms, max {latencias.max():.1f} ms")
+    assert np.percentile(latencias, 95) < 1000, "la detección tardó más de un segundo"
+    print("✅ Alertas en vivo en menos de un segundo desde que llega la vela")
+
+if __name__ == "__main__":
+    main()
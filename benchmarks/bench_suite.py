@@ -0,0 +1,432 @@
+import os
+import sys
+import json
+import time
+import zlib
+import platform
+import datetime
+import contextlib
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from benchmarks.comun import base_temporal
+
+# Base y bar_store temporales si no se configuraron (los scans escriben en la base)
+base_temporal("bench_suite")
+
+from sqlalchemy import insert
+from fastapi.testclient import TestClient
+from src.models import engine, init_db, StockList, RSI_1D, StockTracking, Favorite, IndicadorEstado
+from src.core import polygon_client, polygon_async
+from src.core.polygon_client import _rango_por_defecto
+from src.core.indicators import (
+    calcular_rsi, hma, procesar_indicadores, promedio_variacion_3m,
+    rvol_time_and_cumulative, evaluar_estado_hma90,
+)
+from src.script import tarea_pipeline
+from src.script.tarea_scan_hma_alcista import run_hma_scan
+from src.reglas_favoritos import evaluate_rules
+from src import main as api
+
+# Suite de benchmarks con resultados en JSON comparados contra un baseline:
+# - micro: indicadores sobre un df de velas (mejor tiempo por llamada)
+# - macro: scan_rsi / run_hma_scan / evaluate_rules con BENCH_TAMANIOS símbolos, Polygon
+#   simulado (mismas respuestas JSON que la API) y SQLite
+# - api: endpoints principales de /api/* con TestClient (p50 por request)
+#
+# Cada corrida se guarda en benchmarks/resultados/<fecha>.json. Si existe BENCH_BASELINE
+# (por defecto benchmarks/baseline.json) se compara y termina con código 1 si algún
+# benchmark quedó más de BENCH_TOLERANCIA más lento (tras BENCH_CONFIRMAR mediciones extra).
+# BENCH_GUARDAR_BASELINE=TRUE (o no tener baseline) guarda esta corrida como baseline. En
+# máquinas compartidas conviene subir BENCH_TOLERANCIA: el ruido puede pasar el 25%.
+#
+# Uso: python benchmarks/bench_suite.py
+#      BENCH_GRUPOS=micro,api BENCH_FILTRO=rsi python benchmarks/bench_suite.py
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+GRUPOS = [g.strip() for g in os.getenv("BENCH_GRUPOS", "micro,macro,api").split(",") if g.strip()]
+FILTRO = os.getenv("BENCH_FILTRO", "")
+TAMANIOS = [int(n) for n in os.getenv("BENCH_TAMANIOS", "100,1000,5000").split(",") if n.strip()]
+REPETICIONES_MACRO = int(os.getenv("BENCH_REPETICIONES_MACRO", 2))
+REPETICIONES_API = int(os.getenv("BENCH_REPETICIONES_API", 50))
+FILAS_API = int(os.getenv("BENCH_FILAS_API", 1000))
+# Latencia simulada por request a Polygon (0 = solo se mide el código propio)
+LATENCIA_POLYGON = float(os.getenv("BENCH_LATENCIA", 0))
+BASELINE = os.getenv("BENCH_BASELINE", os.path.join(DIRECTORIO, "baseline.json"))
+RESULTADOS = os.getenv("BENCH_RESULTADOS", os.path.join(DIRECTORIO, "resultados"))
+GUARDAR_BASELINE = os.getenv("BENCH_GUARDAR_BASELINE", "FALSE").upper() == "TRUE"
+# Fracción de más que se tolera antes de marcar regresión (0.25 = 25% más lento)
+TOLERANCIA = float(os.getenv("BENCH_TOLERANCIA", 0.25))
+# Diferencias menores a esto (segundos) no cuentan como regresión (ruido de timers)
+PISO = float(os.getenv("BENCH_PISO", 0.0005))
+# Veces que se vuelve a medir un benchmark que parece regresión antes de darla por buena
+CONFIRMAR = int(os.getenv("BENCH_CONFIRMAR", 2))
+
+# --- Polygon simulado ---
+
+class RespuestaFalsa:
+    status_code = 200
+    text = ""
+
+    def __init__(self, datos):
+        self._datos = datos
+        self.headers = {}
+
+    def json(self):
+        return self._datos
+
+class PolygonFalso:
+    """
+    Responde los endpoints de agregados y snapshot con velas sintéticas deterministas
+    por símbolo (sin red). Se engancha en polygon_client._get y polygon_async._get_async.
+    """
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.requests = 0
+        self._velas = {}
+
+    def velas(self, symbol, intervalo, fecha_inicio, fecha_fin):
+        clave = (symbol, intervalo, fecha_inicio, fecha_fin)
+        if clave not in self._velas:
+            rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+            if intervalo == "1D":
+                # Como Polygon: las velas diarias marcan el inicio de la sesión (00:00 ET)
+                fechas = pd.bdate_range(fecha_inicio, fecha_fin, tz="America/New_York")
+            else:
+                mult, unidad = polygon_client.INTERVAL_MAP[intervalo]
+                paso = pd.Timedelta(minutes=mult) if unidad == "minute" else pd.Timedelta(hours=mult)
+                fechas = pd.date_range(f"{fecha_inicio} 13:30", f"{fecha_fin} 20:00", freq=paso, tz="UTC")
+                fechas = fechas[(fechas.dayofweek < 5) & (fechas.hour >= 13) & (fechas.hour < 20)]
+            close = 50 * np.exp(np.cumsum(rng.normal(-0.001, 0.025, len(fechas))))
+            volumen = rng.integers(1_000, 5_000_000, len(fechas))
+            ms = fechas.asi8 // 1_000_000
+            self._velas[clave] = [
+                {"t": int(t), "o": float(c), "h": float(c), "l": float(c), "c": float(c), "v": int(v)}
+                for t, c, v in zip(ms, close, volumen)
+            ]
+        return self._velas[clave]
+
+    def preparar(self, symbols):
+        # Genera de antemano las velas 1D que pedirán los scans (fuera de la medición)
+        fecha_inicio, fecha_fin = _rango_por_defecto("1D")
+        for symbol in symbols:
+            self.velas(symbol, "1D", fecha_inicio, fecha_fin)
+
+    def precio(self, symbol):
+        fecha_inicio, fecha_fin = _rango_por_defecto("1D")
+        velas = self.velas(symbol, "1D", fecha_inicio, fecha_fin)
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()) + 1)
+        return round(velas[-1]["c"] * (1 + rng.normal(0, 0.03)), 2) if velas else None
+
+    def get(self, url, params):
+        self.requests += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        partes = url.split("/")
+        if "snapshot" in partes:
+            ahora = time.time_ns()
+            tickers = []
+            for symbol in params["tickers"].split(","):
+                precio = self.precio(symbol)
+                if precio:
+                    tickers.append({"ticker": symbol, "updated": ahora, "lastTrade": {"p": precio, "t": ahora}})
+            return RespuestaFalsa({"tickers": tickers})
+        if "ticker" in partes and "range" in partes:
+            i = partes.index("ticker")
+            symbol, mult, unidad, fecha_inicio, fecha_fin = partes[i + 1], partes[i + 3], partes[i + 4], partes[i + 5], partes[i + 6]
+            intervalo = next(k for k, v in polygon_client.INTERVAL_MAP.items() if v == (int(mult), unidad))
+            return RespuestaFalsa({"results": self.velas(symbol, intervalo, fecha_inicio, fecha_fin)})
+        return RespuestaFalsa({"results": []})
+
+def instalar_polygon_falso(falso):
+    polygon_client._get = falso.get
+
+    async def get_async(client, url, params):
+        return falso.get(url, params)
+    polygon_async._get_async = get_async
+    # Las alertas del pipeline salen por HTTP: se descartan
+    tarea_pipeline.enviar_alerta = lambda *args: None
+
+# --- Medición ---
+
+def medir_micro(fn, repeticiones=5, minimo=0.05):
+    """Mejor tiempo por llamada: agrupa llamadas hasta ~`minimo` segundos y toma la mejor de las repeticiones."""
+    numero = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            fn()
+        total = time.perf_counter() - inicio
+        if total >= minimo or numero >= 10_000:
+            break
+        numero *= 2
+    mejor = total / numero
+    for _ in range(repeticiones - 1):
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            fn()
+        mejor = min(mejor, (time.perf_counter() - inicio) / numero)
+    return {"segundos": mejor, "llamadas": numero * repeticiones}
+
+def medir_macro(preparar, fn, repeticiones):
+    """Mejor tiempo de `fn` con la base preparada de nuevo antes de cada repetición (fuera de la medición)."""
+    tiempos = []
+    for _ in range(repeticiones):
+        preparar()
+        inicio = time.perf_counter()
+        with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+            resultado = fn()
+        tiempos.append(time.perf_counter() - inicio)
+        # correr_pipeline retorna None si el pipeline falló (el error quedó en la salida silenciada)
+        assert resultado is not None, "la ejecución falló"
+    return {"segundos": min(tiempos), "repeticiones": repeticiones}
+
+def medir_requests(cliente, metodo, url, repeticiones, **kwargs):
+    """p50 (comparado) y p95 de la latencia del endpoint."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        r = cliente.request(metodo, url, **kwargs)
+        tiempos.append(time.perf_counter() - inicio)
+        assert r.status_code in (200, 202, 304), f"{metodo} {url}: {r.status_code} {r.text[:200]}"
+    return {"segundos": float(np.percentile(tiempos, 50)), "p95": float(np.percentile(tiempos, 95)), "repeticiones": repeticiones}
+
+# --- Datos ---
+
+def velas_1d(barras=250):
+    falso = PolygonFalso()
+    fechas = pd.bdate_range(end="2025-06-30", periods=barras, tz="UTC")
+    velas = falso.velas("MICRO", "1D", fechas[0].date().isoformat(), fechas[-1].date().isoformat())
+    return polygon_client._resultados_a_df(velas)
+
+def velas_intradia(dias=10):
+    falso = PolygonFalso()
+    fin = pd.Timestamp("2025-06-30")
+    velas = falso.velas("MICRO", "5min", (fin - pd.Timedelta(days=dias)).date().isoformat(), fin.date().isoformat())
+    return polygon_client._resultados_a_df(velas).set_index("datetime")
+
+def vaciar(*modelos):
+    with engine.begin() as conexion:
+        for modelo in modelos:
+            conexion.execute(modelo.__table__.delete())
+
+def insertar(modelo, filas):
+    if filas:
+        with engine.begin() as conexion:
+            conexion.execute(insert(modelo), filas)
+
+def simbolos(n):
+    return [f"SYM{i:05d}" for i in range(n)]
+
+# --- Grupos ---
+# Cada grupo retorna {nombre: medir}, con `medir()` repetible: si un benchmark parece una
+# regresión se vuelve a medir antes de fallar (ver confirmar).
+
+def casos_micro():
+    df = velas_1d()
+    proc = procesar_indicadores(df)
+    con_hma90 = procesar_indicadores(df, columnas=["hma90"]).set_index("datetime")
+    intradia = velas_intradia()
+    from src.config import HMA_A
+    funciones = {
+        "micro/calcular_rsi": lambda: calcular_rsi(df),
+        "micro/hma": lambda: hma(df["close"], HMA_A),
+        "micro/procesar_indicadores": lambda: procesar_indicadores(df),
+        "micro/promedio_variacion_3m": lambda: promedio_variacion_3m(proc),
+        "micro/rvol_time_and_cumulative": lambda: rvol_time_and_cumulative(intradia),
+        "micro/evaluar_estado_hma90": lambda: evaluar_estado_hma90(con_hma90),
+    }
+    return {nombre: (lambda fn=fn: medir_micro(fn)) for nombre, fn in funciones.items()}
+
+class _SinProgreso:
+    # El scan de /scan-rsi corre como job; aquí se llama directo sin registrar progreso
+    def iniciar(self, total):
+        pass
+
+    def avanzar(self, n=1, hits=0, errores=0):
+        pass
+
+    def guardar(self, forzar=False, **campos):
+        pass
+
+def casos_macro(falso, n):
+    lista = simbolos(n)
+
+    def preparar_rsi():
+        falso.preparar(lista)
+        vaciar(StockList, RSI_1D, IndicadorEstado)
+        insertar(StockList, [{"symbol": s} for s in lista])
+        # Un 20% ya estaba en RSI_1D: se actualiza en vez de insertarse
+        insertar(RSI_1D, [{"symbol": s, "rsi_value": 25.0} for s in lista[::5]])
+
+    def preparar_hma():
+        falso.preparar(lista)
+        vaciar(StockList, RSI_1D, StockTracking, IndicadorEstado)
+        insertar(RSI_1D, [{"symbol": s, "rsi_value": 25.0, "entry_date": datetime.datetime(2025, 1, 2)} for s in lista])
+
+    def preparar_favoritos():
+        falso.preparar(lista)
+        vaciar(Favorite)
+        rng = np.random.default_rng(n)
+        insertar(Favorite, [{
+            "symbol": s, "alert_value": round(float(rng.uniform(5, 100)), 2),
+            "alert_direction": "encima" if i % 2 else "debajo",
+        } for i, s in enumerate(lista)])
+
+    casos = {
+        f"macro/scan_rsi/{n}": (preparar_rsi, lambda: api._job_scan_rsi(_SinProgreso())),
+        f"macro/run_hma_scan/{n}": (preparar_hma, run_hma_scan),
+        f"macro/evaluate_rules/{n}": (preparar_favoritos, evaluate_rules),
+    }
+    return {
+        nombre: (lambda preparar=preparar, fn=fn: medir_macro(preparar, fn, REPETICIONES_MACRO))
+        for nombre, (preparar, fn) in casos.items()
+    }
+
+def casos_api(falso, cliente):
+    lista = simbolos(FILAS_API)
+
+    def preparar_api():
+        falso.preparar(lista)
+        vaciar(StockList, RSI_1D, StockTracking, Favorite, IndicadorEstado)
+        rng = np.random.default_rng(3)
+        insertar(RSI_1D, [{"symbol": s, "rsi_value": float(rng.uniform(10, 30)), "variation": float(rng.normal(0, 3))} for s in lista])
+        insertar(StockTracking, [{"symbol": s, "estado": ["alcista", "bajista", "cruce_alcista"][i % 3]} for i, s in enumerate(lista)])
+        insertar(Favorite, [{"symbol": s, "alert_value": 50.0, "alert_direction": "encima"} for s in lista])
+
+    def medir(metodo, ruta, cuerpo=None, condicional=False, repeticiones=REPETICIONES_API):
+        preparar_api()
+        # Con `condicional` se manda el ETag vigente: mide el camino del 304
+        headers = {"If-None-Match": cliente.get(ruta).headers.get("ETag", "")} if condicional else None
+        assert not condicional or cliente.get(ruta, headers=headers).status_code == 304, f"{ruta} no respondió 304 con su ETag"
+        with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+            return medir_requests(cliente, metodo, ruta, repeticiones, json=cuerpo, headers=headers)
+
+    return {
+        "api/GET /api/data": lambda: medir("GET", "/api/data"),
+        "api/GET /api/data?limite=1000": lambda: medir("GET", "/api/data?limite=1000"),
+        "api/GET /api/data (304)": lambda: medir("GET", "/api/data", condicional=True),
+        "api/GET /api/track_data": lambda: medir("GET", "/api/track_data"),
+        "api/GET /api/track_data?estado=alcista": lambda: medir("GET", "/api/track_data?estado=alcista"),
+        "api/GET /api/favoritos_data": lambda: medir("GET", "/api/favoritos_data"),
+        "api/GET /api/config": lambda: medir("GET", "/api/config"),
+        "api/POST /api/track_values": lambda: medir("POST", "/api/track_values", {"symbol": lista[0], "current_price": 10.5}),
+        "api/POST /api/add_manual_track": lambda: medir("POST", "/api/add_manual_track", {"symbol": lista[1]}),
+        # Escritura masiva: menos repeticiones
+        "api/POST /api/refresh_favorites": lambda: medir("POST", "/api/refresh_favorites", repeticiones=max(5, REPETICIONES_API // 10)),
+    }
+
+# --- Reporte y baseline ---
+
+def _formato(segundos):
+    if segundos < 1e-3:
+        return f"{segundos * 1e6:.1f} µs"
+    if segundos < 1:
+        return f"{segundos * 1e3:.1f} ms"
+    return f"{segundos:.2f} s"
+
+def imprimir_resultado(nombre, resultado):
+    extra = f" (p95 {_formato(resultado['p95'])})" if "p95" in resultado else ""
+    print(f"  {nombre:<48} {_formato(resultado['segundos']):>10}{extra}")
+
+def empeoro(resultado, previo):
+    return resultado["segundos"] > previo["segundos"] * (1 + TOLERANCIA) and resultado["segundos"] - previo["segundos"] > PISO
+
+def confirmar(resultados, base, casos):
+    """Vuelve a medir hasta CONFIRMAR veces los que parecen regresión y se queda con la mejor medición."""
+    for nombre, resultado in resultados.items():
+        previo = base["resultados"].get(nombre)
+        for _ in range(CONFIRMAR):
+            if previo is None or not empeoro(resultados[nombre], previo):
+                break
+            print(f"  🔁 {nombre}: {_formato(resultados[nombre]['segundos'])} contra {_formato(previo['segundos'])}, midiendo de nuevo")
+            nuevo = casos[nombre]()
+            if nuevo["segundos"] < resultados[nombre]["segundos"]:
+                resultados[nombre] = nuevo
+
+def comparar(actual, base):
+    """Imprime la comparación y retorna la lista de benchmarks que empeoraron más de TOLERANCIA."""
+    regresiones = []
+    print(f"\nComparación contra baseline ({base['fecha']}, tolerancia {TOLERANCIA:.0%}):")
+    print(f"  {'benchmark':<48} {'baseline':>10} {'actual':>10} {'cambio':>8}")
+    for nombre, resultado in actual["resultados"].items():
+        previo = base["resultados"].get(nombre)
+        if previo is None:
+            print(f"  {nombre:<48} {'-':>10} {_formato(resultado['segundos']):>10}    nuevo")
+            continue
+        cambio = resultado["segundos"] / previo["segundos"] - 1 if previo["segundos"] else 0.0
+        marca = "❌" if empeoro(resultado, previo) else ("🚀" if cambio < -TOLERANCIA else "")
+        print(f"  {nombre:<48} {_formato(previo['segundos']):>10} {_formato(resultado['segundos']):>10} {cambio:>+7.0%} {marca}")
+        if marca == "❌":
+            regresiones.append(nombre)
+    return regresiones
+
+def guardar_json(datos, archivo):
+    os.makedirs(os.path.dirname(archivo) or ".", exist_ok=True)
+    with open(archivo, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+
+def main():
+    init_db()
+    falso = PolygonFalso(LATENCIA_POLYGON)
+    instalar_polygon_falso(falso)
+    ahora = datetime.datetime.now()
+    corrida = {
+        "fecha": ahora.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "latencia_polygon": LATENCIA_POLYGON,
+        "resultados": {},
+    }
+    base = None
+    if os.path.exists(BASELINE) and not GUARDAR_BASELINE:
+        with open(BASELINE, encoding="utf-8") as f:
+            base = json.load(f)
+
+    inicio = time.perf_counter()
+    with contextlib.ExitStack() as pila:
+        grupos = []
+        if "micro" in GRUPOS:
+            grupos.append(("Micro (mejor tiempo por llamada):", casos_micro()))
+        if "macro" in GRUPOS:
+            for n in TAMANIOS:
+                grupos.append((f"Macro con {n} símbolos (Polygon simulado, mejor de {REPETICIONES_MACRO}):", casos_macro(falso, n)))
+        if "api" in GRUPOS:
+            cliente = pila.enter_context(TestClient(api.app))
+            grupos.append((f"API (p50 de {REPETICIONES_API} requests, {FILAS_API} filas por tabla):", casos_api(falso, cliente)))
+
+        casos = {}
+        for titulo, grupo in grupos:
+            grupo = {nombre: medir for nombre, medir in grupo.items() if FILTRO in nombre}
+            if not grupo:
+                continue
+            print(titulo)
+            for nombre, medir in grupo.items():
+                corrida["resultados"][nombre] = medir()
+                imprimir_resultado(nombre, corrida["resultados"][nombre])
+            casos.update(grupo)
+        if base is not None:
+            confirmar(corrida["resultados"], base, casos)
+    print(f"⏱️ Suite en {time.perf_counter() - inicio:.1f}s ({falso.requests} requests a Polygon simulado)")
+
+    archivo = os.path.join(RESULTADOS, f"{ahora:%Y%m%d_%H%M%S}.json")
+    guardar_json(corrida, archivo)
+    print(f"✅ Resultados en {archivo}")
+
+    if base is None:
+        guardar_json(corrida, BASELINE)
+        print(f"📌 Baseline guardado en {BASELINE}")
+        return
+    regresiones = comparar(corrida, base)
+    if regresiones:
+        print(f"❌ {len(regresiones)} regresiones de rendimiento: {', '.join(regresiones)}")
+        sys.exit(1)
+    print("✅ Sin regresiones contra el baseline")
+
+if __name__ == "__main__":
+    main()
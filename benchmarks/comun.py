@@ -0,0 +1,47 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Piezas compartidas de los benchmarks. No importa nada de src: base_temporal() tiene que
+# correr antes de que src.config lea el entorno.
+
+def base_temporal(prefijo, **entorno):
+    """
+    Base y bar_store temporales si no se configuraron (los benchmarks escriben en la base),
+    con bar_store apagado salvo que se pida. `entorno`: otros valores por defecto del
+    benchmark (p.ej. STREAM_GUARDAR_CADA). Retorna la carpeta temporal.
+    """
+    tmp = tempfile.mkdtemp(prefix=f"{prefijo}_")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+    os.environ.setdefault("BAR_STORE_PATH", os.path.join(tmp, "bar_store.db"))
+    os.environ.setdefault("BAR_STORE", "FALSE")
+    for clave, valor in entorno.items():
+        os.environ.setdefault(clave, valor)
+    return tmp
+
+def universo_sintetico(n_symbols, barras=300, seed=7, deriva=0.0, volatilidad=0.02, min_barras=30, huecos=False):
+    """
+    Historias 1D sintéticas {symbol: df OHLCV} terminadas el 2025-06-30, como las entrega
+    iterar_velas_1d. Uno de cada 10 símbolos es un listado reciente, con entre `min_barras`
+    y `barras` velas (min_barras=barras: todos completos); con `huecos`, uno de cada 50
+    tiene dos cierres NaN.
+    """
+    rng = np.random.default_rng(seed)
+    fechas = pd.bdate_range(end="2025-06-30", periods=barras, tz="UTC")
+    historias = {}
+    for i in range(n_symbols):
+        n = barras if i % 10 or min_barras >= barras else int(rng.integers(min_barras, barras))
+        close = 50 * np.exp(np.cumsum(rng.normal(deriva, volatilidad, n)))
+        volume = rng.integers(1_000, 5_000_000, n).astype(float)
+        if huecos and i % 50 == 0:
+            close[rng.integers(0, n, 2)] = np.nan
+        historias[f"SYM{i:05d}"] = pd.DataFrame({
+            "datetime": fechas[-n:], "open": close, "high": close, "low": close,
+            "close": close, "volume": volume,
+        })
+    return historias
+
+def a_largo(historias):
+    """Formato largo ordenado por symbol y fecha, como bar_store.leer_velas_largas en modo bulk."""
+    return pd.concat([df.assign(symbol=symbol) for symbol, df in historias.items()], ignore_index=True)
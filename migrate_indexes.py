@@ -0,0 +1,82 @@
+import sys
+import os
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src.models import engine, RSI_1D, StockTracking, Favorite
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+# Índices de las consultas frecuentes (definidos en __table_args__ de src/models.py; las bases
+# nuevas ya los crean con init_db). Idempotente: CREATE INDEX IF NOT EXISTS. En Postgres se crean
+# CONCURRENTLY para no bloquear las escrituras de los scans mientras se construyen; un índice
+# inválido (CONCURRENTLY interrumpido) o con otras columnas clave/INCLUDE se borra y se vuelve a crear
+# (en SQLite, uno con otra definición). Los índices que ya no están en los modelos se borran.
+
+TABLAS = [RSI_1D, StockTracking, Favorite]
+
+# Reemplazados por ix_stock_tracking_dashboard (estado, alert_alcista, alert_bajista, id)
+OBSOLETOS = ["ix_stock_tracking_estado_alertas"]
+
+def _a_recrear(connection, indice):
+    # Motivo para volver a crear el índice en Postgres, o None si está bien (o no existe)
+    fila = connection.execute(text(
+        "SELECT i.indisvalid, i.indnkeyatts, i.indnatts FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :nombre"
+    ), {"nombre": indice.name}).first()
+    if fila is None:
+        return None
+    if not fila.indisvalid:
+        return "inválido"
+    claves = len(indice.expressions)
+    incluidas = len(indice.dialect_options["postgresql"]["include"] or [])
+    if (fila.indnkeyatts, fila.indnatts) != (claves, claves + incluidas):
+        return "con otra definición"
+    return None
+
+def _a_recrear_sqlite(connection, sql):
+    # En SQLite se compara la definición guardada con la del modelo
+    nombre = sql.split(" IF NOT EXISTS ", 1)[1].split(" ", 1)[0]
+    guardado = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = :nombre"), {"nombre": nombre}
+    ).scalar()
+    if guardado is None or " ".join(guardado.split()) == " ".join(sql.replace(" IF NOT EXISTS", "", 1).split()):
+        return None
+    return "con otra definición"
+
+def migrate():
+    print("Iniciando migración de índices...")
+    postgres = engine.dialect.name == "postgresql"
+    # CONCURRENTLY no puede correr dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for nombre in OBSOLETOS:
+            concurrently = "CONCURRENTLY " if postgres else ""
+            connection.execute(text(f'DROP INDEX {concurrently}IF EXISTS "{nombre}"'))
+            print(f"Índice obsoleto '{nombre}' borrado (si existía).")
+        for modelo in TABLAS:
+            for indice in sorted(modelo.__table__.indexes, key=lambda i: i.name):
+                sql = str(CreateIndex(indice, if_not_exists=True).compile(dialect=engine.dialect))
+                if postgres:
+                    motivo = _a_recrear(connection, indice)
+                    if motivo:
+                        print(f"Índice '{indice.name}' {motivo}: se borra y se vuelve a crear.")
+                        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{indice.name}"'))
+                    sql = sql.replace("CREATE INDEX IF NOT EXISTS", "CREATE INDEX CONCURRENTLY IF NOT EXISTS", 1)
+                    sql = sql.replace("CREATE UNIQUE INDEX IF NOT EXISTS", "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS", 1)
+                else:
+                    motivo = _a_recrear_sqlite(connection, sql)
+                    if motivo:
+                        print(f"Índice '{indice.name}' {motivo}: se borra y se vuelve a crear.")
+                        connection.execute(text(f'DROP INDEX IF EXISTS "{indice.name}"'))
+                try:
+                    connection.execute(text(sql))
+                    print(f"Índice '{indice.name}' listo.")
+                except Exception as e:
+                    print(f"Error al crear '{indice.name}': {e}")
+            # Estadísticas al día para que el planificador use los índices nuevos
+            connection.execute(text(f"ANALYZE {modelo.__tablename__}"))
+    print("Migración completada con éxito.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,32 @@
+import sys
+import os
+import datetime
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src.models import engine, ScanJob
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+# Un solo job activo (pendiente/corriendo) por tipo lo garantiza la base con el índice único
+# parcial ix_scan_jobs_activo (src/models.py; las bases nuevas ya lo crean con init_db).
+# Antes de crearlo, los activos repetidos de un mismo tipo se dan por caídos: queda el más
+# nuevo. Idempotente: CREATE UNIQUE INDEX IF NOT EXISTS.
+
+def migrate():
+    print("Iniciando migración de scan_jobs...")
+    indice = next(i for i in ScanJob.__table__.indexes if i.name == "ix_scan_jobs_activo")
+    with engine.begin() as connection:
+        cerrados = connection.execute(text(
+            "UPDATE scan_jobs SET estado = 'error', error = :error, terminado = :ahora "
+            "WHERE estado IN ('pendiente', 'corriendo') AND id NOT IN ("
+            "SELECT MAX(id) FROM scan_jobs WHERE estado IN ('pendiente', 'corriendo') GROUP BY tipo)"
+        ), {"error": "Job activo repetido; cerrado por migrate_jobs", "ahora": datetime.datetime.utcnow()}).rowcount
+        print(f"{cerrados} jobs activos repetidos cerrados.")
+        connection.execute(CreateIndex(indice, if_not_exists=True))
+    print(f"Índice '{indice.name}' listo.")
+    print("Migración completada con éxito.")
+
+if __name__ == "__main__":
+    migrate()
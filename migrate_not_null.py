@@ -0,0 +1,33 @@
+import sys
+import os
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src.models import engine
+from sqlalchemy import text
+
+# symbol y timestamp de los listados pasan a NOT NULL (src/models.py): así el ORDER BY y el
+# cursor de /api/* van por la columna directa y usan los índices (ver _sin_nulos en
+# src/listados.py). Completa los NULL de bases viejas; en Postgres además agrega la
+# restricción (SQLite no permite cambiarla sin recrear la tabla).
+
+TABLAS = ["rsi_1d", "stock_tracking", "favorites"]
+
+def migrate():
+    print("Iniciando migración de columnas NOT NULL...")
+    postgres = engine.dialect.name == "postgresql"
+    for tabla in TABLAS:
+        with engine.begin() as connection:
+            borradas = connection.execute(text(f"DELETE FROM {tabla} WHERE symbol IS NULL")).rowcount
+            completadas = connection.execute(
+                text(f"UPDATE {tabla} SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL")
+            ).rowcount
+            if postgres:
+                connection.execute(text(f"ALTER TABLE {tabla} ALTER COLUMN symbol SET NOT NULL"))
+                connection.execute(text(f"ALTER TABLE {tabla} ALTER COLUMN timestamp SET NOT NULL"))
+        print(f"'{tabla}': {borradas} filas sin symbol borradas, {completadas} timestamps completados.")
+    print("Migración completada con éxito.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,41 @@
+import sys
+import os
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src.models import engine, init_db
+from sqlalchemy import text
+
+# Delta-sync (?since=): updated_version por fila, minima_delta en table_versions y la tabla
+# de tombstones deleted_rows (esta la crea init_db). Sirve para Postgres y SQLite.
+
+COLUMNAS = [
+    ("rsi_1d", "updated_version", "INTEGER DEFAULT 0"),
+    ("stock_tracking", "updated_version", "INTEGER DEFAULT 0"),
+    ("favorites", "updated_version", "INTEGER DEFAULT 0"),
+    ("table_versions", "minima_delta", "INTEGER DEFAULT 0"),
+]
+
+def migrate():
+    print("Iniciando migración de delta-sync...")
+    init_db()
+    for tabla, col, tipo in COLUMNAS:
+        with engine.begin() as connection:
+            try:
+                connection.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {col} {tipo}"))
+                print(f"Columna '{tabla}.{col}' agregada.")
+            except Exception as e:
+                mensaje = str(e).lower()
+                if "already exists" in mensaje or "duplicate column" in mensaje:
+                    print(f"La columna '{tabla}.{col}' ya existe.")
+                else:
+                    print(f"Error al agregar '{tabla}.{col}': {e}")
+    for tabla in ("rsi_1d", "stock_tracking", "favorites"):
+        with engine.begin() as connection:
+            connection.execute(text(f"UPDATE {tabla} SET updated_version = 0 WHERE updated_version IS NULL"))
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabla}_updated_version ON {tabla} (updated_version)"))
+    print("Migración completada con éxito.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,304 @@
+import json
+import asyncio
+import datetime
+import threading
+import traceback
+import pandas as pd
+from sqlalchemy import select
+from src import config
+from src.models import SessionLocal, engine, Favorite, StockTracking, precargar_por_simbolo, actualizar_por_simbolo, fila_tracking, TRACKING_ACTUALIZABLES
+from src.cambios import escuchar_postgres
+from src.core.polygon_stream import StreamPolygon
+from src.core.regla_favoritos import IndiceAlertas, mensaje_alerta
+from src.core.regla_cruce_hma import regla_cruce_hma, metricas_cruce_hma
+from src.core.indicadores_incrementales import IndicadoresIncrementales, cargar_estados, guardar_estados
+from src.reglas_favoritos import send_alert
+from src.reglas_tracking import send_tracking_alert
+
+# Ingesta en vivo (opcional, en lugar del polling de alert_favoritos cada 15 min y
+# alert_tracking cada hora): se suscribe a los agregados por minuto de los favoritos y
+# seguidos y aplica las reglas a cada vela apenas llega.
+# - Favoritos: IndiceAlertas, avisa los niveles cruzados desde el minuto anterior.
+# - Tracking: la vela 1D de hoy se previsualiza sobre el estado incremental (indicator_state)
+#   con el cierre y el volumen acumulado del minuto, sin descargar historial por vela. El
+#   estado se prepara una vez por símbolo y día con regla_cruce_hma; el cruce alcista se
+#   avisa cuando el estado cambia (una vez por símbolo y día).
+# Precios y métricas se guardan por lotes cada STREAM_GUARDAR_CADA segundos.
+# Altas, bajas y cambios de niveles llegan por el feed de cambios (LISTEN en Postgres, ver
+# src/cambios.py) y se aplican por símbolo; además se relee todo cada STREAM_RECARGAR_CADA
+# segundos (en SQLite es la única vía: los avisos no salen del proceso que hace el commit).
+
+class IngestaEnVivo:
+    def __init__(self, stream=None, grabar=None):
+        self.stream = stream or StreamPolygon()
+        self.grabar = grabar or config.STREAM_GRABAR
+        self.indice = IndiceAlertas()
+        self.favoritos = set()
+        self.seguidos = set()
+        self.indicadores = {}      # symbol -> IndicadoresIncrementales confirmado hasta el día previo
+        self.dia_preparado = {}    # symbol -> fecha (UTC) para la que se preparó
+        self.estado_tracking = {}  # symbol -> último estado HMA
+        self.alertados = {}        # symbol -> fecha del último aviso de cruce alcista
+        self.velas = 0
+        self._por_preparar = {}    # symbol -> (precio, datetime) de la vela que pidió prepararlo
+        self._preparando = set()
+        self._favoritos_pendientes = {}
+        self._tracking_pendientes = {}
+        self._tareas = set()
+
+    def _leer_base(self):
+        db = SessionLocal()
+        try:
+            favoritos = db.execute(select(Favorite.symbol, Favorite.alert_value, Favorite.alert_direction)).all()
+            seguidos = {symbol: fila.estado for symbol, fila in precargar_por_simbolo(db, StockTracking, "estado").items()}
+        finally:
+            db.close()
+        return favoritos, seguidos
+
+    async def recargar(self):
+        """Relee favoritos (niveles) y seguidos, y ajusta la suscripción."""
+        favoritos, seguidos = await asyncio.to_thread(self._leer_base)
+        self.indice.cargar(favoritos)
+        self.favoritos = {fav.symbol for fav in favoritos}
+        for symbol in self.seguidos - set(seguidos):
+            self._olvidar_seguido(symbol)
+        for symbol, estado in seguidos.items():
+            self.estado_tracking.setdefault(symbol, estado)
+        self.seguidos = set(seguidos)
+        await self._ajustar_suscripcion()
+
+    def _olvidar_seguido(self, symbol):
+        self.seguidos.discard(symbol)
+        self.indicadores.pop(symbol, None)
+        self.dia_preparado.pop(symbol, None)
+        self.estado_tracking.pop(symbol, None)
+
+    async def _ajustar_suscripcion(self):
+        symbols = self.favoritos | self.seguidos
+        await self.stream.desuscribir(self.stream.symbols - symbols)
+        await self.stream.suscribir(symbols)
+
+    def _leer_cambiados(self, favoritos, seguidos):
+        db = SessionLocal()
+        try:
+            filas_favoritos = {
+                fila.symbol: fila for fila in
+                db.execute(select(Favorite.symbol, Favorite.alert_value, Favorite.alert_direction).where(Favorite.symbol.in_(favoritos)))
+            } if favoritos else {}
+            filas_seguidos = dict(
+                db.execute(select(StockTracking.symbol, StockTracking.estado).where(StockTracking.symbol.in_(seguidos))).all()
+            ) if seguidos else {}
+        finally:
+            db.close()
+        return filas_favoritos, filas_seguidos
+
+    async def aplicar_cambios(self, cambios):
+        """
+        Aplica un aviso del feed de cambios ({tabla: symbols | None}): relee solo los símbolos
+        avisados y los da de alta, cambia o quita del índice y de los seguidos. Un cambio masivo
+        (symbols None) relee todo.
+        """
+        if cambios.get("favorites", ()) is None or cambios.get("stock_tracking", ()) is None:
+            await self.recargar()
+            return
+        favoritos = sorted(cambios.get("favorites") or ())
+        seguidos = sorted(cambios.get("stock_tracking") or ())
+        if not favoritos and not seguidos:
+            return
+        filas_favoritos, filas_seguidos = await asyncio.to_thread(self._leer_cambiados, favoritos, seguidos)
+        for symbol in favoritos:
+            fila = filas_favoritos.get(symbol)
+            if fila is None:
+                self.indice.quitar(symbol)
+                self.favoritos.discard(symbol)
+            else:
+                # Con los mismos niveles (p.ej. el precio que guarda este proceso) no cambia nada
+                self.indice.actualizar(symbol, fila.alert_value, fila.alert_direction)
+                self.favoritos.add(symbol)
+        for symbol in seguidos:
+            if symbol not in filas_seguidos:
+                self._olvidar_seguido(symbol)
+            elif symbol not in self.seguidos:
+                self.seguidos.add(symbol)
+                self.estado_tracking[symbol] = filas_seguidos[symbol]
+        await self._ajustar_suscripcion()
+
+    async def _consumir_cambios(self, avisos):
+        while True:
+            juntos = await avisos.get()
+            # Los avisos que se acumularon mientras se aplicaba el anterior van juntos
+            while not avisos.empty():
+                for tabla, symbols in avisos.get_nowait().items():
+                    if symbols is None or (tabla in juntos and juntos[tabla] is None):
+                        juntos[tabla] = None
+                    else:
+                        juntos[tabla] = set(juntos.get(tabla) or ()) | symbols
+            try:
+                await self.aplicar_cambios(juntos)
+            except Exception as e:
+                traceback.print_exc()
+                print(f"❌ Error aplicando cambios: {e}")
+
+    def _escuchar_cambios(self, detener):
+        # Hilo del LISTEN: los avisos pasan al event loop por una cola
+        loop = asyncio.get_running_loop()
+        avisos = asyncio.Queue()
+        avisar = lambda cambios: loop.call_soon_threadsafe(avisos.put_nowait, cambios)
+        # Al reconectar se pudieron perder avisos: se relee todo
+        todo = lambda: avisar({"favorites": None, "stock_tracking": None})
+        threading.Thread(target=escuchar_postgres, args=(avisar, detener, todo), daemon=True, name="alert_stream_cambios").start()
+        return asyncio.create_task(self._consumir_cambios(avisos))
+
+    def procesar(self, evento):
+        """Aplica las reglas a un agregado AM. Retorna (mensajes de favoritos, mensajes de tracking)."""
+        symbol = evento["sym"]
+        precio = float(evento["c"])
+        fecha = pd.Timestamp(evento["s"], unit="ms", tz="UTC")
+        self.velas += 1
+
+        mensajes_favoritos = []
+        if symbol in self.favoritos:
+            for direccion, nivel in self.indice.precio(symbol, precio):
+                msg = mensaje_alerta(symbol, precio, direccion, nivel)
+                mensajes_favoritos.append(msg)
+                print(f"  [!] {msg}")
+            self._favoritos_pendientes[symbol] = precio
+
+        mensajes_tracking = []
+        metrics = self._cruce_hma(symbol, precio, fecha, evento.get("av")) if symbol in self.seguidos else None
+        if metrics:
+            previo = self.estado_tracking.get(symbol)
+            self.estado_tracking[symbol] = metrics["estado"]
+            self._tracking_pendientes[symbol] = metrics
+            if metrics["estado"] == "cruce_alcista" and previo != "cruce_alcista" and self.alertados.get(symbol) != fecha.date():
+                self.alertados[symbol] = fecha.date()
+                msg = f"{symbol} ({metrics['current_price']})"
+                mensajes_tracking.append(msg)
+                print(f"  [!] {msg}")
+        return mensajes_favoritos, mensajes_tracking
+
+    def _cruce_hma(self, symbol, precio, fecha, volumen):
+        if self.dia_preparado.get(symbol) != fecha.date():
+            if symbol not in self._preparando:
+                self._por_preparar[symbol] = (precio, fecha.to_pydatetime())
+            return None
+        ind = self.indicadores.get(symbol)
+        if ind is None or ind.ultimo is None:
+            return None
+        # Vela de hoy con el último cierre y el volumen acumulado del día
+        ultima = ind.previsualizar(fecha.value, precio, float(volumen or 0))
+        return metricas_cruce_hma(symbol, ultima, ind.ultimo)
+
+    def _preparar(self, pendientes):
+        # Lleva el estado de cada símbolo hasta el día previo a su vela (descarga 1D con delta en bar_store)
+        db = SessionLocal()
+        try:
+            estados = cargar_estados(db) if config.INDICADORES_INCREMENTALES else {}
+            estados = {symbol: estados.get(symbol) for symbol in pendientes}
+            for symbol, ultimo in pendientes.items():
+                try:
+                    regla_cruce_hma(symbol, ultimo, estados=estados)
+                except Exception as e:
+                    print(f"❌ Error preparando HMA para {symbol}: {e}")
+            if config.INDICADORES_INCREMENTALES:
+                guardar_estados(db, estados)
+                db.commit()
+        finally:
+            db.close()
+        return {symbol: ind for symbol, ind in estados.items() if isinstance(ind, IndicadoresIncrementales)}
+
+    async def _preparar_pendientes(self):
+        while self._por_preparar:
+            pendientes, self._por_preparar = self._por_preparar, {}
+            self._preparando |= set(pendientes)
+            try:
+                listos = await asyncio.to_thread(self._preparar, pendientes)
+            except Exception as e:
+                # Se vuelven a pedir con la próxima vela de cada símbolo
+                traceback.print_exc()
+                print(f"❌ Error preparando HMA: {e}")
+                continue
+            finally:
+                self._preparando -= set(pendientes)
+            for symbol, (_, fecha) in pendientes.items():
+                if symbol in self.seguidos:
+                    # Sin estado (p.ej. sin velas 1D) no se reintenta hasta el día siguiente
+                    self.indicadores[symbol] = listos.get(symbol)
+                    self.dia_preparado[symbol] = fecha.date()
+            print(f"🧮 HMA preparado para {len(listos)}/{len(pendientes)} símbolos")
+
+    def _guardar(self, favoritos, tracking):
+        ahora = datetime.datetime.utcnow()
+        db = SessionLocal()
+        try:
+            actualizar_por_simbolo(db, Favorite, [
+                {"symbol": symbol, "current_value": precio, "timestamp": ahora} for symbol, precio in favoritos.items()
+            ])
+            actualizar_por_simbolo(db, StockTracking, [
+                {col: fila[col] for col in ["symbol"] + TRACKING_ACTUALIZABLES}
+                for fila in map(fila_tracking, tracking.values())
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+    async def guardar(self):
+        favoritos, self._favoritos_pendientes = self._favoritos_pendientes, {}
+        tracking, self._tracking_pendientes = self._tracking_pendientes, {}
+        if favoritos or tracking:
+            await asyncio.to_thread(self._guardar, favoritos, tracking)
+
+    def _en_segundo_plano(self, corrutina):
+        tarea = asyncio.create_task(corrutina)
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def _cada(self, segundos, funcion):
+        while True:
+            await asyncio.sleep(segundos)
+            try:
+                await funcion()
+            except Exception as e:
+                traceback.print_exc()
+                print(f"❌ Error en {funcion.__name__}: {e}")
+
+    async def correr(self):
+        await self.recargar()
+        print(f"Escuchando {len(self.favoritos)} favoritos y {len(self.seguidos)} seguidos...")
+        archivo = open(self.grabar, "a", encoding="utf-8") if self.grabar else None
+        periodicas = [
+            asyncio.create_task(self._cada(config.STREAM_GUARDAR_CADA, self.guardar)),
+            asyncio.create_task(self._cada(config.STREAM_RECARGAR_CADA, self.recargar)),
+        ]
+        detener = threading.Event()
+        if engine.dialect.name == "postgresql":
+            periodicas.append(self._escuchar_cambios(detener))
+        preparacion = None
+        try:
+            async for evento in self.stream.agregados():
+                if archivo:
+                    archivo.write(json.dumps(evento) + "\n")
+                mensajes_favoritos, mensajes_tracking = self.procesar(evento)
+                if mensajes_favoritos:
+                    self._en_segundo_plano(asyncio.to_thread(send_alert, mensajes_favoritos))
+                if mensajes_tracking:
+                    self._en_segundo_plano(asyncio.to_thread(send_tracking_alert, mensajes_tracking))
+                if self._por_preparar and (preparacion is None or preparacion.done()):
+                    preparacion = asyncio.create_task(self._preparar_pendientes())
+        finally:
+            detener.set()
+            for tarea in periodicas + ([preparacion] if preparacion else []):
+                tarea.cancel()
+            if archivo:
+                archivo.close()
+            await self.guardar()
+
+def execute():
+    asyncio.run(IngestaEnVivo().correr())
+
+if __name__ == "__main__":
+    print("--- Ingesta en vivo de alertas (WebSocket) ---")
+    try:
+        execute()
+    except KeyboardInterrupt:
+        print("Deteniendo stream...")
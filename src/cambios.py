@@ -0,0 +1,252 @@
+import json
+import time
+import queue
+import asyncio
+import datetime
+import threading
+import traceback
+from select import select as esperar_lectura
+from src.models import (
+    SessionLocal, engine, RSI_1D, StockTracking, Favorite,
+    TABLAS_OBSERVADAS, al_confirmar_cambios, leer_payload_cambios, version_tabla,
+)
+from src.config import TIMEZONE_UTC
+from src import config
+
+# Feed de cambios para los dashboards (GET /api/cambios, server-sent events).
+# Los commits avisan qué símbolos cambiaron (ver "Registro de cambios" en models.py); el
+# broker junta los avisos, lee esas filas una sola vez y las manda a todas las pestañas
+# abiertas. Las páginas aplican el diff y ya no recargan la tabla entera.
+
+def fila_rsi_1d(r):
+    # [symbol, rvol1, rvol2, var, rsi, prom_var_3m, valor_actual, min_price, candles, entry_date, date]
+    return [
+        r.symbol,
+        r.rvol_1,
+        r.rvol_2,
+        r.variation,
+        r.rsi_value,
+        r.promedio_variacion_3m,
+        r.valor_actual,
+        r.min_price,
+        r.candles_since_min,
+        (r.entry_date + datetime.timedelta(hours=TIMEZONE_UTC)).strftime("%Y-%m-%d"),
+        (r.timestamp + datetime.timedelta(hours=TIMEZONE_UTC)).strftime("%Y-%m-%d %H:%M")
+    ]
+
+def fila_tracking_api(f):
+    # symbol, current_price, rsi_value, variation, rvol_1, rvol_2, hma_a, hma_b, alert_alcista, alert_bajista, estado
+    return [
+        f.symbol,
+        f.current_price,
+        f.rsi_value,
+        f.variation,
+        f.rvol_1,
+        f.rvol_2,
+        f.hma_a,
+        f.hma_b,
+        f.alert_alcista,
+        f.alert_bajista,
+        f.estado
+    ]
+
+# Columnas que lee fila_tracking_api (el listado carga solo estas)
+COLUMNAS_TRACKING_API = [
+    "id", "symbol", "current_price", "rsi_value", "variation", "rvol_1", "rvol_2",
+    "hma_a", "hma_b", "alert_alcista", "alert_bajista", "estado",
+]
+
+def fila_favorito(f):
+    # [symbol, current_value, alert_value, alert_direction, timestamp]
+    return [
+        f.symbol,
+        f.current_value,
+        f.alert_value,
+        f.alert_direction,
+        (f.timestamp + datetime.timedelta(hours=TIMEZONE_UTC)).strftime("%Y-%m-%d %H:%M") if f.timestamp else "-"
+    ]
+
+# tabla -> (modelo, serializador con el mismo formato que su endpoint de listado)
+SERIALIZADORES = {
+    "rsi_1d": (RSI_1D, fila_rsi_1d),
+    "stock_tracking": (StockTracking, fila_tracking_api),
+    "favorites": (Favorite, fila_favorito),
+}
+
+class Broker:
+    """
+    Reparte los cambios confirmados a los clientes SSE. Cada cliente tiene una
+    asyncio.Queue en su event loop; si se llena (cliente lento) se vacía y recibe un
+    "reset" para que recargue la tabla completa.
+    """
+    def __init__(self):
+        self._clientes = {}  # cola -> (loop, tablas)
+        self._lock = threading.Lock()
+        self._entrantes = queue.Queue()
+        self._detener = threading.Event()
+        self._hilos = []
+        self._oyente_local = False
+
+    def suscribir(self, tablas=None):
+        cola = asyncio.Queue(maxsize=config.CAMBIOS_COLA_MAX)
+        with self._lock:
+            self._clientes[cola] = (asyncio.get_running_loop(), set(tablas or TABLAS_OBSERVADAS))
+        return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._clientes.pop(cola, None)
+
+    def clientes(self):
+        with self._lock:
+            return len(self._clientes)
+
+    def recibir(self, cambios):
+        """{tabla: symbols | None} de un commit (hilo del commit o del LISTEN)."""
+        self._entrantes.put(cambios)
+
+    def _emitir(self, tabla, evento):
+        with self._lock:
+            destinos = [(cola, loop) for cola, (loop, tablas) in self._clientes.items() if tabla is None or tabla in tablas]
+        for cola, loop in destinos:
+            try:
+                loop.call_soon_threadsafe(_encolar, cola, evento)
+            except RuntimeError:
+                # El loop del cliente ya cerró
+                self.desuscribir(cola)
+
+    def _juntar(self):
+        # Espera un aviso y junta los que lleguen en los siguientes CAMBIOS_AGRUPAR segundos
+        try:
+            primero = self._entrantes.get(timeout=1)
+        except queue.Empty:
+            return None
+        juntos = {}
+        pendientes = [primero]
+        limite = time.monotonic() + config.CAMBIOS_AGRUPAR
+        while True:
+            for cambios in pendientes:
+                for tabla, symbols in cambios.items():
+                    if symbols is None or (tabla in juntos and juntos[tabla] is None):
+                        juntos[tabla] = None
+                    else:
+                        juntos.setdefault(tabla, set()).update(symbols)
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return juntos
+            try:
+                pendientes = [self._entrantes.get(timeout=restante)]
+            except queue.Empty:
+                return juntos
+
+    def _procesar(self):
+        while not self._detener.is_set():
+            juntos = self._juntar()
+            if not juntos or not self.clientes():
+                continue
+            try:
+                for tabla, symbols in juntos.items():
+                    if symbols is None:
+                        self._emitir(tabla, {"tipo": "reset", "data": {"tabla": tabla}})
+                    else:
+                        self._emitir(tabla, {"tipo": "cambios", "data": self._leer_filas(tabla, symbols)})
+            except Exception as e:
+                traceback.print_exc()
+                print(f"⚠️ Error leyendo cambios: {e}")
+                self._emitir(None, {"tipo": "reset", "data": {"tabla": None}})
+
+    def _leer_filas(self, tabla, symbols, chunk_size=500):
+        # Una consulta por lote para todos los clientes; lo que ya no está se informa como borrado
+        modelo, serializar = SERIALIZADORES[tabla]
+        symbols = sorted(symbols)
+        filas = []
+        db = SessionLocal()
+        try:
+            # Versión antes que las filas: con ?since=version el cliente nunca se salta un cambio
+            version = version_tabla(db, tabla)
+            for i in range(0, len(symbols), chunk_size):
+                filas.extend(db.query(modelo).filter(modelo.symbol.in_(symbols[i:i + chunk_size])).all())
+        finally:
+            db.close()
+        encontrados = {fila.symbol for fila in filas}
+        return {
+            "tabla": tabla,
+            "version": version,
+            "filas": [serializar(fila) for fila in filas],
+            "borrados": [symbol for symbol in symbols if symbol not in encontrados],
+        }
+
+    def _escuchar_postgres(self):
+        # Al reconectar: mientras estuvo caído se pudieron perder avisos
+        escuchar_postgres(self.recibir, self._detener, lambda: self._emitir(None, {"tipo": "reset", "data": {"tabla": None}}))
+
+    def iniciar(self):
+        self._detener.clear()
+        objetivos = [self._procesar]
+        if engine.dialect.name == "postgresql":
+            objetivos.append(self._escuchar_postgres)
+        elif not self._oyente_local:
+            # Sin NOTIFY solo se ven los commits de este proceso
+            al_confirmar_cambios(self.recibir)
+            self._oyente_local = True
+        for objetivo in objetivos:
+            hilo = threading.Thread(target=objetivo, daemon=True, name=f"cambios{objetivo.__name__}")
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self):
+        self._detener.set()
+        # None cierra los streams abiertos
+        self._emitir(None, None)
+        for hilo in self._hilos:
+            hilo.join(timeout=6)
+        self._hilos = []
+
+def escuchar_postgres(recibir, detener, al_reconectar=None):
+    """
+    LISTEN del canal de cambios en una conexión propia (fuera del pool), con reconexión,
+    hasta que se setee `detener`. Llama recibir({tabla: symbols | None}) por cada aviso y
+    al_reconectar() cuando vuelve a conectarse (mientras estuvo caído se pudieron perder avisos).
+    """
+    conectado_antes = False
+    while not detener.is_set():
+        conexion = None
+        try:
+            conexion = engine.raw_connection()
+            conexion.detach()
+            dbapi = conexion.driver_connection
+            dbapi.autocommit = True
+            with dbapi.cursor() as cursor:
+                cursor.execute(f'LISTEN "{config.CAMBIOS_CANAL}"')
+            print(f"📡 Escuchando cambios en el canal {config.CAMBIOS_CANAL}")
+            if conectado_antes and al_reconectar:
+                al_reconectar()
+            conectado_antes = True
+
+            while not detener.is_set():
+                if esperar_lectura([dbapi], [], [], 5) == ([], [], []):
+                    continue
+                dbapi.poll()
+                while dbapi.notifies:
+                    aviso = dbapi.notifies.pop(0)
+                    recibir(leer_payload_cambios(aviso.payload))
+        except Exception as e:
+            print(f"⚠️ LISTEN de cambios caído: {e}. Reintentando en 5s")
+            detener.wait(5)
+        finally:
+            if conexion is not None:
+                conexion.close()
+
+def _encolar(cola, evento):
+    # Corre en el event loop del cliente
+    if cola.full():
+        while not cola.empty():
+            cola.get_nowait()
+        if evento is not None:
+            evento = {"tipo": "reset", "data": {"tabla": None}}
+    cola.put_nowait(evento)
+
+broker = Broker()
+
+def formato_sse(evento):
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento['data'])}\n\n"
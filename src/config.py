@@ -47,3 +47,54 @@ ALERT_TIME_END = os.getenv("ALERT_TIME_END", END_HOUR)
 
 PRINT_OUTPUT = os.getenv("PRINT_OUTPUT", "FALSE").upper() == "TRUE"
 
+# Almacén local de velas (SQLite). Con BAR_STORE=FALSE se descarga siempre la ventana completa.
+BAR_STORE_ENABLED = os.getenv("BAR_STORE", "TRUE").upper() == "TRUE"
+BAR_STORE_PATH = os.getenv("BAR_STORE_PATH", os.path.join("databases", "bar_store.db"))
+
+# Descargas concurrentes a Polygon (cliente async)
+POLYGON_CONCURRENCIA = int(os.getenv("POLYGON_CONCURRENCIA", 8))
+POLYGON_TIMEOUT = float(os.getenv("POLYGON_TIMEOUT", 30))
+# Reintentos ante 429/5xx/timeouts: backoff exponencial con jitter (segundos)
+POLYGON_REINTENTOS = int(os.getenv("POLYGON_REINTENTOS", 4))
+POLYGON_BACKOFF = float(os.getenv("POLYGON_BACKOFF", 1))
+POLYGON_BACKOFF_MAX = float(os.getenv("POLYGON_BACKOFF_MAX", 60))
+# Largo máximo (caracteres) del parámetro tickers en el snapshot multi-ticker
+POLYGON_SNAPSHOT_MAX_URL = int(os.getenv("POLYGON_SNAPSHOT_MAX_URL", 4000))
+
+# Modo bulk 1D: los scans diarios usan grouped daily (una llamada por día) vía bar_store
+DAILY_BULK_MODE = os.getenv("DAILY_BULK", "FALSE").upper() == "TRUE"
+
+# Indicadores 1D incrementales: estado persistido por símbolo (tabla indicator_state).
+# Con INDICADORES_INCREMENTALES=FALSE se recalcula todo el historial en cada scan.
+INDICADORES_INCREMENTALES = os.getenv("INDICADORES_INCREMENTALES", "TRUE").upper() == "TRUE"
+
+# Pool de procesos para los indicadores de los scans: número de workers o AUTO (núcleos
+# del contenedor). Con más de 1 worker cada símbolo se recalcula completo en el pool,
+# sin el estado incremental.
+SCAN_WORKERS = os.getenv("SCAN_WORKERS", "1").upper()
+
+# Hilos para los endpoints síncronos de la API (DB y Polygon fuera del event loop)
+API_THREADS = int(os.getenv("API_THREADS", 40))
+
+# Jobs en segundo plano (/scan-rsi, /api/recalculate_hma): hilos del worker y segundos sin
+# progreso tras los que un job "corriendo" se considera caído (p.ej. reinicio de la instancia)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", 2))
+JOBS_TIMEOUT_INACTIVO = int(os.getenv("JOBS_TIMEOUT_INACTIVO", 900))
+
+# Feed de cambios en vivo (/api/cambios): canal de LISTEN/NOTIFY en Postgres, espera (s) para
+# juntar cambios seguidos en un solo evento y eventos pendientes por cliente antes de pedirle recargar
+CAMBIOS_CANAL = os.getenv("CAMBIOS_CANAL", "cambios_tablas")
+CAMBIOS_AGRUPAR = float(os.getenv("CAMBIOS_AGRUPAR", 0.25))
+CAMBIOS_COLA_MAX = int(os.getenv("CAMBIOS_COLA_MAX", 100))
+
+# Delta-sync (?since=): días que se guardan los tombstones de filas borradas
+TOMBSTONES_DIAS = int(os.getenv("TOMBSTONES_DIAS", 7))
+
+# Ingesta en vivo (python -m src.alert_stream): WebSocket de agregados por minuto de Polygon
+# (o el servidor falso de src/script/servidor_stream_falso.py), segundos entre escrituras de
+# precios/métricas a la base y entre relecturas de favoritos y seguidos (altas, bajas, niveles)
+STREAM_URL = os.getenv("STREAM_URL", "wss://socket.polygon.io/stocks")
+STREAM_GUARDAR_CADA = float(os.getenv("STREAM_GUARDAR_CADA", 5))
+STREAM_RECARGAR_CADA = float(os.getenv("STREAM_RECARGAR_CADA", 60))
+# Si se define, cada agregado recibido se agrega a este archivo JSONL (lo reproduce el servidor falso)
+STREAM_GRABAR = os.getenv("STREAM_GRABAR")
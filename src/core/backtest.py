@@ -0,0 +1,160 @@
+import itertools
+import numpy as np
+import pandas as pd
+from src.core.panel import Panel
+from src.core import bar_store
+
+# Backtest vectorizado de las reglas 1D sobre un Panel (símbolos x velas, ver panel.py):
+# las señales se calculan para todas las velas de todos los símbolos de una vez y las
+# operaciones salen de los tramos con posición abierta, sin recorrer velas en Python.
+# - Cruce HMA (regla_cruce_hma): entra en la vela en que hma_a cruza sobre hma_b y sale
+#   en la que vuelve a quedar debajo (estado cruce_alcista -> cruce_bajista).
+# - Entrada RSI (scan RSI_1D): entra cuando el RSI queda <= límite (con 20 velas o más). La
+#   app no cierra esas entradas; aquí se sale cuando el RSI vuelve a `rsi_salida`.
+# Entradas y salidas al cierre de la vela de la señal. Cada operación trae min_price y
+# candles_since_min desde la entrada hasta la salida, igual que estadisticas_desde_entrada.
+
+COLUMNAS_OPERACIONES = [
+    "symbol", "regla", "entrada", "salida", "abierta", "precio_entrada", "precio_salida",
+    "velas", "retorno", "min_price", "candles_since_min", "drawdown",
+]
+
+def panel_bar_store(symbols, desde=None):
+    """Panel 1D de los símbolos con las velas guardadas en bar_store (desde YYYY-MM-DD)."""
+    return Panel.desde_largo(bar_store.leer_velas_largas(symbols, "1D", desde=desde))
+
+def _rellenar_adelante(estado):
+    # ffill por fila de una matriz con NaN (lo previo a la primera señal queda NaN)
+    columnas = np.where(~np.isnan(estado), np.arange(estado.shape[1])[None, :], 0)
+    np.maximum.accumulate(columnas, axis=1, out=columnas)
+    return estado[np.arange(estado.shape[0])[:, None], columnas]
+
+def operaciones(panel, posicion, regla, entrada_valida=None):
+    """
+    Operaciones de los tramos con `posicion` True (matriz símbolos x velas que incluye la vela
+    de entrada). La salida es la primera vela sin posición; si no la hay, la operación queda
+    abierta y se valoriza al último cierre (salida = última vela). `entrada_valida` (matriz bool) descarta los tramos
+    que no empiezan con una señal real (p.ej. el primer tramo de un estado sin cruce previo).
+    """
+    S, B = panel.close.shape
+    p = np.asarray(posicion, dtype=bool) & panel.activo
+    bordes = np.diff(np.pad(p, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    filas, inicio = np.nonzero(bordes == 1)
+    _, fin = np.nonzero(bordes == -1)
+    if entrada_valida is not None:
+        validas = entrada_valida[filas, inicio]
+        filas, inicio, fin = filas[validas], inicio[validas], fin[validas]
+    if not len(filas):
+        return pd.DataFrame(columns=COLUMNAS_OPERACIONES)
+
+    abierta = fin == B
+    salida = np.where(abierta, B - 1, fin)
+    precio_entrada = panel.close[filas, inicio]
+    precio_salida = panel.close[filas, salida]
+
+    # Mínimo desde la entrada hasta la salida (inclusive) y velas desde ese mínimo
+    largos = salida - inicio + 1
+    offsets = np.cumsum(largos) - largos
+    tramo = np.repeat(np.arange(len(filas)), largos)
+    posicion_en_tramo = np.arange(largos.sum()) - np.repeat(offsets, largos)
+    valores = panel.close[filas[tramo], inicio[tramo] + posicion_en_tramo]
+    minimo = np.fmin.reduceat(valores, offsets)
+    primero = np.minimum.reduceat(np.where(valores == minimo[tramo], posicion_en_tramo, B), offsets)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        retorno = (precio_salida / precio_entrada - 1) * 100
+        drawdown = (minimo / precio_entrada - 1) * 100
+    return pd.DataFrame({
+        "symbol": np.asarray(panel.symbols, dtype=object)[filas],
+        "regla": regla,
+        "entrada": pd.to_datetime(panel.t[filas, inicio], utc=True),
+        "salida": pd.to_datetime(panel.t[filas, salida], utc=True),
+        "abierta": abierta,
+        "precio_entrada": precio_entrada,
+        "precio_salida": precio_salida,
+        "velas": salida - inicio,
+        "retorno": retorno,
+        "min_price": minimo,
+        "candles_since_min": salida - (inicio + primero),
+        "drawdown": drawdown,
+    })
+
+def backtest_cruce_hma(panel, hma_a=None, hma_b=None):
+    """Operaciones de la regla de cruce HMA con largos hma_a/hma_b (por defecto HMA_A/HMA_B)."""
+    from src.config import HMA_A, HMA_B
+    a = panel.hma(hma_a or HMA_A)
+    b = panel.hma(hma_b or HMA_B)
+    with np.errstate(invalid="ignore"):
+        alcista = a >= b
+    valido = ~np.isnan(a) & ~np.isnan(b)
+    # Solo cuenta como entrada si la vela previa ya tenía HMAs y estaba debajo
+    previo_valido = np.pad(valido[:, :-1], ((0, 0), (1, 0)))
+    return operaciones(panel, alcista, "cruce_hma", entrada_valida=previo_valido)
+
+def backtest_rsi(panel, limite=None, rsi_salida=50, min_velas=20):
+    """Operaciones de la regla de entrada RSI_1D (RSI <= limite, por defecto LIMITE_RSI_1D)."""
+    from src.config import LIMITE_RSI_1D
+    limite = LIMITE_RSI_1D if limite is None else limite
+    if "RSI" not in panel.columnas:
+        panel.calcular(["RSI"])
+    rsi = panel.columnas["RSI"]
+    B = rsi.shape[1]
+    # El scan no analiza símbolos con menos de min_velas velas
+    suficientes = np.arange(B)[None, :] >= (B - panel.conteos + min_velas - 1)[:, None]
+    with np.errstate(invalid="ignore"):
+        entra = (rsi <= limite) & suficientes
+        sale = rsi >= rsi_salida
+    # Histéresis: la posición se abre al entrar y sigue hasta la primera vela de salida
+    estado = _rellenar_adelante(np.where(entra, 1.0, np.where(sale, 0.0, np.nan)))
+    return operaciones(panel, estado == 1.0, "rsi")
+
+def resumen(ops):
+    """
+    Estadísticas por símbolo (DataFrame) y agregadas (dict) de las operaciones. Retornos,
+    drawdowns y ganadoras en %; retorno_total compone las operaciones de cada símbolo.
+    """
+    if ops.empty:
+        return pd.DataFrame(), {"operaciones": 0}
+    ops = ops.assign(ganadora=ops["retorno"] > 0, factor=1 + ops["retorno"] / 100)
+    por_simbolo = ops.groupby("symbol").agg(
+        operaciones=("retorno", "size"),
+        ganadoras=("ganadora", "mean"),
+        retorno_medio=("retorno", "mean"),
+        factor=("factor", "prod"),
+        velas_medias=("velas", "mean"),
+        drawdown_medio=("drawdown", "mean"),
+        peor_drawdown=("drawdown", "min"),
+        candles_since_min_medio=("candles_since_min", "mean"),
+    )
+    por_simbolo["ganadoras"] *= 100
+    por_simbolo["retorno_total"] = (por_simbolo.pop("factor") - 1) * 100
+
+    ganancias = ops.loc[ops["retorno"] > 0, "retorno"].sum()
+    perdidas = -ops.loc[ops["retorno"] < 0, "retorno"].sum()
+    total = {
+        "operaciones": int(len(ops)),
+        "simbolos": int(ops["symbol"].nunique()),
+        "abiertas": int(ops["abierta"].sum()),
+        "ganadoras": float(ops["ganadora"].mean() * 100),
+        "retorno_medio": float(ops["retorno"].mean()),
+        "retorno_mediano": float(ops["retorno"].median()),
+        "profit_factor": float(ganancias / perdidas) if perdidas else float("inf"),
+        "velas_medias": float(ops["velas"].mean()),
+        "drawdown_medio": float(ops["drawdown"].mean()),
+        "candles_since_min_medio": float(ops["candles_since_min"].mean()),
+    }
+    return por_simbolo, total
+
+def barrer(panel, hma_a=(), hma_b=(), limites=(), rsi_salida=50):
+    """
+    Grilla de parámetros: cada combinación hma_a < hma_b de la regla HMA y cada límite de la
+    regla RSI. Los indicadores se calculan una vez por largo (Panel.hma) y una vez el RSI.
+    Retorna un DataFrame con una fila por combinación y las estadísticas agregadas.
+    """
+    filas = []
+    for a, b in itertools.product(hma_a, hma_b):
+        if a < b:
+            filas.append({"regla": "cruce_hma", "hma_a": a, "hma_b": b, **resumen(backtest_cruce_hma(panel, a, b))[1]})
+    for limite in limites:
+        filas.append({"regla": "rsi", "limite": limite, "rsi_salida": rsi_salida, **resumen(backtest_rsi(panel, limite, rsi_salida))[1]})
+    return pd.DataFrame(filas)
@@ -0,0 +1,297 @@
+import os
+import sqlite3
+import pandas as pd
+from src.config import BAR_STORE_PATH
+
+# Almacén local de velas OHLCV por (símbolo, intervalo).
+# Se guarda en un archivo SQLite independiente de la base de la app para que
+# los scans y crons lo lean antes de ir a Polygon.
+
+_COLUMNAS = ["datetime", "open", "high", "low", "close", "volume"]
+
+# Límite de parámetros por consulta (SQLite viejo: 999)
+_SYMBOLS_POR_CONSULTA = 900
+
+# Fila de `series` con la cobertura de grouped daily (vale para todos los símbolos)
+SERIE_GROUPED = "*"
+
+# Versión del esquema/datos (PRAGMA user_version). 1: velas 1D con clave de sesión.
+_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol    TEXT    NOT NULL,
+    intervalo TEXT    NOT NULL,
+    t         INTEGER NOT NULL,
+    open      REAL,
+    high      REAL,
+    low       REAL,
+    close     REAL,
+    volume    REAL,
+    PRIMARY KEY (symbol, intervalo, t)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS series (
+    symbol    TEXT NOT NULL,
+    intervalo TEXT NOT NULL,
+    desde     TEXT NOT NULL,
+    PRIMARY KEY (symbol, intervalo)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS grouped_days (
+    fecha TEXT PRIMARY KEY,
+    filas INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_inicializado = False
+
+def _conectar():
+    global _inicializado
+    if not _inicializado:
+        carpeta = os.path.dirname(BAR_STORE_PATH)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+    conn = sqlite3.connect(BAR_STORE_PATH, timeout=30)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if not _inicializado:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < _VERSION:
+            _normalizar_claves_1d(conn)
+        _inicializado = True
+    return conn
+
+def _a_ms(fecha):
+    return int(pd.Timestamp(fecha, tz="UTC").value // 1_000_000)
+
+def clave_sesion_1d(fechas):
+    """
+    Clave de las velas 1D: la fecha de la sesión a las 00:00 America/New_York (en UTC).
+    Los agregados por rango marcan el inicio de la sesión y grouped daily el cierre;
+    con esta clave los dos caen en la misma fila.
+    """
+    fechas = pd.DatetimeIndex(pd.to_datetime(fechas, utc=True))
+    return fechas.tz_convert("America/New_York").normalize().tz_convert("UTC")
+
+def _t_velas(intervalo, fechas):
+    fechas = clave_sesion_1d(fechas) if intervalo == "1D" else pd.DatetimeIndex(pd.to_datetime(fechas, utc=True))
+    return (fechas.as_unit("ns").asi8 // 1_000_000).tolist()
+
+def _normalizar_claves_1d(conn):
+    # Una sola vez: las velas 1D guardadas con el t de grouped daily (cierre de la sesión)
+    # pasan a la clave de sesión. Si el día ya estaba por rango, se conserva esa vela.
+    filas = conn.execute("SELECT symbol, t FROM bars WHERE intervalo = '1D'").fetchall()
+    cambios = []
+    if filas:
+        df = pd.DataFrame(filas, columns=["symbol", "t"])
+        df["clave"] = _t_velas("1D", pd.to_datetime(df["t"], unit="ms", utc=True))
+        df = df[df["t"] != df["clave"]]
+        cambios = list(zip(df["clave"].tolist(), df["symbol"].tolist(), df["t"].tolist()))
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO bars SELECT symbol, intervalo, ?, open, high, low, close, volume "
+            "FROM bars WHERE symbol = ? AND intervalo = '1D' AND t = ?",
+            cambios,
+        )
+        conn.executemany("DELETE FROM bars WHERE intervalo = '1D' AND symbol = ? AND t = ?", [(s, t) for _, s, t in cambios])
+        conn.execute(f"PRAGMA user_version = {_VERSION}")
+    if cambios:
+        print(f"🗃️ bar_store: {len(cambios)} velas 1D de grouped daily llevadas a la clave de sesión")
+
+def leer_velas(symbol, intervalo, desde=None):
+    """
+    Devuelve las velas guardadas (mismas columnas que obtener_velas_polygon).
+    Si se pasa `desde` (YYYY-MM-DD) solo se devuelven velas desde esa fecha.
+    """
+    sql = "SELECT t, open, high, low, close, volume FROM bars WHERE symbol = ? AND intervalo = ?"
+    params = [symbol, intervalo]
+    if desde:
+        sql += " AND t >= ?"
+        params.append(_a_ms(desde))
+    sql += " ORDER BY t"
+
+    conn = _conectar()
+    try:
+        filas = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    df = pd.DataFrame(filas, columns=["t", "open", "high", "low", "close", "volume"])
+    df["datetime"] = pd.to_datetime(df["t"], unit="ms", utc=True)
+    return df[_COLUMNAS].copy()
+
+def leer_velas_largas(symbols, intervalo, desde=None):
+    """
+    Lee las velas de varios símbolos en formato largo (symbol + columnas de velas),
+    ordenadas por símbolo y fecha. Los símbolos se filtran en SQL, por lotes.
+    """
+    symbols = sorted(set(symbols))
+    filas = []
+    conn = _conectar()
+    try:
+        for i in range(0, len(symbols), _SYMBOLS_POR_CONSULTA):
+            lote = symbols[i:i + _SYMBOLS_POR_CONSULTA]
+            sql = (
+                "SELECT symbol, t, open, high, low, close, volume FROM bars "
+                f"WHERE intervalo = ? AND symbol IN ({', '.join('?' * len(lote))})"
+            )
+            params = [intervalo, *lote]
+            if desde:
+                sql += " AND t >= ?"
+                params.append(_a_ms(desde))
+            # Lotes en orden de símbolo: concatenados quedan ordenados por symbol, t
+            filas.extend(conn.execute(sql + " ORDER BY symbol, t", params).fetchall())
+    finally:
+        conn.close()
+
+    df = pd.DataFrame(filas, columns=["symbol", "t", "open", "high", "low", "close", "volume"])
+    df["datetime"] = pd.to_datetime(df["t"], unit="ms", utc=True)
+    return df[["symbol"] + _COLUMNAS].reset_index(drop=True)
+
+def leer_velas_multiples(symbols, intervalo, desde=None):
+    """
+    Lee en una sola consulta las velas de varios símbolos. Retorna {symbol: df}.
+    """
+    df = leer_velas_largas(symbols, intervalo, desde)
+    historias = {}
+    for symbol, grupo in df.groupby("symbol", sort=False):
+        historias[symbol] = grupo[_COLUMNAS].reset_index(drop=True)
+    return historias
+
+def cobertura(symbol, intervalo):
+    """
+    Retorna (desde, ultima_vela) de la serie guardada, o (None, None) si no hay.
+    `desde` es la fecha de inicio pedida en la última descarga completa; para las series
+    1D que solo llenó grouped daily es el inicio de la cobertura de grouped daily.
+    """
+    conn = _conectar()
+    try:
+        fila = conn.execute(
+            "SELECT desde FROM series WHERE symbol = ? AND intervalo = ?", (symbol, intervalo)
+        ).fetchone()
+        if not fila and intervalo == "1D":
+            fila = conn.execute(
+                "SELECT desde FROM series WHERE symbol = ? AND intervalo = '1D'", (SERIE_GROUPED,)
+            ).fetchone()
+        ultima = conn.execute(
+            "SELECT MAX(t) FROM bars WHERE symbol = ? AND intervalo = ?", (symbol, intervalo)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    if not fila or ultima[0] is None:
+        return None, None
+    return fila[0], pd.to_datetime(ultima[0], unit="ms", utc=True)
+
+def guardar_velas(symbol, intervalo, df, desde=None):
+    """
+    Inserta o reemplaza velas (upsert por timestamp).
+    Si se pasa `desde`, se registra como nuevo inicio de cobertura de la serie.
+    """
+    if df.empty and not desde:
+        return
+
+    filas = list(zip(
+        [symbol] * len(df), [intervalo] * len(df), _t_velas(intervalo, df["datetime"]),
+        df["open"].astype(float).tolist(), df["high"].astype(float).tolist(),
+        df["low"].astype(float).tolist(), df["close"].astype(float).tolist(),
+        df["volume"].astype(float).tolist(),
+    ))
+
+    conn = _conectar()
+    try:
+        with conn:
+            if desde:
+                # Descarga completa: la serie anterior se descarta (p.ej. tras un split)
+                conn.execute("DELETE FROM bars WHERE symbol = ? AND intervalo = ?", (symbol, intervalo))
+                conn.execute(
+                    "INSERT OR REPLACE INTO series (symbol, intervalo, desde) VALUES (?, ?, ?)",
+                    (symbol, intervalo, desde),
+                )
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas)
+    finally:
+        conn.close()
+
+def guardar_grouped_daily(df):
+    """
+    Reparte las filas de un día de grouped daily (columna `symbol`) en las series 1D.
+    """
+    if not df.empty:
+        filas = list(zip(
+            df["symbol"].tolist(), ["1D"] * len(df), _t_velas("1D", df["datetime"]),
+            df["open"].astype(float).tolist(), df["high"].astype(float).tolist(),
+            df["low"].astype(float).tolist(), df["close"].astype(float).tolist(),
+            df["volume"].astype(float).tolist(),
+        ))
+    else:
+        filas = []
+
+    conn = _conectar()
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas)
+    finally:
+        conn.close()
+
+def marcar_dia_grouped(fecha, filas):
+    """
+    Registra un día de grouped daily ya cerrado (feriados quedan con 0 filas).
+    """
+    conn = _conectar()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO grouped_days (fecha, filas) VALUES (?, ?)", (fecha, filas))
+    finally:
+        conn.close()
+
+def marcar_cobertura_grouped(desde):
+    """Registra que grouped daily cubre todos los días hábiles desde `desde` (se queda con el más viejo)."""
+    conn = _conectar()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO series (symbol, intervalo, desde) VALUES (?, '1D', ?) "
+                "ON CONFLICT (symbol, intervalo) DO UPDATE SET desde = MIN(desde, excluded.desde)",
+                (SERIE_GROUPED, desde),
+            )
+    finally:
+        conn.close()
+
+def leer_dia_1d(fecha):
+    """Velas 1D guardadas de todos los símbolos para la sesión `fecha` (YYYY-MM-DD): symbol, open, close."""
+    t = _t_velas("1D", [pd.Timestamp(fecha, tz="America/New_York")])[0]
+    conn = _conectar()
+    try:
+        filas = conn.execute("SELECT symbol, open, close FROM bars WHERE intervalo = '1D' AND t = ?", (t,)).fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame(filas, columns=["symbol", "open", "close"])
+
+def ultimo_dia_grouped():
+    """Último día de grouped daily ya cerrado y con filas, o None."""
+    conn = _conectar()
+    try:
+        return conn.execute("SELECT MAX(fecha) FROM grouped_days WHERE filas > 0").fetchone()[0]
+    finally:
+        conn.close()
+
+def dias_grouped_cargados():
+    conn = _conectar()
+    try:
+        return {fila[0] for fila in conn.execute("SELECT fecha FROM grouped_days")}
+    finally:
+        conn.close()
+
+def borrar_velas(symbol, intervalo=None):
+    conn = _conectar()
+    try:
+        with conn:
+            if intervalo:
+                conn.execute("DELETE FROM bars WHERE symbol = ? AND intervalo = ?", (symbol, intervalo))
+                conn.execute("DELETE FROM series WHERE symbol = ? AND intervalo = ?", (symbol, intervalo))
+            else:
+                conn.execute("DELETE FROM bars WHERE symbol = ?", (symbol,))
+                conn.execute("DELETE FROM series WHERE symbol = ?", (symbol,))
+    finally:
+        conn.close()
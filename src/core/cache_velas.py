@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Cache de velas por ejecución (un job, un script o un request): cada
+# (símbolo, intervalo, rango) se descarga una sola vez aunque varias reglas lo pidan.
+# Vive en un ContextVar, así que solo lo ven las llamadas hechas dentro del bloque
+# `cache_de_ejecucion` (y los hilos/tareas que copian ese contexto).
+
+_cache_actual = ContextVar("cache_velas", default=None)
+
+class CacheVelas:
+    """
+    {(symbol, intervalo, desde, hasta): Future con el DataFrame}.
+    Single-flight: si dos llamadas piden la misma serie a la vez, la segunda espera
+    el resultado de la primera en vez de descargar de nuevo. Los errores no se cachean.
+    """
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.en_vuelo = 0  # hits que esperaron una descarga todavía en curso
+
+    def _reservar(self, clave):
+        # Retorna (futuro, es_dueño): el dueño descarga, el resto espera el futuro
+        with self._lock:
+            futuro = self._entradas.get(clave)
+            if futuro is not None:
+                self.hits += 1
+                if not futuro.done():
+                    self.en_vuelo += 1
+                return futuro, False
+            futuro = Future()
+            self._entradas[clave] = futuro
+            self.misses += 1
+            return futuro, True
+
+    def _resolver(self, clave, futuro, df=None, error=None):
+        if error is not None:
+            with self._lock:
+                self._entradas.pop(clave, None)
+            futuro.set_exception(error)
+        else:
+            futuro.set_result(df)
+
+    def obtener(self, clave, descargar):
+        """Versión síncrona: `descargar()` retorna el DataFrame."""
+        futuro, dueno = self._reservar(clave)
+        if dueno:
+            try:
+                df = descargar()
+            except Exception as e:
+                self._resolver(clave, futuro, error=e)
+                raise
+            self._resolver(clave, futuro, df)
+        # Copia: las reglas modifican el df (vela simulada de hoy)
+        return futuro.result().copy()
+
+    async def obtener_async(self, clave, descargar):
+        """Versión async: `descargar()` retorna una corutina con el DataFrame."""
+        futuro, dueno = self._reservar(clave)
+        if dueno:
+            try:
+                df = await descargar()
+            except BaseException as e:
+                # Cancelación incluida: quien espere no debe quedar colgado
+                self._resolver(clave, futuro, error=e if isinstance(e, Exception) else RuntimeError("Descarga cancelada"))
+                raise
+            self._resolver(clave, futuro, df)
+            return df.copy()
+        return (await asyncio.wrap_future(futuro)).copy()
+
+    def resumen(self):
+        return f"📦 Cache de velas [{self.nombre}]: {self.hits} hits ({self.en_vuelo} en vuelo), {self.misses} misses"
+
+def cache_actual():
+    return _cache_actual.get()
+
+@contextmanager
+def cache_de_ejecucion(nombre):
+    """
+    Activa el cache de velas para el bloque. Si ya hay uno activo (p.ej. un scan
+    encadenado dentro de otro job) se reutiliza y el resumen lo imprime el bloque externo.
+    """
+    cache = _cache_actual.get()
+    if cache is not None:
+        yield cache
+        return
+
+    cache = CacheVelas(nombre)
+    token = _cache_actual.set(cache)
+    try:
+        yield cache
+    finally:
+        _cache_actual.reset(token)
+        print(cache.resumen())
@@ -0,0 +1,202 @@
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from src import config
+
+# Ejecutor de scans: aplica la función de cada regla (indicadores + fila) por símbolo
+# en un pool de procesos. Las velas de cada lote viajan en memoria compartida, no
+# pickleadas por tarea; cada worker devuelve solo el resultado compacto y el proceso
+# padre hace las escrituras en la base.
+
+_PRECIOS = ["open", "high", "low", "close", "volume"]
+
+def _cuota_cgroup():
+    """Núcleos permitidos por la cuota de CPU del contenedor (cgroup v2 o v1), o None."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            return math.ceil(int(cuota) / int(periodo))
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            cuota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            periodo = int(f.read())
+        if cuota > 0 and periodo > 0:
+            return math.ceil(cuota / periodo)
+    except (OSError, ValueError):
+        pass
+    return None
+
+def cpus_disponibles():
+    """CPUs utilizables: afinidad del proceso, limitada por la cuota del cgroup."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    cuota = _cuota_cgroup()
+    if cuota:
+        cpus = min(cpus, cuota)
+    return max(1, cpus)
+
+def workers_scan():
+    """Workers del pool según SCAN_WORKERS (AUTO = cpus_disponibles())."""
+    if config.SCAN_WORKERS == "AUTO":
+        return cpus_disponibles()
+    return max(1, int(config.SCAN_WORKERS))
+
+def _contexto():
+    # forkserver: los scans corren con threads vivos (descargas async), fork no es seguro
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+class _LoteCompartido:
+    """Velas de un lote de símbolos en dos bloques de memoria compartida (precios y timestamps)."""
+    def __init__(self, historias):
+        self.series = []  # (symbol, intervalo, inicio, fin)
+        total = 0
+        for symbol, dfs in historias.items():
+            for intervalo, df in dfs.items():
+                self.series.append((symbol, intervalo, total, total + len(df)))
+                total += len(df)
+        self.total = total
+
+        self.shm_precios = shared_memory.SharedMemory(create=True, size=max(total * len(_PRECIOS) * 8, 1))
+        self.shm_t = shared_memory.SharedMemory(create=True, size=max(total * 8, 1))
+        precios = np.ndarray((total, len(_PRECIOS)), dtype=np.float64, buffer=self.shm_precios.buf)
+        t = np.ndarray((total,), dtype=np.int64, buffer=self.shm_t.buf)
+        for symbol, intervalo, inicio, fin in self.series:
+            df = historias[symbol][intervalo]
+            if fin == inicio:
+                continue
+            fechas = df["datetime"]
+            if not isinstance(fechas.dtype, pd.DatetimeTZDtype) or fechas.dt.tz is None:
+                fechas = pd.to_datetime(fechas, utc=True)
+            if fechas.dt.unit != "ns":
+                fechas = fechas.dt.as_unit("ns")
+            t[inicio:fin] = fechas.astype("int64").to_numpy()
+            # Columna por columna: df[_PRECIOS].to_numpy() consolida bloques y es ~10x más lento
+            for j, columna in enumerate(_PRECIOS):
+                serie = df[columna]
+                if serie.dtype == object:
+                    serie = pd.to_numeric(serie, errors="coerce")
+                precios[inicio:fin, j] = serie.to_numpy(dtype=np.float64)
+        del precios, t
+        self.pendientes = 0
+
+    def descriptor(self, symbols):
+        symbols = set(symbols)
+        return (self.shm_precios.name, self.shm_t.name, self.total,
+                [serie for serie in self.series if serie[0] in symbols])
+
+    def liberar(self):
+        for shm in (self.shm_precios, self.shm_t):
+            shm.close()
+            shm.unlink()
+
+def _leer_lote(descriptor):
+    """En el worker: reconstruye {symbol: {intervalo: df}} copiando desde la memoria compartida."""
+    nombre_precios, nombre_t, total, series = descriptor
+    # Los workers comparten el resource tracker del padre, que es quien hace unlink
+    shm_precios = shared_memory.SharedMemory(name=nombre_precios)
+    shm_t = shared_memory.SharedMemory(name=nombre_t)
+    try:
+        precios = np.ndarray((total, len(_PRECIOS)), dtype=np.float64, buffer=shm_precios.buf)
+        t = np.ndarray((total,), dtype=np.int64, buffer=shm_t.buf)
+        historias = {}
+        for symbol, intervalo, inicio, fin in series:
+            df = pd.DataFrame(precios[inicio:fin].copy(), columns=_PRECIOS)
+            df.insert(0, "datetime", pd.DatetimeIndex(t[inicio:fin].copy().view("M8[ns]")).tz_localize("UTC"))
+            historias.setdefault(symbol, {})[intervalo] = df
+        del precios, t
+        return historias
+    finally:
+        shm_precios.close()
+        shm_t.close()
+
+def _ejecutar_tarea(funcion, descriptor, extras, kwargs):
+    resultados = []
+    for symbol, dfs in _leer_lote(descriptor).items():
+        try:
+            resultados.append((symbol, funcion(symbol, dfs, extras.get(symbol), **kwargs), None))
+        except Exception as e:
+            # Solo el texto: no todas las excepciones se pueden des-picklear en el padre
+            resultados.append((symbol, None, f"{type(e).__name__}: {e}"))
+    return resultados
+
+def _recoger(pendientes, esperar):
+    futuros = as_completed(list(pendientes)) if esperar else [f for f in list(pendientes) if f.done()]
+    for futuro in futuros:
+        lote = pendientes.pop(futuro)
+        lote.pendientes -= 1
+        if lote.pendientes == 0:
+            lote.liberar()
+        for symbol, resultado, error in futuro.result():
+            yield symbol, resultado, RuntimeError(error) if error else None
+
+def mapear_velas(fuente, funcion, extras=None, workers=None, lote=500, **kwargs):
+    """
+    Consume (symbol, dfs, error) de `fuente` (iterar_velas_1d / iterar_velas_concurrente)
+    y aplica funcion(symbol, dfs, extras.get(symbol), **kwargs) a cada símbolo.
+    Entrega (symbol, resultado, error) a medida que terminan.
+
+    Con workers > 1 los símbolos se agrupan en lotes de `lote`, cuyas velas se copian una
+    vez a memoria compartida, y se reparten en un pool de procesos mientras siguen las
+    descargas. `funcion` debe ser de nivel de módulo y su resultado/kwargs pickleables.
+    Con un worker se ejecuta en el mismo proceso.
+    """
+    extras = extras or {}
+    workers = workers or workers_scan()
+
+    if workers <= 1:
+        for symbol, dfs, error in fuente:
+            if error:
+                yield symbol, None, error
+                continue
+            try:
+                yield symbol, funcion(symbol, dfs, extras.get(symbol), **kwargs), None
+            except Exception as e:
+                yield symbol, None, e
+        return
+
+    pendientes = {}  # futuro -> lote
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_contexto()) as pool:
+        def enviar(historias):
+            compartido = _LoteCompartido(historias)
+            symbols = list(historias)
+            tamano = max(1, math.ceil(len(symbols) / (workers * 2)))
+            for i in range(0, len(symbols), tamano):
+                parte = symbols[i:i + tamano]
+                futuro = pool.submit(
+                    _ejecutar_tarea, funcion, compartido.descriptor(parte),
+                    {symbol: extras.get(symbol) for symbol in parte}, kwargs,
+                )
+                pendientes[futuro] = compartido
+                compartido.pendientes += 1
+
+        try:
+            historias = {}
+            for symbol, dfs, error in fuente:
+                if error:
+                    yield symbol, None, error
+                    continue
+                historias[symbol] = dfs
+                if len(historias) >= lote:
+                    enviar(historias)
+                    historias = {}
+                yield from _recoger(pendientes, esperar=False)
+            if historias:
+                enviar(historias)
+            yield from _recoger(pendientes, esperar=True)
+        finally:
+            for futuro in pendientes:
+                futuro.cancel()
+            for compartido in set(pendientes.values()):
+                compartido.liberar()
@@ -0,0 +1,463 @@
+import copy
+import json
+import math
+import datetime
+from collections import deque
+import numpy as np
+import pandas as pd
+from src.models import IndicadorEstado, precargar_por_simbolo, upsert_por_simbolo
+from src.core.indicators import _wma_valores
+
+# Indicadores con estado que avanzan de a una vela en O(1), equivalentes a las
+# columnas de procesar_indicadores (RSI, RSI_EMA_5/14, hma_a/hma_b, rvol, var,
+# promedio_variacion_3m). El estado se serializa a JSON y se guarda por símbolo
+# en la tabla indicator_state, para que los scans solo procesen las velas nuevas.
+
+NAN = float("nan")
+
+def _es_nan(x):
+    return x is None or x != x
+
+def _clonar(obj):
+    """Copia del estado de un indicador: deques y sub-indicadores nuevos, floats compartidos."""
+    nuevo = copy.copy(obj)
+    for nombre, valor in vars(obj).items():
+        if isinstance(valor, deque):
+            setattr(nuevo, nombre, deque(valor, maxlen=valor.maxlen))
+        elif hasattr(valor, "actualizar"):
+            setattr(nuevo, nombre, _clonar(valor))
+    return nuevo
+
+class EWMIncremental:
+    """
+    Igual que pandas .ewm(...).mean() (ignore_na=False, min_periods=0), un valor por vez.
+    Replica el algoritmo de pandas: estado (weighted, old_wt, nobs).
+    """
+    def __init__(self, com, adjust=True):
+        self.alpha = 1.0 / (1.0 + com)
+        self.adjust = adjust
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    @classmethod
+    def desde_alpha(cls, alpha, adjust=True):
+        # pandas convierte alpha a center of mass y vuelve a alpha = 1 / (1 + com)
+        return cls((1 - alpha) / alpha, adjust)
+
+    @classmethod
+    def desde_span(cls, span, adjust=True):
+        return cls((span - 1) / 2.0, adjust)
+
+    def actualizar(self, x):
+        es_obs = not _es_nan(x)
+        self.nobs += es_obs
+        if not _es_nan(self.weighted):
+            self.old_wt *= 1.0 - self.alpha
+            if es_obs:
+                new_wt = 1.0 if self.adjust else self.alpha
+                if self.weighted != x:
+                    self.weighted = (self.old_wt * self.weighted + new_wt * x) / (self.old_wt + new_wt)
+                self.old_wt = self.old_wt + new_wt if self.adjust else 1.0
+        elif es_obs:
+            self.weighted = x
+        return self.weighted if self.nobs >= 1 else NAN
+
+    def a_dict(self):
+        return [self.weighted, self.old_wt, self.nobs]
+
+    def cargar(self, datos):
+        self.weighted, self.old_wt, self.nobs = datos
+
+class WMAIncremental:
+    """
+    WMA (pesos 1..length) con buffer circular y sumas acumuladas.
+    NaN en el warm-up y en toda ventana que contenga un NaN (igual que _wma_valores).
+    Las sumas se recalculan desde el buffer cada `length` velas para no acumular error.
+    """
+    def __init__(self, length):
+        self.length = int(length)
+        self.buffer = deque(maxlen=max(self.length, 1))
+        self.suma = 0.0
+        self.suma_pond = 0.0
+        self.nans = 0
+        self.pasos = 0
+
+    def _resumar(self):
+        self.suma = sum(0.0 if _es_nan(v) else v for v in self.buffer)
+        self.suma_pond = sum((i + 1) * (0.0 if _es_nan(v) else v) for i, v in enumerate(self.buffer))
+
+    def actualizar(self, x):
+        l = self.length
+        if l < 1:
+            return NAN
+        valor = 0.0 if _es_nan(x) else x
+        if len(self.buffer) == l:
+            sale = self.buffer[0]
+            # Cada valor baja un peso; el más antiguo (peso 1) sale de la ventana
+            self.suma_pond -= self.suma
+            self.suma -= 0.0 if _es_nan(sale) else sale
+            self.nans -= _es_nan(sale)
+            self.suma_pond += l * valor
+        else:
+            self.suma_pond += (len(self.buffer) + 1) * valor
+        self.buffer.append(x)
+        self.suma += valor
+        self.nans += _es_nan(x)
+
+        self.pasos += 1
+        if self.pasos >= l:
+            self.pasos = 0
+            self._resumar()
+
+        if len(self.buffer) < l or self.nans:
+            return NAN
+        return self.suma_pond / (l * (l + 1) / 2.0)
+
+    def a_dict(self):
+        return list(self.buffer)
+
+    def cargar(self, datos):
+        self.buffer = deque(datos, maxlen=max(self.length, 1))
+        self.nans = sum(1 for v in self.buffer if _es_nan(v))
+        self.pasos = 0
+        self._resumar()
+
+class HMAIncremental:
+    def __init__(self, length):
+        self.half = WMAIncremental(int(length / 2))
+        self.full = WMAIncremental(length)
+        self.raiz = WMAIncremental(int(math.floor(math.sqrt(length))))
+
+    def actualizar(self, x):
+        diff = 2 * self.half.actualizar(x) - self.full.actualizar(x)
+        return self.raiz.actualizar(diff)
+
+    def a_dict(self):
+        return [self.half.a_dict(), self.full.a_dict(), self.raiz.a_dict()]
+
+    def cargar(self, datos):
+        self.half.cargar(datos[0])
+        self.full.cargar(datos[1])
+        self.raiz.cargar(datos[2])
+
+class RSIIncremental:
+    """RSI de calcular_rsi: medias de Wilder (ewm alpha=1/periodos, adjust=True) de ganancia/pérdida."""
+    def __init__(self, periodos=14):
+        self.ganancia = EWMIncremental.desde_alpha(1 / periodos)
+        self.perdida = EWMIncremental.desde_alpha(1 / periodos)
+        self.cierre_previo = NAN
+
+    def actualizar(self, close):
+        delta = close - self.cierre_previo
+        self.cierre_previo = close
+        # Igual que delta.where(...): el primer delta (NaN) cuenta como 0
+        avg_g = self.ganancia.actualizar(delta if delta > 0 else 0.0)
+        avg_p = self.perdida.actualizar(-delta if delta < 0 else 0.0)
+        if _es_nan(avg_g) or _es_nan(avg_p):
+            return NAN
+        if avg_p == 0:
+            return NAN if avg_g == 0 else 100.0
+        return 100 - (100 / (1 + avg_g / avg_p))
+
+    def a_dict(self):
+        return [self.ganancia.a_dict(), self.perdida.a_dict(), self.cierre_previo]
+
+    def cargar(self, datos):
+        self.ganancia.cargar(datos[0])
+        self.perdida.cargar(datos[1])
+        self.cierre_previo = datos[2]
+
+class RVOLIncremental:
+    """volume / media móvil de volumen (rolling(periodos, min_periods=1)), con suma acumulada."""
+    def __init__(self, periodos=60):
+        self.periodos = int(periodos)
+        self.buffer = deque(maxlen=self.periodos)
+        self.suma = 0.0
+        self.validos = 0
+        self.pasos = 0
+
+    def _resumar(self):
+        self.suma = sum(v for v in self.buffer if not _es_nan(v))
+        self.validos = sum(1 for v in self.buffer if not _es_nan(v))
+
+    def actualizar(self, volumen):
+        if len(self.buffer) == self.periodos:
+            sale = self.buffer[0]
+            if not _es_nan(sale):
+                self.suma -= sale
+                self.validos -= 1
+        self.buffer.append(volumen)
+        if not _es_nan(volumen):
+            self.suma += volumen
+            self.validos += 1
+
+        self.pasos += 1
+        if self.pasos >= self.periodos:
+            self.pasos = 0
+            self._resumar()
+
+        if _es_nan(volumen) or not self.validos:
+            return NAN
+        promedio = self.suma / self.validos
+        if promedio == 0:
+            return NAN if volumen == 0 else math.inf
+        return volumen / promedio
+
+    def a_dict(self):
+        return list(self.buffer)
+
+    def cargar(self, datos):
+        self.buffer = deque(datos, maxlen=self.periodos)
+        self.pasos = 0
+        self._resumar()
+
+class PromedioVariacionIncremental:
+    """Promedio de |var| en los últimos `meses` (calendario), como promedio_variacion_3m."""
+    def __init__(self, meses=3):
+        self.meses = meses
+        self.ventana = deque()  # (ts en ns, |var|)
+        self.suma = 0.0
+
+    def actualizar(self, ts, var):
+        if not _es_nan(var):
+            self.ventana.append((ts, abs(var)))
+            self.suma += abs(var)
+            inicio = (pd.Timestamp(ts, tz="UTC") - pd.DateOffset(months=self.meses)).value
+            podado = False
+            while self.ventana[0][0] < inicio:
+                self.suma -= self.ventana.popleft()[1]
+                podado = True
+            if podado:
+                self.suma = sum(v for _, v in self.ventana)
+        if not self.ventana:
+            return 0.0
+        return self.suma / len(self.ventana)
+
+    def a_dict(self):
+        return [list(par) for par in self.ventana]
+
+    def cargar(self, datos):
+        self.ventana = deque(tuple(par) for par in datos)
+        self.suma = sum(v for _, v in self.ventana)
+
+class IndicadoresIncrementales:
+    """
+    Conjunto de indicadores 1D de un símbolo.
+    - confirmar(): avanza el estado con una vela cerrada.
+    - previsualizar(): calcula la vela en curso sin modificar el estado.
+    """
+    VERSION = 1
+
+    def __init__(self, hma_a, hma_b, rvol_periodos=60, rsi_periodos=14):
+        self.parametros = {
+            "version": self.VERSION, "hma_a": int(hma_a), "hma_b": int(hma_b),
+            "rvol_periodos": int(rvol_periodos), "rsi_periodos": int(rsi_periodos),
+        }
+        self.rsi = RSIIncremental(rsi_periodos)
+        self.rsi_ema_5 = EWMIncremental.desde_span(5, adjust=False)
+        self.rsi_ema_14 = EWMIncremental.desde_span(14, adjust=False)
+        self.hma_a = HMAIncremental(hma_a)
+        self.hma_b = HMAIncremental(hma_b)
+        self.rvol = RVOLIncremental(rvol_periodos)
+        self.prom_var_3m = PromedioVariacionIncremental()
+        self.ultima_ts = None  # ns de la última vela confirmada
+        self.ultimo = None     # métricas de la última vela confirmada
+        self.previo = None     # métricas de la anterior
+
+    def _avanzar(self, ts, close, volumen):
+        previo = self.ultimo["close"] if self.ultimo else NAN
+        var = (close / previo - 1) * 100 if previo else NAN
+        rsi = self.rsi.actualizar(close)
+        return {
+            "t": ts,
+            "close": close,
+            "RSI": rsi,
+            "RSI_EMA_5": self.rsi_ema_5.actualizar(rsi),
+            "RSI_EMA_14": self.rsi_ema_14.actualizar(rsi),
+            "hma_a": self.hma_a.actualizar(close),
+            "hma_b": self.hma_b.actualizar(close),
+            "rvol": self.rvol.actualizar(volumen),
+            "var": var,
+            "promedio_variacion_3m": self.prom_var_3m.actualizar(ts, var),
+        }
+
+    @classmethod
+    def desde_historial(cls, hma_a, hma_b, ts, close, volumen, rvol_periodos=60, rsi_periodos=14):
+        """
+        Estado tras confirmar todas las velas dadas (listas ordenadas), sin avanzar de a una:
+        WMA/HMA, rvol y la ventana de 3 meses se arman con sus columnas vectorizadas (su
+        estado es la cola de la serie); solo las EWM del RSI se recorren vela por vela.
+        """
+        ind = cls(hma_a, hma_b, rvol_periodos, rsi_periodos)
+        n = len(ts)
+        if n == 0:
+            return ind
+        c = np.asarray(close, dtype=float)
+        v = np.asarray(volumen, dtype=float)
+
+        rsi, ema_5, ema_14 = [], [], []
+        for x in close:
+            valor = ind.rsi.actualizar(x)
+            rsi.append(valor)
+            ema_5.append(ind.rsi_ema_5.actualizar(valor))
+            ema_14.append(ind.rsi_ema_14.actualizar(valor))
+
+        hmas = {}
+        for nombre, length in (("hma_a", hma_a), ("hma_b", hma_b)):
+            hma_inc = getattr(ind, nombre)
+            diff = 2 * _wma_valores(c, hma_inc.half.length) - _wma_valores(c, hma_inc.full.length)
+            hmas[nombre] = _wma_valores(diff, hma_inc.raiz.length)
+            for wma_inc, serie in ((hma_inc.half, c), (hma_inc.full, c), (hma_inc.raiz, diff)):
+                wma_inc.cargar(serie[max(0, n - wma_inc.length):].tolist())
+
+        vol_prom = pd.Series(v).rolling(ind.rvol.periodos, min_periods=1).mean().to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rvol = v / vol_prom
+            previo = np.concatenate(([np.nan], c[:-1]))
+            var = np.where(previo == 0, np.nan, (c / previo - 1) * 100)
+        ind.rvol.cargar(v[max(0, n - ind.rvol.periodos):].tolist())
+
+        # Ventana de |var|: se poda con la última var válida (igual que actualizar)
+        validos = np.flatnonzero(~np.isnan(var))
+        ventana = []
+        if len(validos):
+            inicio = (pd.Timestamp(ts[validos[-1]], tz="UTC") - pd.DateOffset(months=ind.prom_var_3m.meses)).value
+            ventana = [[ts[i], abs(float(var[i]))] for i in validos if ts[i] >= inicio]
+        ind.prom_var_3m.cargar(ventana)
+
+        def metricas(i):
+            # promedio_variacion_3m de la vela i: ventana tal como quedó al confirmarla
+            previos = validos[validos <= i]
+            prom = 0.0
+            if len(previos):
+                inicio = (pd.Timestamp(ts[previos[-1]], tz="UTC") - pd.DateOffset(months=ind.prom_var_3m.meses)).value
+                valores = [abs(var[j]) for j in previos if ts[j] >= inicio]
+                prom = sum(valores) / len(valores)
+            return {
+                "t": ts[i], "close": close[i], "RSI": rsi[i], "RSI_EMA_5": ema_5[i], "RSI_EMA_14": ema_14[i],
+                "hma_a": float(hmas["hma_a"][i]), "hma_b": float(hmas["hma_b"][i]),
+                "rvol": float(rvol[i]), "var": float(var[i]), "promedio_variacion_3m": float(prom),
+            }
+
+        ind.ultima_ts = ts[-1]
+        ind.ultimo = metricas(n - 1)
+        ind.previo = metricas(n - 2) if n > 1 else None
+        return ind
+
+    def confirmar(self, ts, close, volumen):
+        metricas = self._avanzar(ts, close, volumen)
+        self.ultima_ts = ts
+        self.previo, self.ultimo = self.ultimo, metricas
+        return metricas
+
+    def previsualizar(self, ts, close, volumen):
+        return _clonar(self)._avanzar(ts, close, volumen)
+
+    def a_json(self):
+        return json.dumps({
+            "parametros": self.parametros,
+            "ultima_ts": self.ultima_ts,
+            "ultimo": self.ultimo,
+            "previo": self.previo,
+            "rsi": self.rsi.a_dict(),
+            "rsi_ema_5": self.rsi_ema_5.a_dict(),
+            "rsi_ema_14": self.rsi_ema_14.a_dict(),
+            "hma_a": self.hma_a.a_dict(),
+            "hma_b": self.hma_b.a_dict(),
+            "rvol": self.rvol.a_dict(),
+            "prom_var_3m": self.prom_var_3m.a_dict(),
+        })
+
+    @classmethod
+    def desde_json(cls, texto):
+        datos = json.loads(texto)
+        p = datos["parametros"]
+        ind = cls(p["hma_a"], p["hma_b"], p["rvol_periodos"], p["rsi_periodos"])
+        if p.get("version") != cls.VERSION:
+            return ind
+        ind.ultima_ts = datos["ultima_ts"]
+        ind.ultimo = datos["ultimo"]
+        ind.previo = datos["previo"]
+        ind.rsi.cargar(datos["rsi"])
+        ind.rsi_ema_5.cargar(datos["rsi_ema_5"])
+        ind.rsi_ema_14.cargar(datos["rsi_ema_14"])
+        ind.hma_a.cargar(datos["hma_a"])
+        ind.hma_b.cargar(datos["hma_b"])
+        ind.rvol.cargar(datos["rvol"])
+        ind.prom_var_3m.cargar(datos["prom_var_3m"])
+        return ind
+
+def _timestamps(df):
+    fechas = df["datetime"]
+    if not pd.api.types.is_datetime64_any_dtype(fechas):
+        fechas = pd.to_datetime(fechas, utc=True)
+    if fechas.dt.unit != "ns":
+        fechas = fechas.dt.as_unit("ns")
+    return fechas.astype("int64").to_numpy()
+
+def _columna(df, nombre, desde):
+    valores = df[nombre].iloc[desde:]
+    if not pd.api.types.is_numeric_dtype(valores):
+        valores = pd.to_numeric(valores, errors="coerce")
+    return valores.astype(float).tolist()
+
+def avanzar_con_velas(estado, df, rvol_periodos=60):
+    """
+    Lleva el estado hasta la penúltima vela del df (confirmada) y previsualiza la última.
+    `estado` puede ser None, el JSON guardado o un IndicadoresIncrementales.
+    Si el estado no corresponde al df (otros parámetros, o la vela confirmada cambió
+    por un split/corrección), se reconstruye desde el df completo.
+    Retorna (indicadores, ultima, previa) con las métricas de las dos últimas velas.
+    """
+    from src.config import HMA_A, HMA_B
+    t = _timestamps(df)
+    n = len(t)
+
+    ind = IndicadoresIncrementales.desde_json(estado) if isinstance(estado, str) else estado
+    inicio = None
+    if ind is not None and ind.ultima_ts is not None and ind.parametros == IndicadoresIncrementales(HMA_A, HMA_B, rvol_periodos).parametros:
+        # Posición de la última vela confirmada dentro del df (las velas vienen ordenadas)
+        i = int(np.searchsorted(t, ind.ultima_ts))
+        if i < n and t[i] == ind.ultima_ts:
+            cierre = _columna(df, "close", i)[0]
+            if math.isclose(cierre, ind.ultimo["close"], rel_tol=1e-9):
+                inicio = i + 1
+
+    if inicio is None:
+        # Sin estado utilizable: se arma de una vez con todo menos la última vela
+        ts = t.tolist()
+        close = _columna(df, "close", 0)
+        volumen = _columna(df, "volume", 0)
+        ind = IndicadoresIncrementales.desde_historial(HMA_A, HMA_B, ts[:-1], close[:-1], volumen[:-1], rvol_periodos)
+        return ind, ind.previsualizar(ts[-1], close[-1], volumen[-1]), ind.ultimo
+
+    if inicio >= n:
+        # Sin velas nuevas: la última del df ya está confirmada
+        return ind, ind.ultimo, ind.previo
+
+    ts = t[inicio:].tolist()
+    close = _columna(df, "close", inicio)
+    volumen = _columna(df, "volume", inicio)
+    for i in range(len(ts) - 1):
+        ind.confirmar(ts[i], close[i], volumen[i])
+    ultima = ind.previsualizar(ts[-1], close[-1], volumen[-1])
+    return ind, ultima, ind.ultimo
+
+def cargar_estados(db):
+    """Estados guardados (JSON) por símbolo, en una sola consulta."""
+    return {symbol: fila.estado for symbol, fila in precargar_por_simbolo(db, IndicadorEstado, "estado").items()}
+
+def guardar_estados(db, estados):
+    """Upsert de los estados avanzados en esta corrida (los que siguen en JSON no cambiaron). No hace commit."""
+    ahora = datetime.datetime.utcnow()
+    filas = [
+        {
+            "symbol": symbol,
+            "estado": ind.a_json(),
+            "ultima_vela": pd.Timestamp(ind.ultima_ts, tz="UTC").tz_convert(None).to_pydatetime() if ind.ultima_ts is not None else None,
+            "timestamp": ahora,
+        }
+        for symbol, ind in estados.items() if isinstance(ind, IndicadoresIncrementales)
+    ]
+    return upsert_por_simbolo(db, IndicadorEstado, filas, ["estado", "ultima_vela", "timestamp"])
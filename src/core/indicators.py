@@ -11,47 +11,101 @@ def calcular_rsi(df, periodos=14):
     rs = avg_ganancia / avg_perdida
     return 100 - (100 / (1 + rs))
 
+def _wma_valores(valores, length):
+    """
+    WMA (pesos 1..length) sobre un array 1-D mediante convolución.
+    Igual que rolling(length): NaN en el warm-up y en toda ventana que contenga un NaN.
+    """
+    l = int(length)
+    out = np.full(len(valores), np.nan)
+    if l < 1 or len(valores) < l:
+        return out
+    weights = np.arange(1, l + 1, dtype=float)
+    out[l - 1:] = np.convolve(valores, weights[::-1], mode="valid") / weights.sum()
+    return out
+
+def wma(series, length):
+    valores = np.asarray(series, dtype=float)
+    return pd.Series(_wma_valores(valores, length), index=series.index, name=series.name)
+
 def hma(series, length):
-    def wma(s, l):
-        l = int(l)
-        weights = np.arange(1, l + 1)
-        return s.rolling(l).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
-    
+    valores = np.asarray(series, dtype=float)
     half_length = int(length / 2)
     sqrt_length = int(math.floor(math.sqrt(length)))
-    diff = 2 * wma(series, half_length) - wma(series, length)
-    return wma(diff, sqrt_length)
-
-def procesar_indicadores(df, rvol_periodos=60):
-    df = df.copy()
-    cols = ["open","high","low","close","volume"]
-    df[cols] = df[cols].apply(pd.to_numeric, errors="coerce")
+    diff = 2 * _wma_valores(valores, half_length) - _wma_valores(valores, length)
+    return pd.Series(_wma_valores(diff, sqrt_length), index=series.index, name=series.name)
 
-    # RSI + EMAs
-    df["RSI"] = calcular_rsi(df)
-    df["RSI_EMA_5"] = df["RSI"].ewm(span=5, adjust=False).mean()
-    df["RSI_EMA_14"] = df["RSI"].ewm(span=14, adjust=False).mean()
+def _hma_config(nombre):
+    def calcular(df, rvol_periodos):
+        from src.config import HMA_A, HMA_B
+        return hma(df["close"], HMA_A if nombre == "hma_a" else HMA_B)
+    return calcular
 
-    # HMAs
-    df["hma5"] = hma(df["close"], 5)
-    df["hma9"] = hma(df["close"], 9)
-    df["hma90"] = hma(df["close"], 90)
-
-    from src.config import HMA_A, HMA_B
-    df[f"hma_{HMA_A}"] = hma(df["close"], HMA_A)
-    df[f"hma_{HMA_B}"] = hma(df["close"], HMA_B)    
-    
-    # Alias para compatibilidad interna si es necesario, o simplemente usarlos
-    df["hma_a"] = df[f"hma_{HMA_A}"]
-    df["hma_b"] = df[f"hma_{HMA_B}"]
-
-    # RVOL
+def _rvol(df, rvol_periodos):
     vol = df["volume"].astype(float)
     vol_prom = vol.rolling(window=rvol_periodos, min_periods=1).mean()
-    df["rvol"] = vol / vol_prom
-
-    # Variación
-    df["var"] = df["close"].pct_change(fill_method=None) * 100
+    return vol / vol_prom
+
+# Registro de indicadores: columna -> (dependencias, función(df, rvol_periodos)).
+# Las columnas sin función son virtuales: no se guardan en el df, solo declaran
+# qué necesita un cálculo posterior (p.ej. promedio_variacion_3m lee 'var').
+INDICADORES = {
+    "RSI":        ((), lambda df, p: calcular_rsi(df)),
+    "RSI_EMA_5":  (("RSI",), lambda df, p: df["RSI"].ewm(span=5, adjust=False).mean()),
+    "RSI_EMA_14": (("RSI",), lambda df, p: df["RSI"].ewm(span=14, adjust=False).mean()),
+    "hma5":       ((), lambda df, p: hma(df["close"], 5)),
+    "hma9":       ((), lambda df, p: hma(df["close"], 9)),
+    "hma90":      ((), lambda df, p: hma(df["close"], 90)),
+    "hma_a":      ((), _hma_config("hma_a")),
+    "hma_b":      ((), _hma_config("hma_b")),
+    "rvol":       ((), _rvol),
+    "var":        ((), lambda df, p: df["close"].pct_change(fill_method=None) * 100),
+    "promedio_variacion_3m": (("var",), None),
+}
+
+def resolver_indicadores(columnas):
+    """
+    Orden de cálculo para las columnas pedidas, con sus dependencias primero.
+    """
+    orden = []
+    def visitar(nombre):
+        if nombre in orden:
+            return
+        if nombre not in INDICADORES:
+            raise ValueError(f"Indicador desconocido: {nombre}")
+        for dependencia in INDICADORES[nombre][0]:
+            visitar(dependencia)
+        orden.append(nombre)
+
+    for nombre in columnas:
+        visitar(nombre)
+    return orden
+
+def procesar_indicadores(df, rvol_periodos=60, columnas=None, copiar=True):
+    """
+    Calcula las columnas de indicadores sobre el df de velas.
+    - `columnas`: subconjunto a calcular (ver INDICADORES). None = todas, como antes.
+    - `copiar=False`: agrega las columnas sobre el mismo df (el llamador no lo reutiliza).
+    """
+    if copiar:
+        df = df.copy()
+    cols = ["open","high","low","close","volume"]
+    if not all(pd.api.types.is_numeric_dtype(df[c]) for c in cols):
+        df[cols] = df[cols].apply(pd.to_numeric, errors="coerce")
+
+    orden = resolver_indicadores(INDICADORES if columnas is None else columnas)
+    for nombre in orden:
+        calcular = INDICADORES[nombre][1]
+        if calcular is not None:
+            df[nombre] = calcular(df, rvol_periodos)
+
+    if "hma_a" in orden or "hma_b" in orden:
+        # Nombres con el largo configurado (hma_<HMA_A>, hma_<HMA_B>) por compatibilidad
+        from src.config import HMA_A, HMA_B
+        if "hma_a" in orden:
+            df[f"hma_{HMA_A}"] = df["hma_a"]
+        if "hma_b" in orden:
+            df[f"hma_{HMA_B}"] = df["hma_b"]
     return df
 
 def verificar_estado_rsi(df, limite_bajo=35, limite_techo=45, ventana=15):
@@ -92,22 +146,20 @@ def promedio_variacion_3m(df, meses=3):
     if df.empty:
         return 0.0
     
-    # Asegurar que trabajamos con una copia para no afectar el exterior si modificamos el index
-    df = df.copy()
-    
-    # Asegurar DatetimeIndex para que pd.DateOffset funcione correctamente
-    if not isinstance(df.index, pd.DatetimeIndex):
-        if 'datetime' in df.columns:
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            df = df.set_index('datetime')
-        else:
-            # Si no hay forma de tener fecha, no podemos calcular por meses
-            return 0.0
-            
     if 'var' not in df.columns:
         return 0.0
-        
-    var = df[['var']].dropna()
+
+    # Solo se toma la columna 'var' (sin copiar el df completo) con DatetimeIndex
+    # para que pd.DateOffset funcione correctamente
+    if isinstance(df.index, pd.DatetimeIndex):
+        var = df[['var']]
+    elif 'datetime' in df.columns:
+        var = pd.DataFrame({'var': df['var'].to_numpy()}, index=pd.DatetimeIndex(pd.to_datetime(df['datetime'])))
+    else:
+        # Si no hay forma de tener fecha, no podemos calcular por meses
+        return 0.0
+
+    var = var.dropna()
     if var.empty:
         return 0.0
         
@@ -0,0 +1,278 @@
+import math
+import numpy as np
+import pandas as pd
+from src.core.indicators import resolver_indicadores
+
+# Motor de panel: los indicadores de todo el universo como matrices (símbolos x velas).
+# Cada fila tiene las velas de un símbolo alineadas a la derecha: la última columna es
+# siempre la última vela de cada símbolo y el relleno a la izquierda es NaN (inactivo).
+# Los resultados coinciden con procesar_indicadores aplicado símbolo por símbolo.
+
+_SIN_FECHA = np.iinfo(np.int64).min
+
+def _ewm_matriz(X, activo, com, adjust=True):
+    """
+    pandas .ewm(com=..., adjust=...).mean() por fila, avanzando columna a columna.
+    Las posiciones inactivas (relleno) no cuentan como observación ni como NaN.
+    """
+    alpha = 1.0 / (1.0 + com)
+    new_wt = 1.0 if adjust else alpha
+    S, B = X.shape
+    weighted = np.full(S, np.nan)
+    old_wt = np.ones(S)
+    nobs = np.zeros(S, dtype=np.int64)
+    out = np.full((S, B), np.nan)
+    for j in range(B):
+        x = X[:, j]
+        act = activo[:, j]
+        obs = act & ~np.isnan(x)
+        valido = ~np.isnan(weighted)
+
+        decae = act & valido
+        old_wt = np.where(decae, old_wt * (1.0 - alpha), old_wt)
+        actualiza = decae & obs
+        with np.errstate(invalid="ignore"):
+            nuevo = (old_wt * weighted + new_wt * x) / (old_wt + new_wt)
+        weighted = np.where(actualiza & (weighted != x), nuevo, weighted)
+        if adjust:
+            old_wt = np.where(actualiza, old_wt + new_wt, old_wt)
+        else:
+            old_wt = np.where(actualiza, 1.0, old_wt)
+        weighted = np.where(act & ~valido & obs, x, weighted)
+
+        nobs += obs
+        out[:, j] = np.where(act & (nobs >= 1), weighted, np.nan)
+    return out
+
+def _wma_matriz(X, length):
+    """WMA (pesos 1..length) por fila con slices desplazados; NaN si la ventana tiene NaN."""
+    l = int(length)
+    S, B = X.shape
+    out = np.full((S, B), np.nan)
+    if l < 1 or B < l:
+        return out
+    m = B - l + 1
+    acumulado = np.zeros((S, m))
+    for k in range(l):
+        acumulado += (k + 1) * X[:, k:k + m]
+    out[:, l - 1:] = acumulado / (l * (l + 1) / 2.0)
+    return out
+
+def _hma_matriz(X, length):
+    half_length = int(length / 2)
+    sqrt_length = int(math.floor(math.sqrt(length)))
+    diff = 2 * _wma_matriz(X, half_length) - _wma_matriz(X, length)
+    return _wma_matriz(diff, sqrt_length)
+
+class Panel:
+    """
+    Velas de varios símbolos en matrices alineadas a la derecha (t, close, volume).
+    calcular() agrega las columnas de indicadores; ultimo()/previo() y los helpers
+    de corte transversal (rank, percentil, top_k) trabajan sobre la última vela.
+    """
+    def __init__(self, symbols, t, close, volume, conteos):
+        self.symbols = list(symbols)
+        self.t = t
+        self.close = close
+        self.volume = volume
+        self.conteos = conteos
+        barras = close.shape[1]
+        self.activo = np.arange(barras)[None, :] >= (barras - conteos)[:, None]
+        self.columnas = {}
+        self.promedio_variacion_3m = None
+        self._indice = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def desde_largo(cls, df, barras=None):
+        """
+        Arma el panel desde un df largo (symbol, datetime, close, volume) ordenado por symbol y fecha,
+        p.ej. bar_store.leer_velas_largas(). `barras` limita cada símbolo a sus últimas N velas.
+        """
+        if df.empty:
+            vacio = np.empty((0, 0))
+            return cls([], vacio.astype(np.int64), vacio, vacio, np.zeros(0, dtype=np.int64))
+
+        simbolos = df["symbol"].to_numpy()
+        inicios = np.r_[0, np.flatnonzero(simbolos[1:] != simbolos[:-1]) + 1]
+        conteos = np.diff(np.r_[inicios, len(df)])
+        posicion = np.arange(len(df)) - np.repeat(inicios, conteos)
+        total = np.repeat(conteos, conteos)
+        if barras:
+            # Solo las últimas `barras` velas de cada símbolo
+            conservar = posicion >= total - barras
+            posicion = (posicion - np.maximum(total - barras, 0))[conservar]
+            conteos = np.minimum(conteos, barras)
+            total = np.repeat(conteos, conteos)
+        else:
+            conservar = slice(None)
+
+        S, B = len(inicios), int(conteos.max())
+        fila = np.repeat(np.arange(S), conteos)
+        columna = B - total + posicion
+
+        fechas = pd.to_datetime(df["datetime"], utc=True)
+        if fechas.dt.unit != "ns":
+            fechas = fechas.dt.as_unit("ns")
+
+        t = np.full((S, B), _SIN_FECHA, dtype=np.int64)
+        close = np.full((S, B), np.nan)
+        volume = np.full((S, B), np.nan)
+        t[fila, columna] = fechas.astype("int64").to_numpy()[conservar]
+        close[fila, columna] = df["close"].to_numpy(dtype=float)[conservar]
+        volume[fila, columna] = df["volume"].to_numpy(dtype=float)[conservar]
+        return cls(simbolos[inicios], t, close, volume, conteos)
+
+    @classmethod
+    def desde_historias(cls, historias, barras=None):
+        """Panel desde {symbol: df} (mismo formato que obtener_velas_polygon)."""
+        partes = [df.assign(symbol=symbol) for symbol, df in historias.items() if not df.empty]
+        if not partes:
+            return cls.desde_largo(pd.DataFrame(columns=["symbol", "datetime", "close", "volume"]), barras)
+        return cls.desde_largo(pd.concat(partes, ignore_index=True), barras)
+
+    # --- Indicadores ---
+
+    def _rsi(self, periodos=14):
+        with np.errstate(invalid="ignore"):
+            delta = np.diff(self.close, axis=1, prepend=np.nan)
+            # Igual que delta.where(...): el primer delta (NaN) y los huecos cuentan como 0
+            ganancia = np.where(delta > 0, delta, 0.0)
+            perdida = np.where(delta < 0, -delta, 0.0)
+        com = (1 - 1 / periodos) / (1 / periodos)
+        avg_g = _ewm_matriz(ganancia, self.activo, com)
+        avg_p = _ewm_matriz(perdida, self.activo, com)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 100 - (100 / (1 + avg_g / avg_p))
+
+    def _rvol(self, periodos):
+        validos = ~np.isnan(self.volume)
+        suma = np.concatenate([np.zeros((len(self.symbols), 1)), np.cumsum(np.where(validos, self.volume, 0.0), axis=1)], axis=1)
+        cuenta = np.concatenate([np.zeros((len(self.symbols), 1)), np.cumsum(validos, axis=1)], axis=1)
+        hasta = np.arange(1, self.volume.shape[1] + 1)
+        desde = np.maximum(hasta - periodos, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            promedio = (suma[:, hasta] - suma[:, desde]) / (cuenta[:, hasta] - cuenta[:, desde])
+            return self.volume / promedio
+
+    def _var(self):
+        # Igual que pct_change(fill_method=None) * 100
+        previo = np.concatenate([np.full((len(self.symbols), 1), np.nan), self.close[:, :-1]], axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (self.close / previo - 1) * 100
+
+    def _promedio_variacion_3m(self, meses=3):
+        """Vector por símbolo, como promedio_variacion_3m(df) (0.0 si no hay variaciones)."""
+        var = self.columnas["var"]
+        validos = ~np.isnan(var)
+        hay = validos.any(axis=1)
+        resultado = np.zeros(len(self.symbols))
+        if not hay.any():
+            return resultado
+
+        # Fecha de la última variación válida de cada símbolo
+        ultima = var.shape[1] - 1 - np.argmax(validos[:, ::-1], axis=1)
+        fin = self.t[np.arange(len(self.symbols)), ultima]
+        inicio = np.full(len(self.symbols), _SIN_FECHA)
+        inicio[hay] = (pd.DatetimeIndex(fin[hay], tz="UTC") - pd.DateOffset(months=meses)).asi8
+
+        ventana = validos & (self.t >= inicio[:, None]) & (self.t <= fin[:, None])
+        n = ventana.sum(axis=1)
+        suma = np.where(ventana, np.abs(var), 0.0).sum(axis=1)
+        resultado[hay] = suma[hay] / n[hay]
+        return resultado
+
+    def calcular(self, columnas=None, rvol_periodos=60):
+        """
+        Calcula las columnas pedidas (mismos nombres que procesar_indicadores, con sus
+        dependencias) como matrices en self.columnas. promedio_variacion_3m queda como
+        vector por símbolo en self.promedio_variacion_3m.
+        """
+        from src.config import HMA_A, HMA_B
+        calculos = {
+            "RSI":        lambda: self._rsi(),
+            "RSI_EMA_5":  lambda: _ewm_matriz(self.columnas["RSI"], self.activo, 2.0, adjust=False),
+            "RSI_EMA_14": lambda: _ewm_matriz(self.columnas["RSI"], self.activo, 6.5, adjust=False),
+            "hma5":       lambda: _hma_matriz(self.close, 5),
+            "hma9":       lambda: _hma_matriz(self.close, 9),
+            "hma90":      lambda: _hma_matriz(self.close, 90),
+            "hma_a":      lambda: _hma_matriz(self.close, HMA_A),
+            "hma_b":      lambda: _hma_matriz(self.close, HMA_B),
+            "rvol":       lambda: self._rvol(rvol_periodos),
+            "var":        lambda: self._var(),
+        }
+        pedidas = list(calculos) + ["promedio_variacion_3m"] if columnas is None else columnas
+        for nombre in resolver_indicadores(pedidas):
+            if nombre == "promedio_variacion_3m":
+                self.promedio_variacion_3m = self._promedio_variacion_3m()
+            elif nombre not in self.columnas:
+                self.columnas[nombre] = calculos[nombre]()
+        return self
+
+    def hma(self, length):
+        """HMA de cualquier largo sobre close (se guarda como columna hma<length>), p.ej. para barrer parámetros."""
+        nombre = f"hma{int(length)}"
+        if nombre not in self.columnas:
+            self.columnas[nombre] = _hma_matriz(self.close, int(length))
+        return self.columnas[nombre]
+
+    # --- Lectura ---
+
+    def ultimo(self, columna):
+        """Valor de la última vela de cada símbolo (vector en el orden de self.symbols)."""
+        if columna == "close":
+            return self.close[:, -1]
+        return self.columnas[columna][:, -1]
+
+    def previo(self, columna):
+        if columna == "close":
+            return self.close[:, -2]
+        return self.columnas[columna][:, -2]
+
+    def indice(self, symbol):
+        return self._indice.get(symbol)
+
+    def estadisticas_desde(self, filas, fechas_entrada):
+        """
+        Versión vectorizada de estadisticas_desde_entrada para las filas dadas.
+        Retorna (min_price, candles_since_min) con NaN donde no hay velas desde la entrada.
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        if not len(filas):
+            return np.empty(0), np.empty(0)
+        # Se compara por fecha (UTC), igual que df.index.date >= entry_date.date()
+        corte = pd.DatetimeIndex(pd.to_datetime(fechas_entrada)).normalize()
+        if corte.tz is None:
+            corte = corte.tz_localize("UTC")
+        corte = corte.as_unit("ns").asi8
+
+        close = self.close[filas]
+        desde = self.activo[filas] & (self.t[filas] >= corte[:, None])
+        candidatos = np.where(desde & ~np.isnan(close), close, np.inf)
+        posicion = np.argmin(candidatos, axis=1)
+        minimo = candidatos[np.arange(len(filas)), posicion]
+        hay = np.isfinite(minimo)
+        velas = (close.shape[1] - 1 - posicion).astype(float)
+        return np.where(hay, minimo, np.nan), np.where(hay, velas, np.nan)
+
+    # --- Corte transversal (última vela) ---
+
+    def serie(self, columna):
+        return pd.Series(self.ultimo(columna), index=self.symbols, name=columna)
+
+    def rank(self, columna, ascendente=True):
+        """Posición de cada símbolo (1 = menor valor si ascendente); NaN sin dato."""
+        return self.serie(columna).rank(method="min", ascending=ascendente)
+
+    def percentil(self, columna):
+        """Percentil (0-100) del valor de cada símbolo dentro del universo."""
+        return self.serie(columna).rank(pct=True) * 100
+
+    def top_k(self, columna, k, menores=True):
+        """Los k símbolos con menor (o mayor) valor, p.ej. top_k("RSI", 20) = los más sobrevendidos."""
+        serie = self.serie(columna).dropna()
+        return serie.nsmallest(k) if menores else serie.nlargest(k)
+
+    def mascara_rsi(self, limite):
+        """True para los símbolos cuyo RSI actual es <= limite."""
+        with np.errstate(invalid="ignore"):
+            return self.ultimo("RSI") <= limite
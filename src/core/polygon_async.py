@@ -0,0 +1,199 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import httpx
+from src.config import (
+    BAR_STORE_ENABLED, POLYGON_CONCURRENCIA, POLYGON_TIMEOUT, POLYGON_REINTENTOS, DAILY_BULK_MODE,
+)
+from src.core import bar_store
+from src.core.panel import Panel
+from src.core.cache_velas import cache_actual
+from src.core.polygon_client import (
+    INTERVAL_MAP, PolygonTransientError, _rango_por_defecto, _url_agregados, _interpretar_respuesta,
+    _clasificar_error, _es_reintentable, _espera_reintento,
+    _plan_delta, _fusionar_delta, _inicio_descarga_completa, _ventana, sincronizar_grouped_daily, iterar_velas_grouped,
+)
+
+# Versión asíncrona de obtener_velas_polygon para los loops de scan:
+# descarga varios símbolos en paralelo (con límite) y entrega cada resultado
+# apenas termina, así el scan procesa mientras otras descargas siguen en vuelo.
+
+async def _get_async(client, url, params):
+    """
+    Igual que polygon_client._get: reintenta 429/5xx/timeouts con backoff y Retry-After.
+    """
+    for intento in range(POLYGON_REINTENTOS + 1):
+        retry_after = None
+        try:
+            r = await client.get(url, params=params)
+        except httpx.TransportError as e:
+            error = PolygonTransientError(f"Error de conexión: {e!r}")
+        else:
+            if r.status_code == 200:
+                return r
+            error = _clasificar_error(r.status_code, r.text)
+            retry_after = r.headers.get("Retry-After")
+
+        if not _es_reintentable(error) or intento == POLYGON_REINTENTOS:
+            raise error
+        await asyncio.sleep(_espera_reintento(intento, retry_after))
+
+async def _descargar_velas_async(client, stock, intervalo, fecha_inicio, fecha_fin, permitir_vacio=False):
+    url, params = _url_agregados(stock, intervalo, fecha_inicio, fecha_fin)
+    r = await _get_async(client, url, params)
+    return _interpretar_respuesta(r, stock, url, fecha_inicio, fecha_fin, permitir_vacio)
+
+async def obtener_velas_async(client, stock, intervalo, fecha_inicio=None, fecha_fin=None):
+    """
+    Igual que obtener_velas_polygon (incluye el delta contra bar_store y el cache de la
+    ejecución) usando un httpx.AsyncClient.
+    """
+    if intervalo not in INTERVAL_MAP:
+        raise ValueError("Intervalo inválido.")
+
+    usar_store = BAR_STORE_ENABLED and not fecha_inicio and not fecha_fin
+    fecha_inicio, fecha_fin = _rango_por_defecto(intervalo, fecha_inicio, fecha_fin)
+
+    cache = cache_actual()
+    if cache is not None:
+        return await cache.obtener_async(
+            (stock, intervalo, fecha_inicio, fecha_fin),
+            lambda: _obtener_velas_async(client, stock, intervalo, fecha_inicio, fecha_fin, usar_store),
+        )
+    return await _obtener_velas_async(client, stock, intervalo, fecha_inicio, fecha_fin, usar_store)
+
+async def _obtener_velas_async(client, stock, intervalo, fecha_inicio, fecha_fin, usar_store):
+    if not usar_store:
+        return await _descargar_velas_async(client, stock, intervalo, fecha_inicio, fecha_fin)
+
+    # bar_store es sqlite bloqueante: en un hilo, para no frenar las demás descargas del loop
+    desde_descarga, completa = await asyncio.to_thread(_plan_delta, stock, intervalo, fecha_inicio)
+    if not completa:
+        cola = await _descargar_velas_async(client, stock, intervalo, desde_descarga, fecha_fin, permitir_vacio=True)
+        if await asyncio.to_thread(_fusionar_delta, stock, intervalo, desde_descarga, cola):
+            return await asyncio.to_thread(bar_store.leer_velas, stock, intervalo, desde=fecha_inicio)
+
+    inicio = await asyncio.to_thread(_inicio_descarga_completa, stock, intervalo, fecha_inicio)
+    df = await _descargar_velas_async(client, stock, intervalo, inicio, fecha_fin)
+    await asyncio.to_thread(bar_store.guardar_velas, stock, intervalo, df, desde=inicio)
+    return _ventana(df, fecha_inicio)
+
+async def iterar_velas_async(symbols, intervalos=("1D",), concurrencia=None, timeout=None):
+    """
+    Generador async que entrega (symbol, {intervalo: df}, error) en orden de llegada.
+    `concurrencia` limita los símbolos en vuelo y `timeout` aplica a cada request.
+    """
+    concurrencia = concurrencia or POLYGON_CONCURRENCIA
+    timeout = timeout or POLYGON_TIMEOUT
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    headers = {"Accept": "application/json", "Accept-Encoding": "gzip, deflate"}
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(timeout), limits=limites, headers=headers) as client:
+        async def descargar(symbol):
+            try:
+                dfs = {}
+                for intervalo in intervalos:
+                    dfs[intervalo] = await obtener_velas_async(client, symbol, intervalo)
+                return symbol, dfs, None
+            except Exception as e:
+                return symbol, None, e
+
+        # Ventana de `concurrencia` descargas: la siguiente arranca cuando el consumidor
+        # toma un resultado, así un consumidor lento no acumula descargas terminadas
+        pendientes = iter(symbols)
+        en_vuelo = set()
+
+        def lanzar():
+            while len(en_vuelo) < concurrencia:
+                symbol = next(pendientes, None)
+                if symbol is None:
+                    return
+                en_vuelo.add(asyncio.create_task(descargar(symbol)))
+
+        lanzar()
+        try:
+            while en_vuelo:
+                hechas, en_vuelo = await asyncio.wait(en_vuelo, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in hechas:
+                    yield tarea.result()
+                    lanzar()
+        finally:
+            for tarea in en_vuelo:
+                tarea.cancel()
+
+class _FinProductor:
+    """Último item de la cola de iterar_velas_concurrente, con el error del productor si lo hubo."""
+    def __init__(self, error=None):
+        self.error = error
+
+def iterar_velas_concurrente(symbols, intervalos=("1D",), concurrencia=None, timeout=None):
+    """
+    Versión síncrona de iterar_velas_async para los scripts: el event loop corre en un
+    hilo aparte y los resultados llegan por una cola a medida que se completan. La cola
+    es acotada: si el consumidor va más lento, las descargas esperan en vez de acumular
+    DataFrames, y si el consumidor abandona el generador, las descargas se cortan.
+    """
+    resultados = queue.Queue(maxsize=2 * (concurrencia or POLYGON_CONCURRENCIA))
+    detener = threading.Event()
+
+    def entregar(item):
+        # put con timeout para notar si el consumidor dejó de leer
+        while not detener.is_set():
+            try:
+                resultados.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def productor():
+        async def consumir():
+            async for item in iterar_velas_async(symbols, intervalos, concurrencia, timeout):
+                if not await asyncio.to_thread(entregar, item):
+                    break
+        error = None
+        try:
+            asyncio.run(consumir())
+        except Exception as e:
+            # Un error fuera de descargar (cliente, loop, cache) no es un fin normal del stream
+            error = e
+        finally:
+            entregar(_FinProductor(error))
+
+    # El hilo corre con una copia del contexto: así ve el cache de la ejecución
+    hilo = threading.Thread(target=contextvars.copy_context().run, args=(productor,), daemon=True)
+    hilo.start()
+    try:
+        while True:
+            item = resultados.get()
+            if isinstance(item, _FinProductor):
+                if item.error is not None:
+                    raise item.error
+                break
+            yield item
+    finally:
+        detener.set()
+
+def panel_1d(symbols, al_avanzar=None):
+    """
+    Modo bulk (DAILY_BULK): sincroniza grouped daily y arma el panel 1D de todo el
+    universo desde bar_store, sin un DataFrame por símbolo.
+    `al_avanzar()` se llama por cada día sincronizado (ver sincronizar_grouped_daily).
+    """
+    requests_hechos = sincronizar_grouped_daily(al_avanzar=al_avanzar)
+    print(f"Grouped daily sincronizado ({requests_hechos} requests para {len(symbols)} símbolos)")
+    fecha_inicio, _ = _rango_por_defecto("1D")
+    return Panel.desde_largo(bar_store.leer_velas_largas(symbols, "1D", desde=fecha_inicio))
+
+def iterar_velas_1d(symbols):
+    """
+    Fuente de velas 1D para los scans diarios: grouped daily en modo bulk (DAILY_BULK),
+    o descargas concurrentes por símbolo.
+    """
+    if DAILY_BULK_MODE:
+        requests_hechos = sincronizar_grouped_daily()
+        print(f"Grouped daily sincronizado ({requests_hechos} requests para {len(symbols)} símbolos)")
+        return iterar_velas_grouped(symbols)
+    return iterar_velas_concurrente(symbols, ("1D",))
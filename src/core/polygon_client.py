@@ -1,10 +1,22 @@
+import time
+import random
+import threading
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from src.config import API_KEY
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from src.config import (
+    API_KEY, BAR_STORE_ENABLED, POLYGON_CONCURRENCIA, POLYGON_TIMEOUT,
+    POLYGON_REINTENTOS, POLYGON_BACKOFF, POLYGON_BACKOFF_MAX, POLYGON_SNAPSHOT_MAX_URL,
+)
+from src.core import bar_store
+from src.core.cache_velas import cache_actual
 
 # Configuración específica de Polygon
 INTERVAL_MAP = {
+    "1min":  (1,  "minute"),
     "5min":  (5,  "minute"),
     "15min": (15, "minute"),
     "30min": (30, "minute"),
@@ -14,6 +26,7 @@ INTERVAL_MAP = {
 }
 
 LOOKBACK_DAYS = {
+    "1min":  2,
     "5min":  7,
     "15min": 14,
     "30min": 21,
@@ -22,15 +35,7 @@ LOOKBACK_DAYS = {
     "1D":    300,
 }
 
-def obtener_velas_polygon(stock, intervalo, fecha_inicio=None, fecha_fin=None):
-    """
-    Descarga velas de Polygon. Maneja internamente el lookback por TF si no se pasan fechas.
-    """
-    if intervalo not in INTERVAL_MAP:
-        raise ValueError("Intervalo inválido.")
-    
-    mult, unidad = INTERVAL_MAP[intervalo]
-
+def _rango_por_defecto(intervalo, fecha_inicio=None, fecha_fin=None):
     if not fecha_fin:
         fecha_fin = datetime.utcnow().strftime("%Y-%m-%d")
     
@@ -39,26 +44,370 @@ def obtener_velas_polygon(stock, intervalo, fecha_inicio=None, fecha_fin=None):
             raise ValueError("No hay lookback definido para este intervalo y no se proveyó fecha_inicio.")
         dias_atras = LOOKBACK_DAYS[intervalo]
         fecha_inicio = (datetime.utcnow() - timedelta(days=dias_atras)).strftime("%Y-%m-%d")
+    return fecha_inicio, fecha_fin
 
+def _url_agregados(stock, intervalo, fecha_inicio, fecha_fin):
+    mult, unidad = INTERVAL_MAP[intervalo]
     url = f"https://api.polygon.io/v2/aggs/ticker/{stock}/range/{mult}/{unidad}/{fecha_inicio}/{fecha_fin}"
     params = {"adjusted": "true", "sort": "asc", "limit": 50000, "apiKey": API_KEY}
+    return url, params
+
+class PolygonError(Exception):
+    """Error base de Polygon. `status_code` es None si no hubo respuesta HTTP."""
+    def __init__(self, mensaje, status_code=None):
+        super().__init__(mensaje)
+        self.status_code = status_code
 
-    r = requests.get(url, params=params)
+class PolygonRateLimitError(PolygonError):
+    """429: se superó el límite de requests del plan."""
+
+class PolygonNotFoundError(PolygonError):
+    """404 o respuesta sin resultados para el ticker/rango pedido."""
+
+class PolygonTransientError(PolygonError):
+    """5xx, timeout o error de conexión: reintentar más tarde puede funcionar."""
+
+class PolygonFatalError(PolygonError):
+    """401/403/400 y demás: reintentar no sirve (API key, plan, parámetros)."""
+
+def _clasificar_error(status_code, texto):
+    mensaje = f"Error {status_code}: {texto[:200]}"
+    if status_code == 429:
+        return PolygonRateLimitError(mensaje, status_code)
+    if status_code == 404:
+        return PolygonNotFoundError(mensaje, status_code)
+    if status_code >= 500:
+        return PolygonTransientError(mensaje, status_code)
+    return PolygonFatalError(mensaje, status_code)
+
+def _espera_reintento(intento, retry_after=None):
+    """
+    Segundos a esperar antes del reintento `intento` (0, 1, ...).
+    Respeta Retry-After (segundos o fecha HTTP); si no viene, backoff exponencial con jitter completo.
+    """
+    if retry_after:
+        try:
+            segundos = float(retry_after)
+        except ValueError:
+            try:
+                fecha = parsedate_to_datetime(retry_after)
+                segundos = (fecha - datetime.now(fecha.tzinfo)).total_seconds()
+            except (TypeError, ValueError):
+                segundos = None
+        if segundos is not None:
+            return min(max(segundos, 0.0), POLYGON_BACKOFF_MAX)
+    return random.uniform(0, min(POLYGON_BACKOFF_MAX, POLYGON_BACKOFF * (2 ** intento)))
+
+def _es_reintentable(error):
+    return isinstance(error, (PolygonRateLimitError, PolygonTransientError))
+
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    """
+    Sesión HTTP compartida: reutiliza conexiones (keep-alive) y negocia gzip.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(POLYGON_CONCURRENCIA, 10))
+                session.mount("https://", adapter)
+                session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate"})
+                _session = session
+    return _session
+
+def _get(url, params):
+    """
+    GET con la sesión compartida, reintentando 429/5xx/timeouts con backoff.
+    """
+    for intento in range(POLYGON_REINTENTOS + 1):
+        retry_after = None
+        try:
+            r = _get_session().get(url, params=params, timeout=POLYGON_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = PolygonTransientError(f"Error de conexión: {e}")
+        else:
+            if r.status_code == 200:
+                return r
+            error = _clasificar_error(r.status_code, r.text)
+            retry_after = r.headers.get("Retry-After")
+
+        if not _es_reintentable(error) or intento == POLYGON_REINTENTOS:
+            raise error
+        time.sleep(_espera_reintento(intento, retry_after))
+
+def _interpretar_respuesta(r, stock, url, fecha_inicio, fecha_fin, permitir_vacio=False):
+    """
+    Convierte la respuesta HTTP (requests o httpx) en DataFrame de velas.
+    """
     if r.status_code != 200:
-        raise Exception(f"Error {r.status_code}: {r.text[:200]}")
+        raise _clasificar_error(r.status_code, r.text)
 
     data = r.json()
     if "results" not in data or not data["results"]:
+        if permitir_vacio:
+            return pd.DataFrame(columns=["datetime","open","high","low","close","volume"])
         print(f"DEBUG: URL utilizada: {url}")
-        raise Exception(f"No se encontraron datos para {stock} en el rango {fecha_inicio} a {fecha_fin}. Respuesta: {data}")
+        raise PolygonNotFoundError(f"No se encontraron datos para {stock} en el rango {fecha_inicio} a {fecha_fin}. Respuesta: {data}")
+
+    return _resultados_a_df(data["results"])
 
-    df = pd.DataFrame(data["results"]).rename(
+def _descargar_velas(stock, intervalo, fecha_inicio, fecha_fin, permitir_vacio=False):
+    """
+    Una única llamada al endpoint de agregados de Polygon.
+    """
+    url, params = _url_agregados(stock, intervalo, fecha_inicio, fecha_fin)
+    r = _get(url, params)
+    return _interpretar_respuesta(r, stock, url, fecha_inicio, fecha_fin, permitir_vacio)
+
+def _resultados_a_df(results):
+    df = pd.DataFrame(results).rename(
         columns={"o":"open","h":"high","l":"low","c":"close","v":"volume"}
     )
 
     df["datetime"] = pd.to_datetime(df["t"], unit="ms", utc=True)
     return df[["datetime","open","high","low","close","volume"]].copy()
 
+def _cola_consistente(cacheadas, cola):
+    """
+    Compara las velas solapadas entre lo guardado y lo recién descargado.
+    Si el open de una vela ya cerrada cambió (split / ajuste), la serie local no sirve.
+    """
+    if cacheadas.empty or cola.empty:
+        return True
+    comunes = cacheadas.merge(cola, on="datetime", suffixes=("_local", "_nuevo"))
+    if comunes.empty:
+        return True
+    return bool(np.allclose(comunes["open_local"], comunes["open_nuevo"], rtol=1e-3))
+
+def _plan_delta(stock, intervalo, fecha_inicio):
+    """
+    Decide qué hay que pedir a Polygon para completar la ventana.
+    Retorna (desde_descarga, completa): si `completa` es True se descarga toda la ventana.
+    """
+    desde, ultima = bar_store.cobertura(stock, intervalo)
+    if desde is None or desde > fecha_inicio:
+        return fecha_inicio, True
+    # Se repide desde el día anterior a la última vela: la última puede estar incompleta
+    # y así queda un solape para validar que la serie no fue reajustada.
+    return (ultima - timedelta(days=1)).strftime("%Y-%m-%d"), False
+
+def _inicio_descarga_completa(stock, intervalo, fecha_inicio):
+    """
+    Desde dónde pedir una descarga completa, que reemplaza toda la serie guardada: en 1D
+    desde lo más viejo que cubre bar_store (p.ej. el backfill del backtest), no solo la ventana.
+    """
+    if intervalo != "1D":
+        return fecha_inicio
+    desde, _ = bar_store.cobertura(stock, intervalo)
+    return min(fecha_inicio, desde) if desde else fecha_inicio
+
+def _ventana(df, fecha_inicio):
+    return df[df["datetime"] >= pd.Timestamp(fecha_inicio, tz="UTC")].reset_index(drop=True)
+
+def _fusionar_delta(stock, intervalo, desde_descarga, cola):
+    """
+    Integra la cola descargada en el almacén local. Retorna False si hay que
+    descargar la ventana completa porque la serie local quedó inconsistente.
+    """
+    cacheadas = bar_store.leer_velas(stock, intervalo, desde=desde_descarga)
+    if not _cola_consistente(cacheadas, cola):
+        return False
+    bar_store.guardar_velas(stock, intervalo, cola)
+    return True
+
+def obtener_velas_polygon(stock, intervalo, fecha_inicio=None, fecha_fin=None):
+    """
+    Descarga velas de Polygon. Maneja internamente el lookback por TF si no se pasan fechas.
+    Sin fechas explícitas se usa el almacén local (bar_store) y solo se pide la cola faltante.
+    Dentro de cache_de_ejecucion cada serie se descarga una vez por ejecución.
+    """
+    if intervalo not in INTERVAL_MAP:
+        raise ValueError("Intervalo inválido.")
+
+    usar_store = BAR_STORE_ENABLED and not fecha_inicio and not fecha_fin
+    fecha_inicio, fecha_fin = _rango_por_defecto(intervalo, fecha_inicio, fecha_fin)
+
+    cache = cache_actual()
+    if cache is not None:
+        return cache.obtener(
+            (stock, intervalo, fecha_inicio, fecha_fin),
+            lambda: _obtener_velas(stock, intervalo, fecha_inicio, fecha_fin, usar_store),
+        )
+    return _obtener_velas(stock, intervalo, fecha_inicio, fecha_fin, usar_store)
+
+def _obtener_velas(stock, intervalo, fecha_inicio, fecha_fin, usar_store):
+    if not usar_store:
+        return _descargar_velas(stock, intervalo, fecha_inicio, fecha_fin)
+
+    desde_descarga, completa = _plan_delta(stock, intervalo, fecha_inicio)
+    if not completa:
+        cola = _descargar_velas(stock, intervalo, desde_descarga, fecha_fin, permitir_vacio=True)
+        if _fusionar_delta(stock, intervalo, desde_descarga, cola):
+            return bar_store.leer_velas(stock, intervalo, desde=fecha_inicio)
+
+    inicio = _inicio_descarga_completa(stock, intervalo, fecha_inicio)
+    df = _descargar_velas(stock, intervalo, inicio, fecha_fin)
+    bar_store.guardar_velas(stock, intervalo, df, desde=inicio)
+    return _ventana(df, fecha_inicio)
+
+def obtener_grouped_daily(fecha):
+    """
+    Vela diaria de todo el mercado US para una fecha (YYYY-MM-DD) en una sola llamada.
+    Retorna las columnas de obtener_velas_polygon más `symbol`; vacío en feriados.
+    """
+    url = f"https://api.polygon.io/v2/aggs/grouped/locale/us/market/stocks/{fecha}"
+    params = {"adjusted": "true", "apiKey": API_KEY}
+
+    r = _get(url, params)
+    results = r.json().get("results") or []
+    if not results:
+        return pd.DataFrame(columns=["symbol","datetime","open","high","low","close","volume"])
+
+    df = _resultados_a_df(results)
+    # t de grouped daily es el cierre de la sesión; se lleva a la clave 1D de bar_store
+    df["datetime"] = bar_store.clave_sesion_1d(df["datetime"])
+    df.insert(0, "symbol", [row["T"] for row in results])
+    return df
+
+def _lotes_tickers(symbols, max_caracteres=None):
+    """Agrupa los símbolos para que cada "A,B,C" no supere el largo máximo de URL."""
+    max_caracteres = max_caracteres or POLYGON_SNAPSHOT_MAX_URL
+    lote, largo = [], 0
+    for symbol in symbols:
+        if lote and largo + len(symbol) + 1 > max_caracteres:
+            yield lote
+            lote, largo = [], 0
+        lote.append(symbol)
+        largo += len(symbol) + 1
+    if lote:
+        yield lote
+
+def _precio_snapshot(ticker):
+    """
+    (precio, datetime UTC) de un ticker del snapshot: último trade si el plan lo incluye,
+    si no el último minuto, el cierre parcial del día o el del día previo (pre-market), estos
+    dos con la fecha de su sesión.
+    """
+    actualizado = ticker.get("updated")
+    fecha = pd.Timestamp(actualizado, unit="ns", tz="UTC") if actualizado else pd.Timestamp.now(tz="UTC")
+
+    trade = ticker.get("lastTrade") or {}
+    if trade.get("p"):
+        return float(trade["p"]), pd.Timestamp(trade["t"], unit="ns", tz="UTC") if trade.get("t") else fecha
+    minuto = ticker.get("min") or {}
+    if minuto.get("c"):
+        return float(minuto["c"]), pd.Timestamp(minuto["t"], unit="ms", tz="UTC") if minuto.get("t") else fecha
+    # Cierre de una barra diaria: se marca con la sesión de esa barra (clave de las velas 1D),
+    # no con `updated`; antes de la apertura prevDay es la vela de ayer, no una de hoy
+    for clave in ("day", "prevDay"):
+        barra = ticker.get(clave) or {}
+        if not barra.get("c"):
+            continue
+        if barra.get("t"):
+            sesion = pd.Timestamp(barra["t"], unit="ms", tz="UTC")
+        elif clave == "day":
+            sesion = fecha
+        else:
+            # Sin su fecha no se sabe de qué sesión es: mejor sin precio que una vela simulada falsa
+            return None
+        return float(barra["c"]), bar_store.clave_sesion_1d([sesion])[0]
+    return None
+
+def obtener_ultimos_precios(symbols):
+    """
+    Último precio de varios símbolos con el snapshot multi-ticker de Polygon: un request
+    por lote de tickers en vez de descargar velas por símbolo.
+    Retorna {symbol: (precio, datetime UTC)}; los que no vienen en el snapshot se omiten.
+    """
+    url = "https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers"
+    precios = {}
+    for lote in _lotes_tickers(sorted(set(symbols))):
+        r = _get(url, {"tickers": ",".join(lote), "apiKey": API_KEY})
+        for ticker in r.json().get("tickers") or []:
+            ultimo = _precio_snapshot(ticker)
+            if ultimo:
+                precios[ticker["ticker"]] = ultimo
+    return precios
+
+def _dia_cerrado(fecha):
+    # La sesión extendida termina 20:00 ET; a las 05:00 UTC del día siguiente la vela es definitiva.
+    return datetime.strptime(fecha, "%Y-%m-%d") + timedelta(days=1, hours=5) <= datetime.utcnow()
+
+def _revisar_ajustes(fecha, fecha_inicio, fecha_fin, al_avanzar=None):
+    """
+    Vuelve a pedir un día ya guardado de grouped daily (adjusted=true) y lo compara con
+    bar_store: si el open de un símbolo cambió hubo un split/ajuste después de guardarlo y
+    su serie 1D se descarga completa por símbolo. Retorna la cantidad de requests hechos.
+    """
+    guardadas = bar_store.leer_dia_1d(fecha)
+    nuevas = obtener_grouped_daily(fecha)
+    requests_hechos = 1
+    comunes = guardadas.merge(nuevas[["symbol", "open"]], on="symbol", suffixes=("_local", "_nuevo"))
+    ajustados = ~np.isclose(comunes["open_local"], comunes["open_nuevo"], rtol=1e-3, equal_nan=True)
+    for symbol in comunes.loc[ajustados, "symbol"]:
+        print(f"🔁 {symbol}: precios reajustados desde {fecha}, se descarga de nuevo la serie 1D")
+        desde = _inicio_descarga_completa(symbol, "1D", fecha_inicio)
+        try:
+            df = _descargar_velas(symbol, "1D", desde, fecha_fin, permitir_vacio=True)
+        except PolygonNotFoundError:
+            bar_store.borrar_velas(symbol, "1D")
+            continue
+        finally:
+            requests_hechos += 1
+            if al_avanzar:
+                al_avanzar()
+        bar_store.guardar_velas(symbol, "1D", df, desde=desde)
+    return requests_hechos
+
+def sincronizar_grouped_daily(fecha_inicio=None, fecha_fin=None, al_avanzar=None):
+    """
+    Modo bulk 1D: trae con grouped daily los días hábiles que faltan en bar_store.
+    La primera vez hace el backfill de LOOKBACK_DAYS["1D"]; luego solo pide el/los últimos días
+    y vuelve a revisar el último día ya guardado para detectar splits (_revisar_ajustes).
+    `al_avanzar()` se llama después de cada día (p.ej. latido del progreso de un job).
+    Retorna la cantidad de requests hechos.
+    """
+    fecha_inicio, fecha_fin = _rango_por_defecto("1D", fecha_inicio, fecha_fin)
+    cargados = bar_store.dias_grouped_cargados()
+    revisar = bar_store.ultimo_dia_grouped()
+
+    requests_hechos = 0
+    for dia in pd.bdate_range(fecha_inicio, fecha_fin):
+        fecha = dia.strftime("%Y-%m-%d")
+        if fecha in cargados:
+            continue
+        df = obtener_grouped_daily(fecha)
+        requests_hechos += 1
+        bar_store.guardar_grouped_daily(df)
+        if _dia_cerrado(fecha):
+            bar_store.marcar_dia_grouped(fecha, len(df))
+        if al_avanzar:
+            al_avanzar()
+
+    if revisar and revisar >= fecha_inicio:
+        requests_hechos += _revisar_ajustes(revisar, fecha_inicio, fecha_fin, al_avanzar)
+    # Todos los días hábiles desde fecha_inicio quedaron en bar_store
+    bar_store.marcar_cobertura_grouped(fecha_inicio)
+    return requests_hechos
+
+def iterar_velas_grouped(symbols):
+    """
+    Entrega (symbol, {"1D": df}, error) leyendo de bar_store la ventana 1D de cada símbolo,
+    con el mismo formato que iterar_velas_concurrente. Requiere sincronizar_grouped_daily().
+    """
+    fecha_inicio, _ = _rango_por_defecto("1D")
+    historias = bar_store.leer_velas_multiples(symbols, "1D", desde=fecha_inicio)
+    for symbol in symbols:
+        df = historias.get(symbol)
+        if df is None or df.empty:
+            yield symbol, None, PolygonNotFoundError(f"No hay velas 1D de grouped daily para {symbol}")
+        else:
+            yield symbol, {"1D": df}, None
+
 def aplicar_utc_local(df, utc_offset=3):
     """
     Convierte el datetime de UTC a local aplicando el offset y lo setea como index.
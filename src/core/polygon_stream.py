@@ -0,0 +1,85 @@
+import json
+import asyncio
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
+from src.config import API_KEY, STREAM_URL
+from src.core.polygon_client import PolygonFatalError, _espera_reintento
+
+# Cliente del WebSocket de Polygon para agregados por minuto (canal AM.<symbol>):
+# conecta, se autentica, se suscribe y entrega cada evento AM a medida que llega.
+# Si la conexión se cae, reconecta con backoff y vuelve a suscribir los mismos símbolos.
+
+CANAL = "AM"
+SYMBOLS_POR_MENSAJE = 500
+
+class StreamPolygon:
+    """
+    Conexión a STREAM_URL (wss://socket.polygon.io/stocks o el servidor falso). Los símbolos
+    se pueden cambiar con suscribir/desuscribir mientras se consume `agregados()`.
+    """
+    def __init__(self, url=None, api_key=None):
+        self.url = url or STREAM_URL
+        self.api_key = api_key or API_KEY
+        self._symbols = set()
+        self._ws = None
+
+    @property
+    def symbols(self):
+        return set(self._symbols)
+
+    async def suscribir(self, symbols):
+        nuevos = set(symbols) - self._symbols
+        self._symbols |= nuevos
+        await self._enviar("subscribe", nuevos)
+
+    async def desuscribir(self, symbols):
+        quitados = set(symbols) & self._symbols
+        self._symbols -= quitados
+        await self._enviar("unsubscribe", quitados)
+
+    async def _enviar(self, accion, symbols, ws=None):
+        ws = ws or self._ws
+        if ws is None or not symbols:
+            return
+        symbols = sorted(symbols)
+        for i in range(0, len(symbols), SYMBOLS_POR_MENSAJE):
+            canales = ",".join(f"{CANAL}.{symbol}" for symbol in symbols[i:i + SYMBOLS_POR_MENSAJE])
+            await ws.send(json.dumps({"action": accion, "params": canales}))
+
+    async def _autenticar(self, ws):
+        await ws.send(json.dumps({"action": "auth", "params": self.api_key}))
+        while True:
+            for evento in json.loads(await asyncio.wait_for(ws.recv(), timeout=30)):
+                estado = evento.get("status")
+                if estado == "auth_success":
+                    return
+                if estado in ("auth_failed", "max_connections"):
+                    raise PolygonFatalError(f"WebSocket de Polygon: {evento.get('message') or estado}")
+
+    async def agregados(self):
+        """Genera los eventos AM ({"sym", "o", "h", "l", "c", "v", "av", "s", "e", ...})."""
+        intento = 0
+        while True:
+            try:
+                async with connect(self.url, open_timeout=30, max_size=None) as ws:
+                    await self._autenticar(ws)
+                    await self._enviar("subscribe", self._symbols, ws)
+                    self._ws = ws
+                    print(f"📡 Stream conectado a {self.url} ({len(self._symbols)} símbolos)")
+                    intento = 0
+                    async for mensaje in ws:
+                        for evento in json.loads(mensaje):
+                            if evento.get("ev") == CANAL:
+                                yield evento
+                            elif evento.get("ev") == "status" and evento.get("status") not in ("success", "connected"):
+                                print(f"⚠️ Stream: {evento.get('message') or evento.get('status')}")
+            except InvalidURI as e:
+                raise PolygonFatalError(f"STREAM_URL inválida: {e}")
+            except (OSError, asyncio.TimeoutError, ConnectionClosed, InvalidHandshake) as e:
+                print(f"⚠️ Stream desconectado: {e!r}")
+            finally:
+                self._ws = None
+            espera = _espera_reintento(intento)
+            intento += 1
+            print(f"Reconectando stream en {espera:.1f}s...")
+            await asyncio.sleep(espera)
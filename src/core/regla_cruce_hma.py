@@ -1,58 +1,78 @@
 import pandas as pd
-from src.core.polygon_client import obtener_velas_polygon
+from src.core.polygon_client import obtener_velas_polygon, obtener_ultimos_precios
 from src.core.indicators import procesar_indicadores
+from src.core.indicadores_incrementales import avanzar_con_velas
 from src.config import LIMITE_RSI_1D
 
-def regla_cruce_hma(symbol):
-    # 1. Obtener data 15min para el precio actual (simulado o tiempo real)
-    df_15m = obtener_velas_polygon(symbol, "15min")
-    if df_15m.empty:
-        # print("Error: No se pudo obtener datos 15min.")
+# Columnas que lee la regla del df 1D procesado
+COLUMNAS_CRUCE_HMA = ("RSI", "rvol", "hma_a", "hma_b")
+
+def regla_cruce_hma(symbol, ultimo=None, df_1d=None, estados=None):
+    # Los scans pueden pasar el precio actual (obtener_ultimos_precios, un snapshot para
+    # todos los símbolos) y las velas 1D ya descargadas; si no, se piden aquí.
+    # Con `estados` ({symbol: estado}, ver cargar_estados) los indicadores 1D avanzan
+    # de forma incremental y la vela simulada de hoy solo se previsualiza.
+    # 1. Precio actual: (precio, datetime UTC) del snapshot
+    if ultimo is None:
+        ultimo = obtener_ultimos_precios([symbol]).get(symbol)
+    if ultimo is None:
+        # print("Error: No se pudo obtener el precio actual.")
         return None
     
-    last_15m_price = float(df_15m["close"].iloc[-1])
-    last_15m_datetime = pd.to_datetime(df_15m["datetime"].iloc[-1])
-    today_date = last_15m_datetime.date()
+    last_price, last_datetime = ultimo
+    last_price = float(last_price)
+    last_datetime = pd.to_datetime(last_datetime, utc=True)
+    today_date = last_datetime.date()
 
     # 2. Obtener data 1D (histórica)
-    df_1d = obtener_velas_polygon(symbol, "1D")
+    if df_1d is None:
+        df_1d = obtener_velas_polygon(symbol, "1D")
     if df_1d.empty:
         # print("Error: No se pudo obtener datos 1D.")
         return None
 
     # print(df_1d.tail(1))
-    # print(df_15m.tail(1))
 
     # 3. Simular el día actual en el set 1D
     last_1d_row = df_1d.iloc[-1]
     last_1d_date = pd.to_datetime(last_1d_row["datetime"]).date()
     
     if last_1d_date == today_date:
-        # print(f"Actualizando vela 1D de hoy ({today_date}) con el precio actual {last_15m_price}")
-        df_1d.loc[df_1d.index[-1], "close"] = last_15m_price
+        # print(f"Actualizando vela 1D de hoy ({today_date}) con el precio actual {last_price}")
+        df_1d.loc[df_1d.index[-1], "close"] = last_price
     else:
-        # print(f"Agregando nueva vela simulada para hoy ({today_date}) con precio {last_15m_price}")
+        # print(f"Agregando nueva vela simulada para hoy ({today_date}) con precio {last_price}")
         # Creamos una nueva fila basada en la última conocida
         new_row = {
-            "datetime": last_15m_datetime,
-            "open": last_15m_price,
-            "high": last_15m_price,
-            "low": last_15m_price,
-            "close": last_15m_price,
+            "datetime": last_datetime,
+            "open": last_price,
+            "high": last_price,
+            "low": last_price,
+            "close": last_price,
             "volume": 0 # Volumen simplificado
         }
         df_1d = pd.concat([df_1d, pd.DataFrame([new_row])], ignore_index=True)
 
     # 4. Procesar indicadores sobre el dataset aumentado
-    df_proc = procesar_indicadores(df_1d)
-    
-    # 5. Extraer métricas (última vela)
-    if len(df_proc) < 2:
+    if len(df_1d) < 2:
         return None
+    if estados is not None:
+        indicadores, last_row, prev_row = avanzar_con_velas(estados.get(symbol), df_1d)
+        estados[symbol] = indicadores
+    else:
+        df_proc = procesar_indicadores(df_1d, columnas=COLUMNAS_CRUCE_HMA, copiar=False)
         
-    last_row = df_proc.iloc[-1]
-    prev_row = df_proc.iloc[-2]
-    
+        # 5. Extraer métricas (última vela)
+        last_row = df_proc.iloc[-1]
+        prev_row = df_proc.iloc[-2]
+
+    return metricas_cruce_hma(symbol, last_row, prev_row)
+
+def metricas_cruce_hma(symbol, last_row, prev_row):
+    """
+    Métricas de la regla a partir de las dos últimas velas 1D (filas del df procesado o
+    métricas de IndicadoresIncrementales). La última puede ser la vela en curso simulada.
+    """
     rsi = last_row["RSI"]
     last_close = last_row["close"]
     prev_close = prev_row["close"]
@@ -80,3 +100,12 @@ def regla_cruce_hma(symbol):
         "hma_b": float(round(hma_b, 2)),
         "estado": estado
     }
+
+def tarea_cruce_hma(symbol, dfs, extra=None, estados=None):
+    """
+    Unidad de trabajo de los scans HMA para mapear_velas: velas 1D ya descargadas y
+    `extra` = precio actual del snapshot. Sin precio no se evalúa (no se pide por símbolo).
+    """
+    if extra is None:
+        return None
+    return regla_cruce_hma(symbol, extra, dfs["1D"], estados)
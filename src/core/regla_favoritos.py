@@ -0,0 +1,112 @@
+import threading
+import numpy as np
+import pandas as pd
+from bisect import bisect_right, insort
+
+# Regla de alertas de favoritos en forma vectorizada: una comparación para todos los
+# favoritos con el precio del snapshot (obtener_ultimos_precios), sin descargar velas.
+
+COLUMNAS_FAVORITOS = ["symbol", "alert_value", "alert_direction"]
+
+def evaluar_favoritos(favoritos, precios):
+    """
+    `favoritos`: DataFrame con symbol, alert_value y alert_direction.
+    `precios`: {symbol: (precio, datetime UTC)} del snapshot.
+    Retorna los favoritos con precio, con las columnas `precio` y `disparada`
+    ("encima": precio >= alerta; "debajo": precio < alerta).
+    """
+    df = pd.DataFrame(favoritos, columns=COLUMNAS_FAVORITOS)
+    df["precio"] = df["symbol"].map({symbol: ultimo[0] for symbol, ultimo in precios.items()}).astype(float)
+    df = df[df["precio"].notna()].reset_index(drop=True)
+
+    precio = df["precio"].to_numpy()
+    alerta = df["alert_value"].to_numpy(dtype=float, na_value=np.nan)
+    direccion = df["alert_direction"].to_numpy()
+    # Las comparaciones con NaN (alerta sin valor) dan False
+    with np.errstate(invalid="ignore"):
+        df["disparada"] = np.where(direccion == "encima", precio >= alerta, (direccion == "debajo") & (precio < alerta))
+    return df
+
+def mensaje_alerta(symbol, precio, direccion, alerta):
+    return f"🔔 ALERT: {symbol} está a {precio} ({direccion} de {alerta})"
+
+class IndiceAlertas:
+    """
+    Niveles de alerta en memoria para evaluar precios tick a tick: por símbolo, una lista
+    ordenada de niveles "encima" y otra de "debajo". Cada precio se resuelve con búsqueda
+    binaria (O(log n) + alertas disparadas) en vez de recorrer los favoritos.
+    `precio` informa solo los niveles cruzados desde el precio anterior del símbolo; el
+    primer precio (o el primero después de cambiar sus niveles) informa todos los que cumplen.
+    """
+    def __init__(self):
+        self._niveles = {}  # symbol -> ([encima ordenados], [debajo ordenados])
+        self._ultimo = {}   # symbol -> último precio evaluado
+        self._lock = threading.Lock()
+
+    def cargar(self, favoritos):
+        """
+        Reemplaza el índice con (symbol, alert_value, alert_direction) de todos los favoritos.
+        Los símbolos con los mismos niveles conservan su último precio (no se vuelven a disparar).
+        """
+        niveles = {}
+        for symbol, valor, direccion in favoritos:
+            _agregar_nivel(niveles, symbol, valor, direccion)
+        with self._lock:
+            self._ultimo = {
+                symbol: precio for symbol, precio in self._ultimo.items()
+                if niveles.get(symbol) == self._niveles.get(symbol)
+            }
+            self._niveles = niveles
+
+    def actualizar(self, symbol, valor, direccion):
+        """
+        Alta o cambio de la alerta de un favorito (una por símbolo). Con los mismos niveles
+        se conserva el último precio, como en `cargar`.
+        """
+        niveles = {}
+        _agregar_nivel(niveles, symbol, valor, direccion)
+        with self._lock:
+            if niveles.get(symbol) == self._niveles.get(symbol):
+                return
+            self._niveles.pop(symbol, None)
+            self._ultimo.pop(symbol, None)
+            self._niveles.update(niveles)
+
+    def quitar(self, symbol):
+        with self._lock:
+            self._niveles.pop(symbol, None)
+            self._ultimo.pop(symbol, None)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(encima) + len(debajo) for encima, debajo in self._niveles.values())
+
+    def precio(self, symbol, precio):
+        """
+        Evalúa un precio nuevo del símbolo. Retorna [(direccion, nivel)] de las alertas que
+        se disparan: "encima" si precio >= nivel, "debajo" si precio < nivel.
+        """
+        with self._lock:
+            niveles = self._niveles.get(symbol)
+            previo = self._ultimo.get(symbol)
+            self._ultimo[symbol] = precio
+            if niveles is None:
+                return []
+            encima, debajo = niveles
+            corte_encima = bisect_right(encima, precio)
+            corte_debajo = bisect_right(debajo, precio)
+            if previo is None:
+                disparadas_encima = encima[:corte_encima]
+                disparadas_debajo = debajo[corte_debajo:]
+            else:
+                # Solo los cruzados: previo < nivel <= precio (encima) y precio < nivel <= previo (debajo)
+                disparadas_encima = encima[bisect_right(encima, previo):corte_encima]
+                disparadas_debajo = debajo[corte_debajo:bisect_right(debajo, previo)]
+        return [("encima", nivel) for nivel in disparadas_encima] + [("debajo", nivel) for nivel in disparadas_debajo]
+
+def _agregar_nivel(niveles, symbol, valor, direccion):
+    # Sin valor o con dirección desconocida la alerta nunca se dispara
+    if pd.isna(valor) or direccion not in ("encima", "debajo"):
+        return
+    encima, debajo = niveles.setdefault(symbol, ([], []))
+    insort(encima if direccion == "encima" else debajo, float(valor))
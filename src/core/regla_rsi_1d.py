@@ -0,0 +1,157 @@
+import datetime
+import numpy as np
+from src.core.indicators import procesar_indicadores, promedio_variacion_3m
+from src.core.indicadores_incrementales import avanzar_con_velas
+from src.config import LIMITE_RSI_1D
+
+# Columnas que lee fila_rsi_1d (y recalcular estadísticas) del df procesado
+COLUMNAS_RSI_1D = ("RSI", "rvol", "var", "promedio_variacion_3m")
+
+def estadisticas_desde_entrada(df_1d_proc, entry_date):
+    """
+    Calcula min_price y candles_since_min desde entry_date.
+    Retorna (None, None) si no hay velas desde esa fecha.
+    """
+    df = df_1d_proc
+    if "datetime" in df.columns:
+        df = df.set_index("datetime")
+
+    df_hist = df[df.index.date >= entry_date.date()]
+    if df_hist.empty:
+        return None, None
+
+    min_row = df_hist.loc[df_hist['close'].idxmin()]
+    min_val = float(min_row['close'])
+    min_date = min_row.name
+
+    # Contar velas desde el mínimo hasta el final
+    candles_count = len(df_hist.loc[min_date:]) - 1
+    if candles_count < 0: candles_count = 0
+
+    return min_val, int(candles_count)
+
+def fila_rsi_1d(symbol, df_1d_proc, existente=None, ultima=None, previa=None, estadisticas=None):
+    """
+    Regla de entrada RSI_1D sobre el df ya procesado.
+    - `existente` (fila precargada con entry_date, min_price, candles_since_min): se actualiza
+      siempre y se recalculan sus estadísticas desde la fecha de entrada original.
+    - Sin `existente`: solo entra si el RSI rompe LIMITE_RSI_1D.
+    - `ultima`/`previa`: métricas de las dos últimas velas ya calculadas (indicadores
+      incrementales); en ese caso el df solo se usa para las estadísticas desde la entrada.
+    - `estadisticas`: (min_price, candles) ya calculadas desde la entrada (modo panel).
+    Retorna el dict para upsert en RSI_1D, o None si el símbolo no entra.
+    """
+    if ultima is None:
+        ultima = {
+            "close": df_1d_proc["close"].iloc[-1],
+            "rvol": df_1d_proc["rvol"].iloc[-1],
+            "RSI": df_1d_proc["RSI"].iloc[-1],
+            "promedio_variacion_3m": promedio_variacion_3m(df_1d_proc),
+        }
+        previa = {"close": df_1d_proc["close"].iloc[-2], "rvol": df_1d_proc["rvol"].iloc[-2]}
+
+    # Variación 1D (último vs penúltimo)
+    last_close = ultima["close"]
+    prev_close = previa["close"]
+    last_var = ((last_close - prev_close) / prev_close) * 100
+
+    # RVOLs 1D
+    rvol_1 = ultima["rvol"]
+    rvol_2 = previa["rvol"]
+
+    rsi = ultima["RSI"]
+    prom_var_3m = ultima["promedio_variacion_3m"]
+    ahora = datetime.datetime.utcnow()
+
+    fila = {
+        "symbol": symbol,
+        "rsi_value": float(round(rsi, 2)),
+        "variation": float(round(last_var, 2)),
+        "rvol_1": float(round(rvol_1, 2)),
+        "rvol_2": float(round(rvol_2, 2)),
+        "promedio_variacion_3m": float(round(prom_var_3m, 2)),
+        "valor_actual": float(round(last_close, 2)),
+        "timestamp": ahora,
+    }
+
+    if existente is not None:
+        # Ya existe: se actualiza independiente del RSI actual
+        min_price, candles = (None, None)
+        if estadisticas is not None:
+            min_price, candles = estadisticas
+        elif existente.entry_date is not None:
+            min_price, candles = estadisticas_desde_entrada(df_1d_proc, existente.entry_date)
+        fila["entry_date"] = existente.entry_date
+        fila["min_price"] = min_price if min_price is not None else existente.min_price
+        fila["candles_since_min"] = candles if candles is not None else existente.candles_since_min
+        return fila
+
+    if rsi <= LIMITE_RSI_1D:
+        # Nueva entrada (solo si rompe el límite)
+        fila["entry_date"] = ahora
+        fila["min_price"] = float(last_close)
+        fila["candles_since_min"] = 0
+        return fila
+
+    return None
+
+def evaluar_rsi_1d(symbol, df_1d, existente=None, estados=None):
+    """
+    Aplica fila_rsi_1d sobre las velas 1D crudas.
+    Con `estados` ({symbol: estado}, ver cargar_estados) avanza los indicadores
+    incrementales solo con las velas nuevas y deja el estado actualizado en el dict;
+    sin `estados` recalcula las columnas sobre todo el historial.
+    """
+    if estados is None:
+        df_1d_proc = procesar_indicadores(df_1d, columnas=COLUMNAS_RSI_1D, copiar=False)
+        return fila_rsi_1d(symbol, df_1d_proc, existente)
+
+    indicadores, ultima, previa = avanzar_con_velas(estados.get(symbol), df_1d)
+    estados[symbol] = indicadores
+    return fila_rsi_1d(symbol, df_1d, existente, ultima, previa)
+
+def tarea_rsi_1d(symbol, dfs, existente=None, estados=None):
+    """
+    Unidad de trabajo del scan RSI_1D para mapear_velas. Retorna (analizado, fila):
+    con menos de 20 velas 1D el símbolo no se analiza.
+    """
+    df_1d = dfs["1D"]
+    if df_1d.empty or len(df_1d) < 20:
+        return False, None
+    return True, evaluar_rsi_1d(symbol, df_1d, existente, estados)
+
+def filas_rsi_1d_panel(panel, existentes):
+    """
+    Regla RSI_1D sobre todo el universo de una vez (modo bulk, ver panel_1d).
+    Candidatos: los existentes y los nuevos que rompen LIMITE_RSI_1D (una sola máscara).
+    Retorna (filas, analizados).
+    """
+    panel.calcular(COLUMNAS_RSI_1D)
+    suficientes = panel.conteos >= 20
+    existe = np.array([symbol in existentes for symbol in panel.symbols], dtype=bool)
+    candidatos = np.flatnonzero(suficientes & (existe | panel.mascara_rsi(LIMITE_RSI_1D)))
+
+    # Estadísticas desde la entrada de los existentes, vectorizadas
+    con_entrada = [i for i in candidatos if existe[i] and existentes[panel.symbols[i]].entry_date is not None]
+    min_price, candles = panel.estadisticas_desde(
+        con_entrada, [existentes[panel.symbols[i]].entry_date for i in con_entrada]
+    )
+    estadisticas = {
+        i: (None, None) if np.isnan(m) else (float(m), int(c))
+        for i, m, c in zip(con_entrada, min_price, candles)
+    }
+
+    close, close_prev = panel.ultimo("close"), panel.previo("close")
+    rvol, rvol_prev = panel.ultimo("rvol"), panel.previo("rvol")
+    rsi = panel.ultimo("RSI")
+    filas = []
+    for i in candidatos:
+        symbol = panel.symbols[i]
+        ultima = {"close": close[i], "rvol": rvol[i], "RSI": rsi[i],
+                  "promedio_variacion_3m": panel.promedio_variacion_3m[i]}
+        previa = {"close": close_prev[i], "rvol": rvol_prev[i]}
+        fila = fila_rsi_1d(symbol, None, existentes.get(symbol), ultima, previa,
+                           estadisticas.get(i, (None, None)))
+        if fila:
+            filas.append(fila)
+    return filas, int(suficientes.sum())
@@ -0,0 +1,150 @@
+import time
+import datetime
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from src.models import SessionLocal, ScanJob
+from src import config
+
+# Cola de jobs en segundo plano para los scans largos de la API: el endpoint encola y
+# responde con el id; un hilo del worker corre la tarea registrada y va guardando el
+# progreso en scan_jobs, que se consulta con GET /api/jobs/{id}.
+
+ACTIVOS = ("pendiente", "corriendo")
+
+_tareas = {}  # tipo -> función(progreso) que retorna el mensaje final
+_executor = None
+
+class JobDuplicadoError(Exception):
+    """Ya hay un job activo del mismo tipo."""
+    def __init__(self, job_id):
+        super().__init__(f"Ya hay un job activo de este tipo (id {job_id})")
+        self.job_id = job_id
+
+def registrar_tarea(tipo, funcion):
+    _tareas[tipo] = funcion
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.JOBS_WORKERS, thread_name_prefix="job")
+    return _executor
+
+class Progreso:
+    """
+    Progreso de un job. `avanzar` se llama por símbolo; la fila de scan_jobs se
+    actualiza como mucho cada `intervalo` segundos para no escribir por símbolo.
+    """
+    def __init__(self, job_id, intervalo=1.0):
+        self.job_id = job_id
+        self.intervalo = intervalo
+        self.total = 0
+        self.procesados = 0
+        self.hits = 0
+        self.errores = 0
+        self._ultimo_guardado = 0.0
+
+    def iniciar(self, total):
+        self.total = int(total)
+        self.guardar(forzar=True)
+
+    def avanzar(self, n=1, hits=0, errores=0):
+        self.procesados += n
+        self.hits += hits
+        self.errores += errores
+        self.guardar()
+
+    def guardar(self, forzar=False, **campos):
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultimo_guardado < self.intervalo:
+            return
+        self._ultimo_guardado = ahora
+        campos.update(
+            total=self.total, procesados=self.procesados, hits=self.hits,
+            errores=self.errores, actualizado=datetime.datetime.utcnow(),
+        )
+        db = SessionLocal()
+        try:
+            db.query(ScanJob).filter(ScanJob.id == self.job_id).update(campos)
+            db.commit()
+        finally:
+            db.close()
+
+def _correr(job_id, tipo):
+    progreso = Progreso(job_id)
+    progreso.guardar(forzar=True, estado="corriendo", iniciado=datetime.datetime.utcnow())
+    try:
+        mensaje = _tareas[tipo](progreso)
+        progreso.guardar(forzar=True, estado="completado", mensaje=mensaje, terminado=datetime.datetime.utcnow())
+    except Exception as e:
+        traceback.print_exc()
+        print(f"❌ Error en job {tipo} #{job_id}: {e}")
+        progreso.guardar(forzar=True, estado="error", error=str(e), terminado=datetime.datetime.utcnow())
+
+def _limite_inactivo():
+    # Un job sin progreso hace más de JOBS_TIMEOUT_INACTIVO se da por caído
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=config.JOBS_TIMEOUT_INACTIVO)
+
+def encolar_job(tipo):
+    """
+    Crea el job y lo manda al worker. Retorna el id.
+    Lanza JobDuplicadoError si ya hay uno activo del mismo tipo: lo decide la base con el
+    índice único parcial ix_scan_jobs_activo, en la misma transacción del INSERT.
+    """
+    if tipo not in _tareas:
+        raise ValueError(f"Tipo de job desconocido: {tipo}")
+
+    db = SessionLocal()
+    try:
+        # Un activo sin progreso hace más de JOBS_TIMEOUT_INACTIVO se da por caído y libera el tipo
+        db.query(ScanJob).filter(
+            ScanJob.tipo == tipo, ScanJob.estado.in_(ACTIVOS), ScanJob.actualizado < _limite_inactivo()
+        ).update({
+            "estado": "error",
+            "error": f"Sin progreso hace más de {config.JOBS_TIMEOUT_INACTIVO}s; el job se dio por caído",
+            "terminado": datetime.datetime.utcnow(),
+        }, synchronize_session=False)
+        job = ScanJob(tipo=tipo, estado="pendiente")
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            activo = db.query(ScanJob.id).filter(ScanJob.tipo == tipo, ScanJob.estado.in_(ACTIVOS)).scalar()
+            raise JobDuplicadoError(activo)
+        job_id = job.id
+    finally:
+        db.close()
+
+    _get_executor().submit(_correr, job_id, tipo)
+    return job_id
+
+def job_a_dict(job):
+    """
+    Progreso del job para la API, con ETA estimada según el ritmo hasta ahora.
+    Un job activo sin progreso hace más de JOBS_TIMEOUT_INACTIVO se informa como error
+    (igual que en encolar_job) para que el cliente deje de esperarlo.
+    """
+    estado, error = job.estado, job.error
+    if estado in ACTIVOS and (job.actualizado or job.creado) < _limite_inactivo():
+        estado = "error"
+        error = f"Sin progreso hace más de {config.JOBS_TIMEOUT_INACTIVO}s; el job se dio por caído"
+    eta = None
+    if estado == "corriendo" and job.iniciado and job.procesados and job.total:
+        transcurrido = (datetime.datetime.utcnow() - job.iniciado).total_seconds()
+        eta = round(transcurrido / job.procesados * (job.total - job.procesados), 1)
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "estado": estado,
+        "total": job.total,
+        "procesados": job.procesados,
+        "hits": job.hits,
+        "errores": job.errores,
+        "eta_segundos": eta,
+        "mensaje": job.mensaje,
+        "error": error,
+        "creado": job.creado,
+        "iniciado": job.iniciado,
+        "terminado": job.terminado,
+    }
@@ -0,0 +1,160 @@
+import json
+import base64
+import hashlib
+import datetime
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import Float, Integer, DateTime, func, tuple_
+from sqlalchemy.orm import load_only
+from src.models import version_tabla, TableVersion, FilaBorrada
+
+# Listados de la API (/api/data, /api/track_data, /api/favoritos_data):
+# - ETag con la versión de la tabla (table_versions): si no cambió nada, 304 sin consultar filas.
+# - Paginación por cursor (keyset): ?orden=-timestamp&limite=200&cursor=...; el cursor de la
+#   página siguiente va en el header X-Cursor-Siguiente y el cuerpo sigue siendo la lista de filas.
+# - Delta-sync: ?since=<version> retorna solo lo cambiado y borrado desde esa versión (X-Version
+#   de la carga completa o "version" del último delta/evento de /api/cambios).
+
+LIMITE_MAX = 1000
+
+def _sin_nulos(columna):
+    # PK o NOT NULL: se ordenan por la columna directa (así el ORDER BY y el cursor usan los
+    # índices). Un default de Python no alcanza: filas de otros orígenes pueden tener NULL.
+    return columna.primary_key or not columna.nullable
+
+def _valor_nulo(columna):
+    # Los NULL se ordenan como el menor valor posible, igual en Postgres y SQLite
+    if isinstance(columna.type, Float):
+        return -1e300
+    if isinstance(columna.type, Integer):
+        return -(2 ** 62)
+    if isinstance(columna.type, DateTime):
+        return datetime.datetime(1900, 1, 1)
+    return ""
+
+def _codificar_cursor(valor, fila_id):
+    if isinstance(valor, datetime.datetime):
+        valor = valor.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([valor, fila_id]).encode()).decode().rstrip("=")
+
+def _leer_cursor(cursor, columna):
+    try:
+        valor, fila_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if isinstance(columna.type, DateTime):
+            valor = datetime.datetime.fromisoformat(valor)
+        return valor, int(fila_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _etag(tabla, version, *partes):
+    parametros = hashlib.md5("|".join(map(str, partes)).encode()).hexdigest()[:12]
+    return f'"{tabla}-{version}-{parametros}"'
+
+def _coincide(if_none_match, etag):
+    if not if_none_match:
+        return False
+    etiquetas = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+    return "*" in etiquetas or etag in etiquetas
+
+def listado(request, response, db, modelo, serializar, ordenes, orden, limite=None, cursor=None, filtros=None, columnas=None):
+    """
+    Filas serializadas de `modelo` ordenadas por `orden` (clave de `ordenes`, con "-" para
+    descendente) y desempate por id. Sin `limite` trae todas. `filtros` es {columna: valor}
+    (los None se ignoran) y `columnas` limita las columnas cargadas a las que usa `serializar`.
+    Pone ETag, X-Version y X-Cursor-Siguiente en `response`, o retorna un 304 si el cliente
+    ya tiene esta versión.
+    """
+    filtros = {nombre: valor for nombre, valor in (filtros or {}).items() if valor is not None}
+    descendente = orden.startswith("-")
+    columna = ordenes.get(orden.lstrip("-"))
+    if columna is None:
+        raise HTTPException(status_code=400, detail=f"Orden inválido. Opciones: {', '.join(ordenes)} (con - para descendente)")
+    if limite is not None and not 1 <= limite <= LIMITE_MAX:
+        raise HTTPException(status_code=400, detail=f"El límite debe estar entre 1 y {LIMITE_MAX}")
+
+    # La versión se lee antes que las filas: si algo cambia entre medio, el ETag queda viejo
+    # y el cliente vuelve a pedir (nunca filas viejas con un ETag nuevo)
+    tabla = modelo.__tablename__
+    version = version_tabla(db, tabla)
+    etag = _etag(tabla, version, orden, limite, cursor, sorted(filtros.items()))
+    headers = {"ETag": etag, "X-Version": str(version), "Cache-Control": "no-cache"}
+    if _coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    nulo = None if _sin_nulos(columna) else _valor_nulo(columna)
+    clave = columna if nulo is None else func.coalesce(columna, nulo)
+    query = db.query(modelo)
+    if columnas:
+        query = query.options(load_only(*[getattr(modelo, nombre) for nombre in columnas]))
+    for nombre, valor in filtros.items():
+        query = query.filter(getattr(modelo, nombre) == valor)
+    if cursor:
+        valor, fila_id = _leer_cursor(cursor, columna)
+        # Comparación de filas (clave, id): Postgres y SQLite la resuelven con el índice
+        if descendente:
+            query = query.filter(tuple_(clave, modelo.id) < tuple_(valor, fila_id))
+        else:
+            query = query.filter(tuple_(clave, modelo.id) > tuple_(valor, fila_id))
+    if descendente:
+        query = query.order_by(clave.desc(), modelo.id.desc())
+    else:
+        query = query.order_by(clave.asc(), modelo.id.asc())
+    if limite is not None:
+        query = query.limit(limite + 1)
+    filas = query.all()
+
+    if limite is not None and len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        valor = getattr(ultima, columna.key)
+        headers["X-Cursor-Siguiente"] = _codificar_cursor(nulo if valor is None and nulo is not None else valor, ultima.id)
+    response.headers.update(headers)
+    return [serializar(fila) for fila in filas]
+
+def delta(request, response, db, modelo, serializar, since):
+    """
+    Cambios de `modelo` posteriores a la versión `since`, con el mismo formato que los
+    eventos de /api/cambios: {"tabla", "version", "filas", "borrados", "reset"}.
+    reset=True (versión desconocida, tombstones ya purgados o un cambio masivo) pide
+    recargar la tabla completa.
+    """
+    if since < 0:
+        raise HTTPException(status_code=400, detail="since debe ser >= 0")
+    tabla = modelo.__tablename__
+    registro = db.get(TableVersion, tabla)
+    version = registro.version if registro else 0
+    etag = _etag(tabla, version, "since", since, None)
+    headers = {"ETag": etag, "X-Version": str(version), "Cache-Control": "no-cache"}
+    if _coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    resultado = {"tabla": tabla, "version": version, "filas": [], "borrados": [], "reset": False}
+    masivo = (
+        db.query(FilaBorrada.id)
+        .filter(FilaBorrada.tabla == tabla, FilaBorrada.symbol.is_(None), FilaBorrada.version > since)
+        .first()
+    )
+    if since > version or since < ((registro.minima_delta or 0) if registro else 0) or masivo:
+        resultado["reset"] = True
+        return resultado
+    if since == version:
+        return resultado
+
+    filas = (
+        db.query(modelo)
+        .filter(modelo.updated_version > since)
+        .order_by(modelo.updated_version, modelo.id)
+        .all()
+    )
+    presentes = {fila.symbol for fila in filas}
+    borrados = (
+        db.query(FilaBorrada.symbol)
+        .filter(FilaBorrada.tabla == tabla, FilaBorrada.version > since, FilaBorrada.symbol.isnot(None))
+        .distinct()
+        .all()
+    )
+    resultado["filas"] = [serializar(fila) for fila in filas]
+    # Un símbolo borrado y vuelto a insertar viene como fila
+    resultado["borrados"] = sorted(symbol for (symbol,) in borrados if symbol not in presentes)
+    return resultado
@@ -1,25 +1,52 @@
 import os
-import io
+import time
 import pandas as pd
-from fastapi import FastAPI, UploadFile, File, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Request, Response, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from src.models import SessionLocal, init_db, StockList, RSI_4H, RSI_1D, StockTracking, Favorite
-from src.core.polygon_client import obtener_velas_polygon
+from src.models import (
+    SessionLocal, init_db, StockList, RSI_4H, RSI_1D, StockTracking, Favorite, ScanJob,
+    precargar_por_simbolo, upsert_por_simbolo, actualizar_por_simbolo, insertar_simbolos, fila_tracking, TRACKING_ACTUALIZABLES,
+    TABLAS_OBSERVADAS, purgar_tombstones,
+)
+from src.core.polygon_client import obtener_velas_polygon, obtener_ultimos_precios
+from src.core.cache_velas import cache_de_ejecucion
 from src.core.indicators import calcular_rsi, procesar_indicadores, promedio_variacion_3m
 from src.core.regla_cruce_hma import regla_cruce_hma
-from src.config import LIMITE_RSI_1D, TIMEZONE_UTC, API_KEY
+from src.core.regla_rsi_1d import estadisticas_desde_entrada, COLUMNAS_RSI_1D
+from src.core.indicadores_incrementales import cargar_estados, guardar_estados
+from src.script.tarea_pipeline import correr_pipeline, EtapaRSI1D
+from src.jobs import registrar_tarea, encolar_job, job_a_dict, JobDuplicadoError
+from src.cambios import broker, formato_sse, fila_rsi_1d, fila_tracking_api, fila_favorito, COLUMNAS_TRACKING_API
+from src.listados import listado, delta
+from src.config import LIMITE_RSI_1D, API_KEY
 from src import config
+import asyncio
 import datetime
 from contextlib import asynccontextmanager
+from anyio import to_thread
 from sqlalchemy import func
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Inicializar base de datos
     init_db()
+    db = SessionLocal()
+    try:
+        purgados = purgar_tombstones(db)
+        db.commit()
+        if purgados:
+            print(f"🧹 {purgados} tombstones purgados")
+    finally:
+        db.close()
+    # Los endpoints con DB o Polygon son `def`: FastAPI los corre en este pool de hilos y
+    # el event loop queda libre (un scan largo no bloquea "/" ni "/api/data")
+    to_thread.current_default_thread_limiter().total_tokens = config.API_THREADS
+    # Feed de cambios para /api/cambios
+    broker.iniciar()
     
     yield
+    broker.detener()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -38,157 +65,164 @@ async def read_favoritos(request: Request):
 async def read_track(request: Request):
     return templates.TemplateResponse("track.html", {"request": request})
 
+def _leer_simbolos_csv(archivo, chunksize=50_000):
+    """
+    Lee el CSV por bloques y retorna el set de símbolos normalizados (strip + upper).
+    Solo se parsea la columna 'symbol' o 'stock' (la primera que aparezca).
+    """
+    lector = pd.read_csv(
+        archivo,
+        chunksize=chunksize,
+        usecols=lambda c: c.lower() in ("symbol", "stock"),
+        dtype=str,
+    )
+    symbols = set()
+    for chunk in lector:
+        if chunk.columns.empty:
+            raise HTTPException(status_code=400, detail="El CSV debe contener una columna 'symbol' o 'stock'")
+        serie = chunk[chunk.columns[0]].dropna().str.strip().str.upper()
+        symbols.update(serie[serie != ""])
+    return symbols
+
 @app.post("/upload-csv")
-async def upload_csv(file: UploadFile = File(...)):
+def upload_csv(file: UploadFile = File(...)):
     if not file.filename.lower().endswith('.csv'):
         raise HTTPException(status_code=400, detail="El archivo debe ser CSV")
     
+    tiempos = {}
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.BytesIO(contents))
-        
-        # Normalizar nombres de columnas a minúsculas para facilitar búsqueda
-        df.columns = [c.lower() for c in df.columns]
-        
-        # Determinar la columna de símbolo (puede ser 'symbol' o 'stock')
-        symbol_col = next((c for c in df.columns if c in ['symbol', 'stock']), None)
-        
-        if not symbol_col:
-            raise HTTPException(status_code=400, detail="El CSV debe contener una columna 'symbol' o 'stock'")
-        
-        db = SessionLocal()
-        new_symbols_count = 0
-        try:
-            # Eliminar duplicados en el CSV y valores nulos
-            symbols = df[symbol_col].dropna().unique()
-            
-            for symbol in symbols:
-                symbol = str(symbol).strip().upper()
-                if not symbol:
-                    continue
-                # Verificar si ya existe
-                exists = db.query(StockList).filter(StockList.symbol == symbol).first()
-                if not exists:
-                    db.add(StockList(symbol=symbol))
-                    new_symbols_count += 1
-            db.commit()
-            return {"message": f"Se procesaron los símbolos. {new_symbols_count} nuevos agregados."}
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=500, detail=f"Error en base de datos: {str(e)}")
-        finally:
-            db.close()
-            
+        inicio = time.perf_counter()
+        # Se lee el archivo en streaming desde el spool del upload, sin cargarlo entero en memoria
+        symbols = _leer_simbolos_csv(file.file)
+        tiempos["parse_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error procesando el archivo: {str(e)}")
-
-@app.post("/scan-rsi")
-async def scan_rsi():
+    
     db = SessionLocal()
     try:
-        stocks = db.query(StockList).all()
-        if not stocks:
-            return {"message": "No hay stocks en la lista para escanear."}
-            
-        processed_count = 0
-        rsi_hits = 0
-        
-        for stock in stocks:
-            try:
-                # 1. Obtener data 1D para Variación y RVOL
-                df_1d = obtener_velas_polygon(stock.symbol, "1D")
-                if df_1d.empty or len(df_1d) < 20: 
-                    continue
-                
-                df_1d_proc = procesar_indicadores(df_1d)
-                
-                # Variación 1D (último vs penúltimo)
-                last_close = df_1d_proc["close"].iloc[-1]
-                prev_close = df_1d_proc["close"].iloc[-2]
-                last_var = ((last_close - prev_close) / prev_close) * 100
-                
-                # RVOLs 1D
-                rvol_1 = df_1d_proc["rvol"].iloc[-1]
-                rvol_2 = df_1d_proc["rvol"].iloc[-2]
-
-                rsi = df_1d_proc["RSI"].iloc[-1]
-                prom_var_3m = promedio_variacion_3m(df_1d_proc)
-
-                clean_symbol = stock.symbol.strip().upper()
-                existing_rsi1d = db.query(RSI_1D).filter(RSI_1D.symbol == clean_symbol).first()
-
-                if existing_rsi1d:
-                    # Ya existe, ACTUALIZAMOS sus campos (independiente del RSI actual)
-                    existing_rsi1d.rsi_value = float(round(rsi, 2))
-                    existing_rsi1d.variation = float(round(last_var, 2))
-                    existing_rsi1d.rvol_1 = float(round(rvol_1, 2))
-                    existing_rsi1d.rvol_2 = float(round(rvol_2, 2))
-                    existing_rsi1d.promedio_variacion_3m = float(round(prom_var_3m, 2))
-                    existing_rsi1d.valor_actual = float(round(last_close, 2))
-                    existing_rsi1d.timestamp = datetime.datetime.utcnow()
-                    
-                    # Recalculamos estadísticas basadas en su fecha de entrada original
-                    recalculate_rsi_1d_stats(existing_rsi1d, df_1d_proc)
-                    processed_count += 1
-                elif rsi <= LIMITE_RSI_1D:
-                    # Nueva entrada (solo si rompe el límite)
-                    new_rsi1d = RSI_1D(
-                        symbol=clean_symbol,
-                        rsi_value=float(round(rsi, 2)),
-                        variation=float(round(last_var, 2)),
-                        rvol_1=float(round(rvol_1, 2)),
-                        rvol_2=float(round(rvol_2, 2)),
-                        promedio_variacion_3m=float(round(prom_var_3m, 2)),
-                        valor_actual=float(round(last_close, 2)),
-                        entry_date=datetime.datetime.utcnow(),
-                        min_price=float(last_close),
-                        candles_since_min=0,
-                        timestamp=datetime.datetime.utcnow()
-                    )
-                    db.add(new_rsi1d)
-                    rsi_hits += 1
-                    processed_count += 1
-            except Exception as inner_e:
-                print(f"Error procesando {stock.symbol}: {inner_e}")
-                continue
+        # Diff contra stock_list con una sola consulta
+        inicio = time.perf_counter()
+        existentes = precargar_por_simbolo(db, StockList)
+        nuevos = sorted(symbols - existentes.keys())
+        tiempos["diff_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
         
+        inicio = time.perf_counter()
+        insertar_simbolos(db, StockList, nuevos)
         db.commit()
+        tiempos["insert_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        
         return {
-            "message": f"Escaneo completado. {processed_count} stocks analizados, {rsi_hits} registros nuevos en RSI_1D (RSI <= {LIMITE_RSI_1D})"
+            "message": f"Se procesaron los símbolos. {len(nuevos)} nuevos agregados.",
+            "leidos": len(symbols),
+            "existentes": len(symbols) - len(nuevos),
+            "nuevos": len(nuevos),
+            "tiempos": tiempos,
         }
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error en el escaneo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en base de datos: {str(e)}")
+    finally:
+        db.close()
+
+def _job_scan_rsi(progreso):
+    """Scan RSI_1D de toda la lista (job en segundo plano, ver src/jobs.py): la etapa RSI_1D del pipeline."""
+    etapa = EtapaRSI1D()
+    resultado = correr_pipeline([etapa], nombre="scan RSI 1D", progreso=progreso)
+    if not resultado["simbolos"]:
+        return "No hay stocks en la lista para escanear."
+    escritas = resultado["escrituras"].get(RSI_1D.__tablename__, {"insertados": 0, "actualizados": 0})
+    return (
+        f"Escaneo completado. {etapa.analizados} stocks analizados, {escritas['insertados']} registros nuevos "
+        f"en RSI_1D (RSI <= {LIMITE_RSI_1D}), {escritas['actualizados']} actualizados"
+    )
+
+registrar_tarea("scan_rsi", _job_scan_rsi)
+
+def _encolar(tipo):
+    """Encola el job y responde enseguida con su id (409 si ya hay uno del mismo tipo)."""
+    try:
+        job_id = encolar_job(tipo)
+    except JobDuplicadoError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job_id})
+    return {"message": f"Job {tipo} encolado", "job_id": job_id}
+
+@app.post("/scan-rsi", status_code=202)
+def scan_rsi():
+    return _encolar("scan_rsi")
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.query(ScanJob).filter(ScanJob.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job no encontrado")
+        return job_a_dict(job)
     finally:
         db.close()
 
+# Claves de orden de los listados (?orden=, con "-" para descendente)
+ORDENES_RSI_1D = {
+    "timestamp": RSI_1D.timestamp, "symbol": RSI_1D.symbol, "rsi_value": RSI_1D.rsi_value,
+    "variation": RSI_1D.variation, "entry_date": RSI_1D.entry_date, "id": RSI_1D.id,
+}
+ORDENES_TRACKING = {
+    "id": StockTracking.id, "symbol": StockTracking.symbol, "rsi_value": StockTracking.rsi_value,
+    "variation": StockTracking.variation, "timestamp": StockTracking.timestamp,
+}
+ORDENES_FAVORITOS = {
+    "id": Favorite.id, "symbol": Favorite.symbol, "timestamp": Favorite.timestamp,
+}
+
 @app.get("/api/data")
-async def get_results():
+def get_results(request: Request, response: Response, orden: str = "-timestamp", limite: int = 100, cursor: str = None, since: int = None):
     db = SessionLocal()
     try:
-        results = db.query(RSI_1D).order_by(RSI_1D.timestamp.desc()).limit(100).all()
-        # [symbol, rvol1, rvol2, var, rsi, hma10, hma20, min_price, candles, date]
-        return [
-            [
-                r.symbol, 
-                r.rvol_1, 
-                r.rvol_2, 
-                r.variation, 
-                r.rsi_value, 
-                r.promedio_variacion_3m,
-                r.valor_actual,
-                r.min_price,
-                r.candles_since_min,
-                (r.entry_date + datetime.timedelta(hours=TIMEZONE_UTC)).strftime("%Y-%m-%d"),
-                (r.timestamp + datetime.timedelta(hours=TIMEZONE_UTC)).strftime("%Y-%m-%d %H:%M")
-            ] 
-            for r in results
-        ]
+        if since is not None:
+            return delta(request, response, db, RSI_1D, fila_rsi_1d, since)
+        return listado(request, response, db, RSI_1D, fila_rsi_1d, ORDENES_RSI_1D, orden, limite, cursor)
     finally:
         db.close()
 
+@app.get("/api/cambios")
+async def stream_cambios(tablas: str = None):
+    """
+    Server-sent events con los cambios de rsi_1d, stock_tracking y favorites
+    (?tablas=rsi_1d,favorites para filtrar). Eventos:
+    - cambios: {"tabla", "version", "filas": [...], "borrados": [symbols]}, filas con el formato del listado
+    - reset: {"tabla"}: ponerse al día con ?since= (tabla null = todas)
+    """
+    pedidas = [t.strip() for t in tablas.split(",") if t.strip()] if tablas else None
+    if pedidas and set(pedidas) - set(TABLAS_OBSERVADAS):
+        raise HTTPException(status_code=400, detail=f"Tablas válidas: {', '.join(TABLAS_OBSERVADAS)}")
+    cola = broker.suscribir(pedidas)
+
+    async def eventos():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene viva la conexión en proxies
+                    yield ": ping\n\n"
+                    continue
+                if evento is None:
+                    break
+                yield formato_sse(evento)
+        finally:
+            broker.desuscribir(cola)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/api/add_track")
-async def add_to_track(symbols: list[str]):
+def add_to_track(symbols: list[str]):
     db = SessionLocal()
     try:
         from src.config import LIMITE_RSI_1D
@@ -215,7 +249,7 @@ async def add_to_track(symbols: list[str]):
         db.close()
 
 @app.post("/api/add_favoritos")
-async def add_to_favorites(symbols: list[str]):
+def add_to_favorites(symbols: list[str]):
     db = SessionLocal()
     try:
         for symbol in symbols:
@@ -228,63 +262,45 @@ async def add_to_favorites(symbols: list[str]):
         db.close()
 
 @app.get("/api/track_data")
-async def get_track_data():
+def get_track_data(
+    request: Request, response: Response, orden: str = "id", limite: int = None, cursor: str = None, since: int = None,
+    estado: str = None, alert_alcista: int = None, alert_bajista: int = None,
+):
     db = SessionLocal()
     try:
-        favs = db.query(StockTracking).all()
-        # Orden: symbol, current_price, rsi_value, variation, rvol_1, rvol_2, hma_a, hma_b, alert_alcista, alert_bajista, estado
-        return [
-            [
-                f.symbol, 
-                f.current_price,
-                f.rsi_value, 
-                f.variation, 
-                f.rvol_1, 
-                f.rvol_2, 
-                f.hma_a, 
-                f.hma_b, 
-                f.alert_alcista,
-                f.alert_bajista,
-                f.estado
-            ] for f in favs
-        ]
+        if since is not None:
+            return delta(request, response, db, StockTracking, fila_tracking_api, since)
+        filtros = {"estado": estado, "alert_alcista": alert_alcista, "alert_bajista": alert_bajista}
+        return listado(
+            request, response, db, StockTracking, fila_tracking_api, ORDENES_TRACKING, orden, limite, cursor,
+            filtros=filtros, columnas=COLUMNAS_TRACKING_API,
+        )
     finally:
         db.close()
 
 @app.get("/api/favoritos_data")
-async def get_favorites():
+def get_favorites(request: Request, response: Response, orden: str = "id", limite: int = None, cursor: str = None, since: int = None):
     db = SessionLocal()
     try:
-        favs = db.query(Favorite).all()
-        # [symbol, current_value, alert_value, alert_direction, timestamp]
-        return [
-            [
-                f.symbol, 
-                f.current_value, 
-                f.alert_value, 
-                f.alert_direction,
-                (f.timestamp + datetime.timedelta(hours=TIMEZONE_UTC)).strftime("%Y-%m-%d %H:%M") if f.timestamp else "-"
-            ] 
-            for f in favs
-        ]
+        if since is not None:
+            return delta(request, response, db, Favorite, fila_favorito, since)
+        return listado(request, response, db, Favorite, fila_favorito, ORDENES_FAVORITOS, orden, limite, cursor)
     finally:
         db.close()
 
 @app.post("/api/refresh_favorites")
-async def refresh_favorites():
+def refresh_favorites():
     db = SessionLocal()
     try:
-        favs = db.query(Favorite).all()
-        updated_count = 0
-        for fav in favs:
-            try:
-                df = obtener_velas_polygon(fav.symbol, "1D")
-                if not df.empty:
-                    fav.current_value = float(df["close"].iloc[-1])
-                    updated_count += 1
-            except Exception as e:
-                print(f"Error actualizando {fav.symbol}: {e}")
-                continue
+        symbols = list(precargar_por_simbolo(db, Favorite))
+        # Un snapshot multi-ticker para todos los favoritos y un UPDATE por lotes
+        precios = obtener_ultimos_precios(symbols)
+        for symbol in symbols:
+            if symbol not in precios:
+                print(f"Error actualizando {symbol}: sin precio en el snapshot")
+        updated_count = actualizar_por_simbolo(db, Favorite, [
+            {"symbol": symbol, "current_value": precios[symbol][0]} for symbol in symbols if symbol in precios
+        ])
         db.commit()
         return {"message": f"Precios actualizados para {updated_count} símbolos"}
     except Exception as e:
@@ -294,16 +310,16 @@ async def refresh_favorites():
         db.close()
 
 @app.post("/api/add_manual_favorite")
-async def add_manual_favorite(data: dict):
+def add_manual_favorite(data: dict):
     # data: { "symbol": "TSLA", "alert_value": 130.44, "direction": "encima" }
     db = SessionLocal()
     try:
         symbol = data["symbol"].strip().upper()
-        # Obtener precio actual de Polygon 1D
-        df = obtener_velas_polygon(symbol, "1D")
+        # Obtener precio actual del snapshot de Polygon
+        ultimo = obtener_ultimos_precios([symbol]).get(symbol)
         current_price = 0.0
-        if not df.empty:
-            current_price = float(df["close"].iloc[-1])
+        if ultimo:
+            current_price = ultimo[0]
             
         exists = db.query(Favorite).filter(Favorite.symbol == symbol).first()
         if exists:
@@ -326,7 +342,7 @@ async def add_manual_favorite(data: dict):
         db.close()
 
 @app.post("/api/update_favorite_values")
-async def update_favorite_values(data: dict):
+def update_favorite_values(data: dict):
     # data: { "symbol": "AAPL", "current_value": 150.0, "alert_value": 140.0, "alert_direction": "debajo" }
     db = SessionLocal()
     try:
@@ -342,7 +358,7 @@ async def update_favorite_values(data: dict):
         db.close()
 
 @app.post("/api/add_manual_track")
-async def add_manual_track(data: dict):
+def add_manual_track(data: dict):
     # data: { "symbol": "TSLA" }
     db = SessionLocal()
     try:
@@ -389,7 +405,7 @@ async def add_manual_track(data: dict):
         db.close()
 
 @app.post("/api/track_values")
-async def update_track_values(data: dict):
+def update_track_values(data: dict):
     db = SessionLocal()
     try:
         fav = db.query(StockTracking).filter(StockTracking.symbol == data["symbol"]).first()
@@ -405,7 +421,7 @@ async def update_track_values(data: dict):
         db.close()
 
 @app.post("/api/track/toggle_alert")
-async def toggle_alert(data: dict):
+def toggle_alert(data: dict):
     # data: { "symbol": "AAPL", "field": "alert_alcista", "value": true }
     db = SessionLocal()
     try:
@@ -428,72 +444,62 @@ async def toggle_alert(data: dict):
     finally:
         db.close()
 
-@app.post("/api/recalculate_hma")
-async def recalculate_hma():
-    db = SessionLocal()
-    try:
-        # 1. Obtener todos los stocks de la tabla RSI_1D
-        rsi_stocks = db.query(RSI_1D).all()
-        if not rsi_stocks:
-            return {"message": "No hay stocks en RSI_1D para analizar."}
+def _job_recalculate_hma(progreso):
+    """Cruce HMA sobre RSI_1D (job en segundo plano, ver src/jobs.py)."""
+    with cache_de_ejecucion("recalcular HMA"):
+        db = SessionLocal()
+        try:
+            # 1. Obtener todos los stocks de la tabla RSI_1D
+            rsi_stocks = db.query(RSI_1D).all()
+            if not rsi_stocks:
+                return "No hay stocks en RSI_1D para analizar."
+            progreso.iniciar(len(rsi_stocks))
             
-        updated_count = 0
-        added_count = 0
+            existentes = precargar_por_simbolo(db, StockTracking)
+            estados = cargar_estados(db) if config.INDICADORES_INCREMENTALES else None
+            filas = []
+            # Precio actual de todos con el snapshot multi-ticker
+            precios = obtener_ultimos_precios([rsi_stock.symbol for rsi_stock in rsi_stocks])
         
-        for rsi_stock in rsi_stocks:
-            symbol = rsi_stock.symbol
-            try:
-                metrics = regla_cruce_hma(symbol)
-                if not metrics:
-                    continue
+            for rsi_stock in rsi_stocks:
+                symbol = rsi_stock.symbol
+                try:
+                    if symbol not in precios:
+                        progreso.avanzar()
+                        continue
+                    metrics = regla_cruce_hma(symbol, precios[symbol], estados=estados)
                 
-                # REGLA: Solo guardamos/actualizamos si HMA_A >= HMA_B
-                if metrics["hma_a"] >= metrics["hma_b"]:
-                    # Buscar si ya existe en stock_tracking
-                    track_entry = db.query(StockTracking).filter(StockTracking.symbol == symbol).first()
-                    
-                    if track_entry:
-                        # Actualizar existente
-                        track_entry.current_price = metrics["current_price"]
-                        track_entry.rsi_value = metrics["rsi_value"]
-                        track_entry.variation = metrics["variation"]
-                        track_entry.rvol_1 = metrics["rvol_1"]
-                        track_entry.rvol_2 = metrics["rvol_2"]
-                        track_entry.hma_a = metrics["hma_a"]
-                        track_entry.hma_b = metrics["hma_b"]
-                        track_entry.estado = metrics["estado"]
-                        track_entry.timestamp = datetime.datetime.utcnow()
-                        updated_count += 1
-                    else:
-                        # Crear nuevo registro en stock_tracking
-                        db.add(StockTracking(
-                            symbol=symbol,
-                            current_price=metrics["current_price"],
-                            rsi_value=metrics["rsi_value"],
-                            variation=metrics["variation"],
-                            rvol_1=metrics["rvol_1"],
-                            rvol_2=metrics["rvol_2"],
-                            hma_a=metrics["hma_a"],
-                            hma_b=metrics["hma_b"],
-                            rsi_limit=LIMITE_RSI_1D, # Usamos el límite global
-                            estado=metrics["estado"]
-                        ))
-                        added_count += 1
+                    # REGLA: Solo guardamos/actualizamos si HMA_A >= HMA_B
+                    alcista = bool(metrics) and metrics["hma_a"] >= metrics["hma_b"]
+                    if alcista:
+                        filas.append(fila_tracking(metrics))
+                    progreso.avanzar(hits=int(alcista))
                 
-            except Exception as e:
-                print(f"Error recalculando HMA para {symbol}: {e}")
-                continue
+                except Exception as e:
+                    print(f"Error recalculando HMA para {symbol}: {e}")
+                    progreso.avanzar(errores=1)
+                    continue
         
-        db.commit()
-        return {"message": f"Proceso HMA completado. {added_count} nuevos en seguimiento, {updated_count} actualizados."}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error recalculando HMA: {str(e)}")
-    finally:
-        db.close()
+            if estados is not None:
+                guardar_estados(db, estados)
+            # Nuevos en stock_tracking o actualización de los existentes, en lotes
+            resultado = upsert_por_simbolo(db, StockTracking, filas, TRACKING_ACTUALIZABLES, existentes=existentes)
+            db.commit()
+            return f"Proceso HMA completado. {resultado['insertados']} nuevos en seguimiento, {resultado['actualizados']} actualizados."
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+registrar_tarea("recalculate_hma", _job_recalculate_hma)
+
+@app.post("/api/recalculate_hma", status_code=202)
+def recalculate_hma():
+    return _encolar("recalculate_hma")
 
 @app.delete("/api/favoritos/{symbol}")
-async def delete_favorite(symbol: str):
+def delete_favorite(symbol: str):
     db = SessionLocal()
     try:
         fav = db.query(Favorite).filter(Favorite.symbol == symbol).first()
@@ -506,7 +512,7 @@ async def delete_favorite(symbol: str):
         db.close()
 
 @app.delete("/api/track/{symbol}")
-async def delete_track(symbol: str):
+def delete_track(symbol: str):
     db = SessionLocal()
     try:
         fav = db.query(StockTracking).filter(StockTracking.symbol == symbol).first()
@@ -519,7 +525,7 @@ async def delete_track(symbol: str):
         db.close()
 
 @app.delete("/api/rsi_1d/{symbol}")
-async def delete_rsi_1d(symbol: str):
+def delete_rsi_1d(symbol: str):
     db = SessionLocal()
     try:
         entry = db.query(RSI_1D).filter(RSI_1D.symbol == symbol.upper()).first()
@@ -532,7 +538,7 @@ async def delete_rsi_1d(symbol: str):
         db.close()
 
 @app.post("/api/rsi_1d/update_date")
-async def update_rsi_1d_date(data: dict):
+def update_rsi_1d_date(data: dict):
     # data: { "symbol": "AAPL", "new_date": "2023-10-27" }
     db = SessionLocal()
     try:
@@ -549,7 +555,7 @@ async def update_rsi_1d_date(data: dict):
         # Obtener data 1D para recálculo
         df_1d = obtener_velas_polygon(symbol, "1D")
         if not df_1d.empty:
-            df_1d_proc = procesar_indicadores(df_1d)
+            df_1d_proc = procesar_indicadores(df_1d, columnas=COLUMNAS_RSI_1D, copiar=False)
             recalculate_rsi_1d_stats(entry, df_1d_proc)
         
         db.commit()
@@ -563,25 +569,11 @@ def recalculate_rsi_1d_stats(entry, df_1d_proc):
     """
     Recalcula min_price y candles_since_min basado en entry_date.
     """
-    # Aseguramos que trabajamos con DatetimeIndex para poder usar .index.date
-    df = df_1d_proc.copy()
-    if "datetime" in df.columns:
-        df = df.set_index("datetime")
-    
-    entry_date = entry.entry_date
-    df_hist = df[df.index.date >= entry_date.date()]
+    min_val, candles_count = estadisticas_desde_entrada(df_1d_proc, entry.entry_date)
     
-    if not df_hist.empty:
-        min_row = df_hist.loc[df_hist['close'].idxmin()]
-        min_val = float(min_row['close'])
-        min_date = min_row.name
-        
-        # Contar velas desde el mínimo hasta el final
-        candles_count = len(df_hist.loc[min_date:]) - 1
-        if candles_count < 0: candles_count = 0
-        
+    if min_val is not None:
         entry.min_price = min_val
-        entry.candles_since_min = int(candles_count)
+        entry.candles_since_min = candles_count
         
         # También recalculamos el promedio_variacion_3m y valor_actual
         entry.promedio_variacion_3m = float(round(promedio_variacion_3m(df_1d_proc), 2))
@@ -595,4 +587,5 @@ async def get_config():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Los streams de /api/cambios no terminan solos: al apagar se cortan tras unos segundos
+    uvicorn.run(app, host="0.0.0.0", port=port, timeout_graceful_shutdown=5)
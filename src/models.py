@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, create_engine
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index, create_engine, select, insert, update, event, text, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import datetime
-from src.config import DATABASE_URL
+import itertools
+import json
+from src.config import DATABASE_URL, LIMITE_RSI_1D, CAMBIOS_CANAL, TOMBSTONES_DIAS
 
 Base = declarative_base()
 
@@ -24,7 +27,7 @@ class RSI_4H(Base):
 class RSI_1D(Base):
     __tablename__ = "rsi_1d"
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String, unique=True, index=True)
+    symbol = Column(String, unique=True, index=True, nullable=False)
     rsi_value = Column(Float)
     variation = Column(Float)
     rvol_1 = Column(Float)
@@ -34,12 +37,15 @@ class RSI_1D(Base):
     min_price = Column(Float)
     candles_since_min = Column(Integer)
     entry_date = Column(DateTime, default=datetime.datetime.utcnow)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    updated_version = Column(Integer, default=0, index=True)  # versión de rsi_1d del último cambio
+    # /api/data: ORDER BY timestamp DESC, id DESC LIMIT 100 (y sus páginas) sin ordenar la tabla
+    __table_args__ = (Index("ix_rsi_1d_timestamp_desc", timestamp.desc(), id.desc()),)
 
 class StockTracking(Base):
     __tablename__ = "stock_tracking"
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String, unique=True, index=True)
+    symbol = Column(String, unique=True, index=True, nullable=False)
     current_price = Column(Float, nullable=True)
     rsi_value = Column(Float, nullable=True)
     variation = Column(Float, nullable=True)
@@ -51,17 +57,75 @@ class StockTracking(Base):
     estado = Column(String, nullable=True)
     alert_alcista = Column(Integer, default=1) 
     alert_bajista = Column(Integer, default=1)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    updated_version = Column(Integer, default=0, index=True)
+    __table_args__ = (
+        # Filtros de /api/track_data por estado y flags de alerta, con id (orden del listado) al
+        # final. Solo claves de orden/filtro: las columnas que cada corrida de tracking pisa
+        # (precio, RSI, HMA...) no van en el índice, así esos UPDATE no lo tocan (HOT en Postgres)
+        Index("ix_stock_tracking_dashboard", estado, alert_alcista, alert_bajista, id),
+    )
 
 class Favorite(Base):
     __tablename__ = "favorites"
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String, unique=True, index=True)
+    symbol = Column(String, unique=True, index=True, nullable=False)
     current_value = Column(Float, default=0.0)
     alert_value = Column(Float, default=-1.0)
     alert_direction = Column(String, default="debajo") # "encima" o "debajo"
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    updated_version = Column(Integer, default=0, index=True)
+
+class IndicadorEstado(Base):
+    __tablename__ = "indicator_state"
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, unique=True, index=True)
+    estado = Column(Text)  # JSON de IndicadoresIncrementales (velas 1D confirmadas)
+    ultima_vela = Column(DateTime, nullable=True)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
+class ScanJob(Base):
+    __tablename__ = "scan_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String, index=True)  # scan_rsi, recalculate_hma
+    estado = Column(String, default="pendiente")  # pendiente, corriendo, completado, error
+    total = Column(Integer, default=0)
+    procesados = Column(Integer, default=0)
+    hits = Column(Integer, default=0)
+    errores = Column(Integer, default=0)
+    mensaje = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    creado = Column(DateTime, default=datetime.datetime.utcnow)
+    iniciado = Column(DateTime, nullable=True)
+    terminado = Column(DateTime, nullable=True)
+    actualizado = Column(DateTime, default=datetime.datetime.utcnow)
+    __table_args__ = (
+        # Un solo job activo por tipo: un INSERT repetido choca con el índice (ver encolar_job),
+        # también entre procesos o réplicas de la API
+        Index(
+            "ix_scan_jobs_activo", tipo, unique=True,
+            sqlite_where=text("estado IN ('pendiente', 'corriendo')"),
+            postgresql_where=text("estado IN ('pendiente', 'corriendo')"),
+        ),
+    )
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    tabla = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)  # sube en cada commit que cambia la tabla
+    minima_delta = Column(Integer, default=0)  # ?since= menor a esto ya no tiene tombstones: recarga completa
+    actualizado = Column(DateTime, default=datetime.datetime.utcnow)
+
+class FilaBorrada(Base):
+    # Tombstones para el delta-sync (?since=): symbol NULL = cambio masivo, recargar la tabla
+    __tablename__ = "deleted_rows"
+    __table_args__ = (Index("ix_deleted_rows_tabla_version", "tabla", "version"),)
+    id = Column(Integer, primary_key=True, index=True)
+    tabla = Column(String, nullable=False)
+    symbol = Column(String, nullable=True)
+    version = Column(Integer, nullable=False)
+    borrado = Column(DateTime, default=datetime.datetime.utcnow)
+
 # Configuración del motor según el tipo de base de datos
 if "sqlite" in DATABASE_URL:
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
@@ -71,3 +135,272 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+
+
+# --- Registro de cambios (feed en vivo de los dashboards, ver src/cambios.py) ---
+# Cada sesión anota qué símbolos cambiaron en las tablas que muestran las páginas. En el
+# commit se sube la versión de cada tabla tocada (table_versions, para los ETag), se sella en
+# las filas cambiadas (updated_version) y los borrados dejan un tombstone (delta-sync); y se avisa: en Postgres con NOTIFY dentro de la misma transacción (llega también
+# desde los cronjobs y scripts, y se descarta si hay rollback); en SQLite con un callback
+# en el mismo proceso.
+
+TABLAS_OBSERVADAS = ("rsi_1d", "stock_tracking", "favorites")
+MODELOS_OBSERVADOS = {"rsi_1d": RSI_1D, "stock_tracking": StockTracking, "favorites": Favorite}
+NOTIFY_MAX_BYTES = 7000  # Postgres limita el payload de NOTIFY a 8000 bytes
+
+_oyentes_commit = []
+
+def registrar_cambios(db, tabla, symbols=None):
+    """
+    Anota símbolos cambiados de `tabla` en la sesión. symbols=None marca la tabla entera
+    (UPDATE/DELETE masivos), y los clientes la recargan completa.
+    """
+    if tabla not in TABLAS_OBSERVADAS:
+        return
+    cambios = db.info.setdefault("cambios", {})
+    if symbols is None or (tabla in cambios and cambios[tabla] is None):
+        cambios[tabla] = None
+    else:
+        cambios.setdefault(tabla, set()).update(symbols)
+
+def al_confirmar_cambios(funcion):
+    """Registra funcion({tabla: symbols | None}) para los commits de este proceso (sin Postgres)."""
+    _oyentes_commit.append(funcion)
+
+def payloads_cambios(cambios):
+    """Parte los cambios en payloads JSON que entran en un NOTIFY."""
+    for tabla, symbols in cambios.items():
+        if symbols is None:
+            yield json.dumps({"tabla": tabla, "todo": True})
+            continue
+        lote, largo = [], 0
+        for symbol in sorted(symbols):
+            if lote and largo + len(symbol) + 4 > NOTIFY_MAX_BYTES:
+                yield json.dumps({"tabla": tabla, "symbols": lote})
+                lote, largo = [], 0
+            lote.append(symbol)
+            largo += len(symbol) + 4
+        if lote:
+            yield json.dumps({"tabla": tabla, "symbols": lote})
+
+def leer_payload_cambios(payload):
+    datos = json.loads(payload)
+    return {datos["tabla"]: None if datos.get("todo") else set(datos["symbols"])}
+
+@event.listens_for(SessionLocal, "after_flush")
+def _anotar_flush(session, flush_context):
+    # new/dirty/deleted todavía tienen el estado previo al flush
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        tabla = getattr(obj, "__tablename__", None)
+        if tabla in TABLAS_OBSERVADAS and (obj not in session.dirty or session.is_modified(obj)):
+            registrar_cambios(session, tabla, [obj.symbol])
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _anotar_masivos(orm_execute_state):
+    # db.query(Modelo).delete()/update(): no se sabe qué filas tocó
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper is not None:
+        registrar_cambios(orm_execute_state.session, orm_execute_state.bind_mapper.local_table.name)
+
+@event.listens_for(SessionLocal, "before_commit")
+def _notificar_cambios(session):
+    session.flush()  # el flush propio del commit corre después de este evento
+    cambios = session.info.pop("cambios", None)
+    if not cambios:
+        return
+    sellar_cambios(session, cambios)
+    if session.get_bind().dialect.name == "postgresql":
+        for payload in payloads_cambios(cambios):
+            session.execute(text("SELECT pg_notify(:canal, :payload)"), {"canal": CAMBIOS_CANAL, "payload": payload})
+    else:
+        session.info["cambios_confirmados"] = cambios
+
+def incrementar_versiones(db, tablas):
+    """Suma 1 a la versión de cada tabla, en la transacción de la sesión. Retorna {tabla: version}."""
+    ahora = datetime.datetime.utcnow()
+    stmt = _insert_dialecto(db)(TableVersion).values(
+        [{"tabla": tabla, "version": 1, "actualizado": ahora} for tabla in sorted(tablas)]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TableVersion.tabla],
+        set_={"version": TableVersion.version + 1, "actualizado": stmt.excluded.actualizado},
+    ).returning(TableVersion.tabla, TableVersion.version)
+    # Por la conexión (Core): no debe volver a pasar por los eventos de la sesión
+    return dict(db.connection().execute(stmt).all())
+
+def sellar_cambios(db, cambios, chunk_size=500):
+    """
+    Versión nueva por tabla tocada, marcada en updated_version de las filas cambiadas; los
+    símbolos que ya no están dejan un tombstone. En Postgres la fila de table_versions queda
+    bloqueada hasta el commit, así que las versiones se confirman en orden.
+    """
+    conexion = db.connection()
+    versiones = incrementar_versiones(db, cambios.keys())
+    ahora = datetime.datetime.utcnow()
+    for tabla, symbols in cambios.items():
+        modelo = MODELOS_OBSERVADOS[tabla]
+        version = versiones[tabla]
+        if symbols is None:
+            conexion.execute(update(modelo).values(updated_version=version))
+            conexion.execute(insert(FilaBorrada).values(tabla=tabla, symbol=None, version=version, borrado=ahora))
+            continue
+        symbols = sorted(symbols)
+        presentes = set()
+        for i in range(0, len(symbols), chunk_size):
+            lote = symbols[i:i + chunk_size]
+            conexion.execute(update(modelo).where(modelo.symbol.in_(lote)).values(updated_version=version))
+            presentes.update(conexion.execute(select(modelo.symbol).where(modelo.symbol.in_(lote))).scalars())
+        borrados = [symbol for symbol in symbols if symbol not in presentes]
+        if borrados:
+            conexion.execute(insert(FilaBorrada), [
+                {"tabla": tabla, "symbol": symbol, "version": version, "borrado": ahora} for symbol in borrados
+            ])
+
+def purgar_tombstones(db, dias=None):
+    """
+    Borra los tombstones de más de `dias` (TOMBSTONES_DIAS) y sube minima_delta: un cliente
+    con un ?since= anterior recibe reset. No hace commit.
+    """
+    limite = datetime.datetime.utcnow() - datetime.timedelta(days=TOMBSTONES_DIAS if dias is None else dias)
+    conexion = db.connection()
+    purgados = 0
+    for tabla in TABLAS_OBSERVADAS:
+        hasta = conexion.execute(
+            select(FilaBorrada.version).where(FilaBorrada.tabla == tabla, FilaBorrada.borrado < limite)
+            .order_by(FilaBorrada.version.desc()).limit(1)
+        ).scalar()
+        if hasta is None:
+            continue
+        purgados += conexion.execute(
+            FilaBorrada.__table__.delete().where(FilaBorrada.tabla == tabla, FilaBorrada.version <= hasta)
+        ).rowcount
+        conexion.execute(update(TableVersion).where(TableVersion.tabla == tabla).values(minima_delta=hasta))
+    return purgados
+
+def version_tabla(db, tabla):
+    fila = db.get(TableVersion, tabla)
+    return fila.version if fila else 0
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publicar_cambios(session):
+    cambios = session.info.pop("cambios_confirmados", None)
+    if cambios:
+        for funcion in _oyentes_commit:
+            funcion(cambios)
+
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _descartar_cambios(session, transaction):
+    # Rollback (o cierre sin commit): lo anotado no llegó a la base
+    if transaction.parent is None:
+        session.info.pop("cambios", None)
+        session.info.pop("cambios_confirmados", None)
+
+
+# --- Escrituras por lote (repositorio) ---
+# Los scans precargan las filas existentes en una consulta y escriben con
+# INSERT ... ON CONFLICT (symbol) DO UPDATE por lotes, en vez de un SELECT + ORM por símbolo.
+
+# Columnas que un scan sobrescribe en filas existentes (entry_date y los flags de alerta se conservan)
+RSI_1D_ACTUALIZABLES = [
+    "rsi_value", "variation", "rvol_1", "rvol_2", "promedio_variacion_3m",
+    "valor_actual", "min_price", "candles_since_min", "timestamp",
+]
+TRACKING_ACTUALIZABLES = [
+    "current_price", "rsi_value", "variation", "rvol_1", "rvol_2",
+    "hma_a", "hma_b", "estado", "timestamp",
+]
+
+def precargar_por_simbolo(db, modelo, *columnas):
+    """
+    Lee en una sola consulta las filas existentes del modelo. Retorna {symbol: fila}
+    con `symbol` y las columnas pedidas como atributos.
+    """
+    cols = [modelo.symbol] + [getattr(modelo, c) for c in columnas]
+    return {fila.symbol: fila for fila in db.execute(select(*cols))}
+
+def _insert_dialecto(db):
+    # insert() con ON CONFLICT del dialecto de la sesión
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        return postgresql.insert
+    if dialecto == "sqlite":
+        return sqlite.insert
+    raise ValueError(f"Upsert no soportado para el dialecto {dialecto}")
+
+def upsert_por_simbolo(db, modelo, filas, columnas_update, existentes=None, chunk_size=500):
+    """
+    INSERT ... ON CONFLICT (symbol) DO UPDATE por lotes (Postgres o SQLite).
+    Todas las filas deben tener las mismas claves. `existentes` (symbols ya en la tabla)
+    solo se usa para informar cuántas filas fueron nuevas y cuántas actualizadas.
+    Retorna {"insertados": n, "actualizados": m}. No hace commit.
+    """
+    # Un símbolo repetido en el mismo INSERT rompe el ON CONFLICT en Postgres: gana la última fila
+    filas = list({fila["symbol"]: fila for fila in filas}.values())
+    if not filas:
+        return {"insertados": 0, "actualizados": 0}
+    if existentes is None:
+        existentes = precargar_por_simbolo(db, modelo)
+
+    insert_dialecto = _insert_dialecto(db)
+    for i in range(0, len(filas), chunk_size):
+        stmt = insert_dialecto(modelo).values(filas[i:i + chunk_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[modelo.symbol],
+            set_={col: stmt.excluded[col] for col in columnas_update},
+        )
+        db.execute(stmt)
+    registrar_cambios(db, modelo.__tablename__, [fila["symbol"] for fila in filas])
+
+    actualizados = sum(1 for fila in filas if fila["symbol"] in existentes)
+    return {"insertados": len(filas) - actualizados, "actualizados": actualizados}
+
+def actualizar_por_simbolo(db, modelo, filas, chunk_size=500):
+    """
+    UPDATE ... WHERE symbol = ? por lotes (executemany), sin insertar los que no existen
+    (p.ej. un favorito borrado mientras se evaluaba). Todas las filas deben tener las
+    mismas claves. Retorna la cantidad de filas enviadas. No hace commit.
+    """
+    filas = list({fila["symbol"]: fila for fila in filas}.values())
+    if not filas:
+        return 0
+    tabla = modelo.__table__
+    # Las claves de cada fila (salvo symbol) forman el SET; por la conexión de la sesión
+    # para no pasar por _anotar_masivos, que marcaría la tabla entera
+    stmt = update(tabla).where(tabla.c.symbol == bindparam("b_symbol"))
+    columnas = [col for col in filas[0] if col != "symbol"]
+    conexion = db.connection()
+    for i in range(0, len(filas), chunk_size):
+        conexion.execute(stmt, [
+            {"b_symbol": fila["symbol"], **{col: fila[col] for col in columnas}} for fila in filas[i:i + chunk_size]
+        ])
+    registrar_cambios(db, modelo.__tablename__, [fila["symbol"] for fila in filas])
+    return len(filas)
+
+def insertar_simbolos(db, modelo, symbols, chunk_size=1000):
+    """
+    Inserta en lotes símbolos que ya se sabe que no existen (p.ej. StockList). No hace commit.
+    """
+    symbols = list(symbols)
+    for i in range(0, len(symbols), chunk_size):
+        db.execute(insert(modelo), [{"symbol": symbol} for symbol in symbols[i:i + chunk_size]])
+    return len(symbols)
+
+def fila_tracking(metrics):
+    """
+    Fila de StockTracking a partir de las métricas de regla_cruce_hma.
+    rsi_limit y los flags de alerta solo aplican si la fila es nueva.
+    """
+    return {
+        "symbol": metrics["symbol"],
+        "current_price": metrics["current_price"],
+        "rsi_value": metrics["rsi_value"],
+        "variation": metrics["variation"],
+        "rvol_1": metrics["rvol_1"],
+        "rvol_2": metrics["rvol_2"],
+        "hma_a": metrics["hma_a"],
+        "hma_b": metrics["hma_b"],
+        "estado": metrics["estado"],
+        "timestamp": datetime.datetime.utcnow(),
+        "rsi_limit": LIMITE_RSI_1D,
+        "alert_alcista": 1,
+        "alert_bajista": 1,
+    }
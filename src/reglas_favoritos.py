@@ -1,49 +1,44 @@
 import requests
 import datetime
-from src.models import SessionLocal, Favorite
-from src.core.polygon_client import obtener_velas_polygon
+from sqlalchemy import select
+from src.models import SessionLocal, Favorite, actualizar_por_simbolo
+from src.core.polygon_client import obtener_ultimos_precios
+from src.core.regla_favoritos import evaluar_favoritos, mensaje_alerta
 from src import config
 
 def evaluate_rules():
     """
     Consulta la tabla favorites y valida las condiciones (Precio y Dirección).
+    Un snapshot para todos los precios, una comparación vectorizada y un UPDATE por lotes.
     """
     db = SessionLocal()
     alertas_mensajes = []
     try:
-        favorites_list = db.query(Favorite).all()
-        print(f"Analizando {len(favorites_list)} stocks en favoritos...")
-        
-        for fav in favorites_list:
-            try:
-                # Obtener velas diarias para calcular precio actual
-                df = obtener_velas_polygon(fav.symbol, "1D")
-                if df.empty:
-                    continue
-                
-                # Precio actual
-                current_price = float(df["close"].iloc[-1])
-                fav.current_value = current_price
-                fav.timestamp = datetime.datetime.utcnow()
-                
-                # Reglas de Alerta
-                triggered = False
-                if fav.alert_direction == "encima" and current_price >= fav.alert_value:
-                    triggered = True
-                elif fav.alert_direction == "debajo" and current_price < fav.alert_value:
-                    triggered = True
-                
-                if triggered:
-                    msg = f"🔔 ALERT: {fav.symbol} está a {current_price} ({fav.alert_direction} de {fav.alert_value})"
-                    alertas_mensajes.append(msg)
-                    print(f"  [!] {msg}")
-                else:
-                    print(f"  [-] {fav.symbol}: {current_price} no cumple {fav.alert_direction} {fav.alert_value}")
+        favoritos = db.execute(select(Favorite.symbol, Favorite.alert_value, Favorite.alert_direction)).all()
+        print(f"Analizando {len(favoritos)} stocks en favoritos...")
+        # Precio actual de todos los favoritos con el snapshot multi-ticker
+        precios = obtener_ultimos_precios([fav.symbol for fav in favoritos])
+        for fav in favoritos:
+            if fav.symbol not in precios:
+                print(f"❌ Error evaluando {fav.symbol}: sin precio en el snapshot")
+        evaluados = evaluar_favoritos(favoritos, precios)
 
-            except Exception as e:
-                print(f"❌ Error evaluando {fav.symbol}: {e}")
-        
-        db.commit() # Guardar precios actualizados y timestamps
+        ahora = datetime.datetime.utcnow()
+        filas = evaluados[["symbol", "precio", "alert_direction", "alert_value", "disparada"]].itertuples(index=False, name=None)
+        for symbol, current_price, direccion, alert_value, triggered in filas:
+            if triggered:
+                msg = mensaje_alerta(symbol, current_price, direccion, alert_value)
+                alertas_mensajes.append(msg)
+                print(f"  [!] {msg}")
+            else:
+                print(f"  [-] {symbol}: {current_price} no cumple {direccion} {alert_value}")
+
+        # Guardar precios actualizados y timestamps
+        actualizar_por_simbolo(db, Favorite, [
+            {"symbol": symbol, "current_value": precio, "timestamp": ahora}
+            for symbol, precio in zip(evaluados["symbol"].tolist(), evaluados["precio"].tolist())
+        ])
+        db.commit()
     finally:
         db.close()
     return alertas_mensajes
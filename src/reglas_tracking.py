@@ -1,9 +1,13 @@
 import requests
 import datetime
-from src.models import SessionLocal, StockTracking
+from src.models import SessionLocal, StockTracking, precargar_por_simbolo, actualizar_por_simbolo, fila_tracking, TRACKING_ACTUALIZABLES
 from src.core.regla_cruce_hma import regla_cruce_hma
+from src.core.indicadores_incrementales import cargar_estados, guardar_estados
+from src.core.cache_velas import cache_de_ejecucion
+from src.core.polygon_client import obtener_ultimos_precios
 from src import config
 
+@cache_de_ejecucion("tracking HMA")
 def evaluate_tracking_rules():
     """
     Consulta la tabla stock_tracking, actualiza métricas HMA y valida cambios de estado.
@@ -11,31 +15,32 @@ def evaluate_tracking_rules():
     db = SessionLocal()
     alertas_mensajes = []
     try:
-        tracked_list = db.query(StockTracking).all()
+        tracked_list = list(precargar_por_simbolo(db, StockTracking, "estado").values())
         print(f"Analizando {len(tracked_list)} stocks en seguimiento (HMA)...")
+        estados = cargar_estados(db) if config.INDICADORES_INCREMENTALES else None
+        filas = []
+        # Precio actual de todos los seguidos con el snapshot multi-ticker
+        precios = obtener_ultimos_precios([stock.symbol for stock in tracked_list])
         
         for stock in tracked_list:
             try:
                 old_estado = stock.estado
-                metrics = regla_cruce_hma(stock.symbol)
+                if stock.symbol not in precios:
+                    print(f"❌ Error evaluando HMA para {stock.symbol}: sin precio en el snapshot")
+                    continue
+                metrics = regla_cruce_hma(stock.symbol, precios[stock.symbol], estados=estados)
                 
                 if metrics:
-                    # Actualizar campos
-                    stock.current_price = metrics["current_price"]
-                    stock.rsi_value = metrics["rsi_value"]
-                    stock.variation = metrics["variation"]
-                    stock.rvol_1 = metrics["rvol_1"]
-                    stock.rvol_2 = metrics["rvol_2"]
-                    stock.hma_a = metrics["hma_a"]
-                    stock.hma_b = metrics["hma_b"]
-                    stock.estado = metrics["estado"]
-                    stock.timestamp = datetime.datetime.utcnow()
+                    # Actualizar campos (UPDATE por lotes al final; un seguido borrado
+                    # mientras tanto no se vuelve a crear)
+                    fila = fila_tracking(metrics)
+                    filas.append({col: fila[col] for col in ["symbol"] + TRACKING_ACTUALIZABLES})
                     
                     new_estado = metrics["estado"]
                     
                     # Alertar si el estado es Cruce Alcista
                     if new_estado == "cruce_alcista":
-                        msg = f"{stock.symbol} ({stock.current_price})"
+                        msg = f"{stock.symbol} ({metrics['current_price']})"
                         alertas_mensajes.append(msg)
                         print(f"  [!] {msg}")
                     else:
@@ -44,6 +49,9 @@ def evaluate_tracking_rules():
             except Exception as e:
                 print(f"❌ Error evaluando HMA para {stock.symbol}: {e}")
         
+        if estados is not None:
+            guardar_estados(db, estados)
+        actualizar_por_simbolo(db, StockTracking, filas)
         db.commit()
     finally:
         db.close()
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import datetime
+import pandas as pd
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src.config import HMA_A, HMA_B, LIMITE_RSI_1D
+from src.models import SessionLocal, StockList
+from src.core.backtest import panel_bar_store, backtest_cruce_hma, backtest_rsi, resumen, barrer
+from src.core.polygon_client import sincronizar_grouped_daily
+
+# Backtest de las reglas de cruce HMA y entrada RSI_1D sobre las velas 1D guardadas en
+# bar_store (las llena el pipeline de scans). Sin BACKTEST_HMA_A/HMA_B/LIMITES corre solo
+# los parámetros configurados; con listas separadas por coma barre todas las combinaciones.
+# El pipeline guarda solo ~300 días: con BACKTEST_BACKFILL=true antes se completa bar_store
+# con grouped daily desde BACKTEST_DESDE (un request por día hábil que falte).
+#
+# Uso: BACKTEST_HMA_A=5,10,15 BACKTEST_HMA_B=20,30,50 BACKTEST_LIMITES=20,25,30 python src/script/backtest.py
+
+SYMBOLS = os.getenv("BACKTEST_SYMBOLS")  # por defecto, los de StockList
+# Por defecto, los últimos 5 años
+DESDE = os.getenv("BACKTEST_DESDE") or (datetime.date.today() - datetime.timedelta(days=5 * 365)).isoformat()
+RSI_SALIDA = float(os.getenv("BACKTEST_RSI_SALIDA", 50))
+SALIDA = os.getenv("BACKTEST_SALIDA")  # CSV opcional con las operaciones o la grilla
+BACKFILL = os.getenv("BACKTEST_BACKFILL", "FALSE").upper() == "TRUE"
+
+def _lista(nombre, tipo, defecto):
+    valor = os.getenv(nombre)
+    if not valor:
+        return [defecto]
+    return [tipo(v) for v in valor.split(",") if v.strip()]
+
+def _universo():
+    if SYMBOLS:
+        return sorted({s.strip().upper() for s in SYMBOLS.split(",") if s.strip()})
+    db = SessionLocal()
+    try:
+        return sorted({stock.symbol.strip().upper() for stock in db.query(StockList.symbol)})
+    finally:
+        db.close()
+
+def _imprimir(nombre, ops):
+    por_simbolo, total = resumen(ops)
+    if not total["operaciones"]:
+        print(f"{nombre}: sin operaciones")
+        return
+    print(f"{nombre}: {total['operaciones']} operaciones en {total['simbolos']} símbolos ({total['abiertas']} abiertas)")
+    print(f"  ganadoras {total['ganadoras']:.1f}% | retorno medio {total['retorno_medio']:.2f}% "
+          f"(mediana {total['retorno_mediano']:.2f}%) | profit factor {total['profit_factor']:.2f}")
+    print(f"  velas medias {total['velas_medias']:.1f} | drawdown medio {total['drawdown_medio']:.2f}%")
+    print("  Mejores símbolos por retorno compuesto:")
+    print(por_simbolo.nlargest(5, "retorno_total")[["operaciones", "ganadoras", "retorno_total"]].round(2).to_string())
+
+def run_backtest():
+    symbols = _universo()
+    if BACKFILL:
+        inicio = time.perf_counter()
+        requests_hechos = sincronizar_grouped_daily(fecha_inicio=DESDE)
+        print(f"📥 Backfill de grouped daily desde {DESDE}: {requests_hechos} requests en {time.perf_counter() - inicio:.1f}s")
+    inicio = time.perf_counter()
+    panel = panel_bar_store(symbols, DESDE)
+    print(f"[{datetime.datetime.now()}] Backtest desde {DESDE}: {len(panel.symbols)}/{len(symbols)} símbolos con velas "
+          f"({panel.close.shape[1]} velas máx.) en {time.perf_counter() - inicio:.1f}s")
+    if not len(panel.symbols):
+        print("⚠️ Sin velas en bar_store; correr el pipeline de scans primero (o BACKTEST_BACKFILL=true)")
+        return None
+    primera = pd.Timestamp(panel.t[panel.activo].min(), tz="UTC").date()
+    # Margen de una semana por fines de semana y feriados al inicio
+    if primera > datetime.date.fromisoformat(DESDE) + datetime.timedelta(days=7):
+        print(f"⚠️ bar_store empieza el {primera}, después de BACKTEST_DESDE={DESDE}: el backtest cubre menos historia. "
+              f"Correr con BACKTEST_BACKFILL=true para completarla con grouped daily")
+
+    hma_a = _lista("BACKTEST_HMA_A", int, HMA_A)
+    hma_b = _lista("BACKTEST_HMA_B", int, HMA_B)
+    limites = _lista("BACKTEST_LIMITES", float, LIMITE_RSI_1D)
+    inicio = time.perf_counter()
+    if len(hma_a) * len(hma_b) * len(limites) == 1:
+        resultado = pd.concat([backtest_cruce_hma(panel, hma_a[0], hma_b[0]),
+                               backtest_rsi(panel, limites[0], RSI_SALIDA)], ignore_index=True)
+        _imprimir(f"Cruce HMA {hma_a[0]}/{hma_b[0]}", resultado[resultado["regla"] == "cruce_hma"])
+        _imprimir(f"RSI <= {limites[0]} (salida RSI >= {RSI_SALIDA})", resultado[resultado["regla"] == "rsi"])
+    else:
+        resultado = barrer(panel, hma_a, hma_b, limites, RSI_SALIDA)
+        columnas = ["regla", "hma_a", "hma_b", "limite", "operaciones", "ganadoras", "retorno_medio", "profit_factor", "drawdown_medio"]
+        print(resultado.reindex(columns=columnas).round(2).to_string(index=False))
+    print(f"⏱️ Backtest en {time.perf_counter() - inicio:.1f}s")
+
+    if SALIDA:
+        resultado.to_csv(SALIDA, index=False)
+        print(f"✅ Resultado guardado en {SALIDA}")
+    return resultado
+
+if __name__ == "__main__":
+    run_backtest()
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import asyncio
+import datetime
+import itertools
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+# Servidor WebSocket local que imita el de Polygon (wss://socket.polygon.io/stocks) para
+# probar src/alert_stream.py sin conexión: responde connected/auth/subscribe igual que Polygon
+# y reproduce agregados AM grabados (JSONL, uno por línea) de los símbolos suscritos.
+#
+# Grabaciones:
+# - STREAM_GRABAR=archivo.jsonl en alert_stream guarda lo recibido del stream real.
+# - STREAM_FALSO_GRABAR=AAPL,MSFT (y STREAM_FALSO_FECHA=YYYY-MM-DD, por defecto ayer) arma una
+#   grabación con las velas de 1 minuto de la API REST y termina.
+#
+# Uso: STREAM_URL=ws://localhost:8765 python -m src.alert_stream
+
+ARCHIVO = os.getenv("STREAM_FALSO_ARCHIVO", os.path.join("databases", "stream_grabado.jsonl"))
+PUERTO = int(os.getenv("STREAM_FALSO_PUERTO", 8765))
+# Segundos reales por cada minuto grabado (0 = lo más rápido posible)
+INTERVALO = float(os.getenv("STREAM_FALSO_INTERVALO", 1))
+# Si se define, solo acepta esta API key (para probar el auth_failed)
+API_KEY_FALSA = os.getenv("STREAM_FALSO_API_KEY")
+
+def _estado(status, message):
+    return json.dumps([{"ev": "status", "status": status, "message": message}])
+
+def cargar_grabacion(archivo):
+    """Eventos AM del JSONL ordenados por inicio del minuto."""
+    with open(archivo, encoding="utf-8") as f:
+        eventos = [json.loads(linea) for linea in f if linea.strip()]
+    return sorted((e for e in eventos if e.get("ev") == "AM"), key=lambda e: (e["s"], e["sym"]))
+
+def grabar_desde_rest(symbols, fecha, archivo):
+    """Arma una grabación con las velas de 1 minuto (REST) de `fecha` para los símbolos."""
+    from src.core.polygon_client import _descargar_velas
+
+    eventos = []
+    for symbol in symbols:
+        df = _descargar_velas(symbol, "1min", fecha, fecha, permitir_vacio=True)
+        acumulado = df["volume"].cumsum()
+        for fila, av in zip(df.itertuples(index=False), acumulado):
+            inicio = int(fila.datetime.value // 1_000_000)
+            eventos.append({
+                "ev": "AM", "sym": symbol, "o": fila.open, "h": fila.high, "l": fila.low, "c": fila.close,
+                "v": fila.volume, "av": float(av), "s": inicio, "e": inicio + 60_000,
+            })
+        print(f"  {symbol}: {len(df)} velas")
+    eventos.sort(key=lambda e: (e["s"], e["sym"]))
+    with open(archivo, "w", encoding="utf-8") as f:
+        for evento in eventos:
+            f.write(json.dumps(evento) + "\n")
+    return len(eventos)
+
+class ServidorFalso:
+    """
+    Cada conexión recibe la grabación desde el principio a partir de su primera suscripción
+    (INTERVALO segundos por minuto grabado), filtrada por sus canales AM.<symbol> o AM.*.
+    """
+    def __init__(self, eventos, intervalo=INTERVALO, api_key=API_KEY_FALSA):
+        self.minutos = [list(grupo) for _, grupo in itertools.groupby(eventos, key=lambda e: e["s"])]
+        self.intervalo = intervalo
+        self.api_key = api_key
+        self.enviados = 0
+
+    async def atender(self, ws):
+        await ws.send(_estado("connected", "Connected Successfully"))
+        canales = set()
+        autenticado = False
+        reproduccion = None
+        try:
+            async for mensaje in ws:
+                datos = json.loads(mensaje)
+                accion = datos.get("action")
+                if accion == "auth":
+                    autenticado = self.api_key is None or datos.get("params") == self.api_key
+                    if autenticado:
+                        await ws.send(_estado("auth_success", "authenticated"))
+                    else:
+                        await ws.send(_estado("auth_failed", "authentication failed"))
+                        return
+                elif not autenticado:
+                    await ws.send(_estado("error", "not authorized"))
+                elif accion in ("subscribe", "unsubscribe"):
+                    pedidos = [c for c in datos.get("params", "").split(",") if c]
+                    if accion == "subscribe":
+                        canales.update(pedidos)
+                    else:
+                        canales.difference_update(pedidos)
+                    verbo = "subscribed to" if accion == "subscribe" else "unsubscribed to"
+                    await ws.send(json.dumps([{"ev": "status", "status": "success", "message": f"{verbo}: {c}"} for c in pedidos]))
+                    if reproduccion is None and canales:
+                        reproduccion = asyncio.create_task(self._reproducir(ws, canales))
+        except ConnectionClosed:
+            pass
+        finally:
+            if reproduccion is not None:
+                reproduccion.cancel()
+
+    async def _reproducir(self, ws, canales):
+        for minuto in self.minutos:
+            eventos = [e for e in minuto if "AM.*" in canales or f"AM.{e['sym']}" in canales]
+            if eventos:
+                await ws.send(json.dumps(eventos))
+                self.enviados += len(eventos)
+            await asyncio.sleep(self.intervalo)
+
+async def servir(eventos, puerto=PUERTO, listo=None):
+    """Corre el servidor hasta que se cancele. `listo` (asyncio.Event) se activa al escuchar."""
+    servidor = ServidorFalso(eventos)
+    async with serve(servidor.atender, "localhost", puerto):
+        print(f"📡 Stream falso en ws://localhost:{puerto} ({len(eventos)} agregados, {len(servidor.minutos)} minutos)")
+        if listo is not None:
+            listo.set()
+        await asyncio.Future()
+
+if __name__ == "__main__":
+    symbols = os.getenv("STREAM_FALSO_GRABAR")
+    if symbols:
+        fecha = os.getenv("STREAM_FALSO_FECHA") or (datetime.date.today() - datetime.timedelta(days=1)).isoformat()
+        print(f"Grabando velas de 1 minuto del {fecha} en {ARCHIVO}...")
+        total = grabar_desde_rest([s.strip().upper() for s in symbols.split(",") if s.strip()], fecha, ARCHIVO)
+        print(f"✅ {total} agregados grabados")
+    else:
+        try:
+            asyncio.run(servir(cargar_grabacion(ARCHIVO)))
+        except KeyboardInterrupt:
+            print("Deteniendo stream falso...")
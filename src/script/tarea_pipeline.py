@@ -0,0 +1,394 @@
+import os
+import sys
+import time
+import datetime
+import requests
+
+# Añadir el directorio actual al path para importar desde src
+sys.path.append(os.getcwd())
+
+from src import config
+from src.config import LIMITE_RSI_1D
+from src.models import (
+    SessionLocal, init_db, StockList, RSI_1D, StockTracking,
+    precargar_por_simbolo, upsert_por_simbolo, actualizar_por_simbolo, fila_tracking,
+    RSI_1D_ACTUALIZABLES, TRACKING_ACTUALIZABLES,
+)
+from src.core.regla_rsi_1d import tarea_rsi_1d, filas_rsi_1d_panel
+from src.core.regla_cruce_hma import regla_cruce_hma
+from src.core.executor import mapear_velas, workers_scan
+from src.core.indicadores_incrementales import cargar_estados, guardar_estados
+from src.core.polygon_async import iterar_velas_1d, panel_1d
+from src.core.polygon_client import obtener_ultimos_precios
+from src.core.cache_velas import cache_de_ejecucion
+
+# Pipeline de scans en una sola pasada: carga StockList, RSI_1D y StockTracking una vez,
+# descarga las velas 1D de la unión de símbolos una vez y aplica las etapas (regla de
+# entrada RSI, HMA alcista, HMA bajista) sobre el mismo estado de indicadores por símbolo.
+# Al final escribe cada tabla (UPDATE de los que ya estaban, upsert de los nuevos) y manda
+# cada canal de alertas una vez.
+
+def enviar_alerta(url, titulo, tags, mensajes):
+    """
+    Envía una notificación vía POST con los mensajes detallados.
+    """
+    if not mensajes:
+        return
+
+    if not url.startswith("http"):
+        url = "https://" + url
+
+    message_body = "\n".join(mensajes)
+
+    try:
+        response = requests.post(
+            url,
+            data=message_body.encode("utf-8"),
+            headers={"Title": titulo, "Priority": "high", "Tags": tags},
+        )
+        if response.status_code == 200:
+            if config.PRINT_OUTPUT:
+                print(f"🚀 Alertas enviadas ({titulo}):\n{message_body}")
+        else:
+            print(f"⚠️ Alerta enviada pero el servidor respondió {response.status_code}: {response.text}")
+    except Exception as e:
+        print(f"❌ Error enviando alerta: {e}")
+
+class Etapa:
+    """
+    Etapa enchufable del pipeline.
+    - universo(datos): símbolos que necesita evaluar (datos = tablas precargadas).
+    - evaluar(symbol, contexto): por símbolo, posiblemente en un worker; `contexto` trae
+      las velas, el precio actual, las filas precargadas y los resultados de las etapas previas.
+    - evaluar_panel(panel, datos): modo bulk (DAILY_BULK), todo el universo de una vez sobre
+      el panel 1D; solo si `por_panel`. Retorna {symbol: resultado} como evaluar.
+    - cerrar(datos, resultados, escrituras): en el proceso padre; agrega filas a `escrituras`
+      y retorna los mensajes de alerta de su canal.
+    """
+    nombre = ""
+    usa_precio = False  # necesita el precio actual (snapshot)
+    por_panel = False   # se puede evaluar sobre el panel 1D (ver panel_1d)
+    canal = None        # (url, título, tags) de sus alertas
+
+    def universo(self, datos):
+        return set()
+
+    def evaluar(self, symbol, contexto):
+        return None
+
+    def evaluar_panel(self, panel, datos):
+        return {}
+
+    def cerrar(self, datos, resultados, escrituras):
+        return []
+
+def _metricas_hma(symbol, contexto):
+    # La regla HMA se calcula una sola vez por símbolo aunque la usen varias etapas
+    if "cruce_hma" not in contexto["calculos"]:
+        ultimo = contexto["ultimo"]
+        metrics = None
+        if ultimo is not None:
+            # Copia: la regla simula la vela de hoy sobre el df
+            metrics = regla_cruce_hma(symbol, ultimo, contexto["dfs"]["1D"].copy(), contexto["estados"])
+        contexto["calculos"]["cruce_hma"] = metrics
+    return contexto["calculos"]["cruce_hma"]
+
+def _agregar_escritura(escrituras, modelo, actualizables, existentes, filas):
+    _, _, por_symbol = escrituras.setdefault(modelo, (actualizables, existentes, {}))
+    for fila in filas:
+        por_symbol[fila["symbol"]] = fila
+
+class EtapaRSI1D(Etapa):
+    """Regla de entrada RSI_1D sobre StockList (antes tarea_scan_rsi_1D)."""
+    nombre = "rsi_1d"
+    por_panel = True
+    analizados = 0
+
+    def universo(self, datos):
+        return set(datos["lista"])
+
+    def evaluar(self, symbol, contexto):
+        if not contexto["en_lista"]:
+            return None
+        return tarea_rsi_1d(symbol, contexto["dfs"], contexto["rsi_1d"], contexto["estados"])
+
+    def evaluar_panel(self, panel, datos):
+        # Mismo resultado que evaluar: (analizado, fila) por símbolo de la lista
+        if not len(panel.symbols):
+            return {}
+        filas, _ = filas_rsi_1d_panel(panel, datos["rsi_1d"])
+        por_fila = {fila["symbol"]: fila for fila in filas}
+        return {
+            symbol: (bool(conteo >= 20), por_fila.get(symbol))
+            for symbol, conteo in zip(panel.symbols, panel.conteos)
+            if symbol in datos["lista"]
+        }
+
+    def cerrar(self, datos, resultados, escrituras):
+        filas = []
+        analizados = 0
+        for symbol, (analizado, fila) in resultados.items():
+            analizados += analizado
+            if not fila:
+                continue
+            filas.append(fila)
+            if config.PRINT_OUTPUT:
+                if symbol in datos["rsi_1d"]:
+                    print(f"Actualizado: {symbol} (RSI: {fila['rsi_value']:.2f})")
+                else:
+                    print(f"HURRA! Nuevo hit: {symbol} (RSI: {fila['rsi_value']:.2f})")
+        _agregar_escritura(escrituras, RSI_1D, RSI_1D_ACTUALIZABLES, datos["rsi_1d"], filas)
+        self.analizados = analizados
+        nuevos = sum(1 for fila in filas if fila["symbol"] not in datos["rsi_1d"])
+        print(f"RSI_1D: {analizados} stocks analizados, {nuevos} registros nuevos (Límite RSI: {LIMITE_RSI_1D})")
+        return []
+
+class EtapaHMAAlcista(Etapa):
+    """Cruce HMA alcista sobre RSI_1D, incluidos los hits nuevos de esta pasada (antes tarea_scan_hma_alcista)."""
+    nombre = "hma_alcista"
+    usa_precio = True
+
+    def __init__(self):
+        self.canal = (config.HMA_ALCISTA, "HMA Bullish Alert", "rocket,chart_with_upwards_trend")
+
+    def universo(self, datos):
+        return set(datos["rsi_1d"])
+
+    def evaluar(self, symbol, contexto):
+        previo = contexto["resultados"].get(EtapaRSI1D.nombre)
+        if contexto["rsi_1d"] is None and not (previo and previo[1]):
+            return None
+        metrics = _metricas_hma(symbol, contexto)
+        # REGLA: Solo guardamos/actualizamos si HMA_A >= HMA_B (Cruce Alcista)
+        if metrics and metrics["hma_a"] >= metrics["hma_b"]:
+            return metrics
+        return None
+
+    def cerrar(self, datos, resultados, escrituras):
+        filas = []
+        mensajes = []
+        for symbol, metrics in resultados.items():
+            if not metrics:
+                continue
+            filas.append(fila_tracking(metrics))
+            track_entry = datos["tracking"].get(symbol)
+            # Alertas para nuevos registros están habilitadas por defecto (alert_alcista=1)
+            if track_entry is None or track_entry.alert_alcista == 1:
+                mensajes.append(f"🟢 {symbol}: HMA_A: {metrics['hma_a']} >= HMA_B: {metrics['hma_b']}")
+            if config.PRINT_OUTPUT:
+                estado = "ACTUALIZADO" if track_entry else "NUEVO TRACK"
+                print(f" [{estado}] {symbol}: Cruce alcista detectado.")
+        _agregar_escritura(escrituras, StockTracking, TRACKING_ACTUALIZABLES, datos["tracking"], filas)
+        print(f"HMA alcista: {len(filas)} cruces alcistas")
+        return mensajes
+
+class EtapaHMABajista(Etapa):
+    """Actualiza StockTracking y alerta los cruces bajistas (antes tarea_scan_hma_bajista)."""
+    nombre = "hma_bajista"
+    usa_precio = True
+
+    def __init__(self):
+        self.canal = (config.HMA_BAJISTA, "HMA Bearish Alert", "warning,chart_with_downwards_trend")
+
+    def universo(self, datos):
+        return set(datos["tracking"])
+
+    def evaluar(self, symbol, contexto):
+        if contexto["tracking"] is None:
+            return None
+        return _metricas_hma(symbol, contexto)
+
+    def cerrar(self, datos, resultados, escrituras):
+        filas = []
+        mensajes = []
+        for symbol, metrics in resultados.items():
+            if not metrics:
+                continue
+            stock = datos["tracking"][symbol]
+            # Actualizamos los valores en la DB siempre (solo UPDATE: el símbolo ya está en tracking)
+            fila = fila_tracking(metrics)
+            fila["symbol"] = stock.symbol
+            filas.append(fila)
+            # REGLA: Detectar tendencia bajista (Cruce Bajista)
+            if metrics["hma_a"] < metrics["hma_b"]:
+                if config.PRINT_OUTPUT:
+                    print(f" [ALERTA BAJISTA] {symbol}: Tendencia negativa detectada.")
+                if stock.alert_bajista == 1:
+                    mensajes.append(f"🔴 {symbol}: HMA_A:{metrics['hma_a']}, HMA_B:{metrics['hma_b']}) | Var:{metrics['variation']}%")
+        _agregar_escritura(escrituras, StockTracking, TRACKING_ACTUALIZABLES, datos["tracking"], filas)
+        print(f"HMA bajista: {len(filas)} activos revisados, {len(mensajes)} alertas")
+        return mensajes
+
+ETAPAS = (EtapaRSI1D, EtapaHMAAlcista, EtapaHMABajista)
+
+def evaluar_simbolo(symbol, dfs, extra, etapas, estados=None):
+    """
+    Unidad de trabajo del pipeline para mapear_velas: aplica las etapas en orden sobre
+    las velas del símbolo. Sin `estados` persistidos se usa un estado local, así los
+    indicadores se calculan una vez y las etapas siguientes solo previsualizan la vela de hoy.
+    Retorna ({etapa: resultado}, {etapa: segundos}).
+    """
+    contexto = dict(extra, dfs=dfs, estados=estados if estados is not None else {}, resultados={}, calculos={})
+    tiempos = {}
+    for etapa in etapas:
+        inicio = time.perf_counter()
+        contexto["resultados"][etapa.nombre] = etapa.evaluar(symbol, contexto)
+        tiempos[etapa.nombre] = time.perf_counter() - inicio
+    return contexto["resultados"], tiempos
+
+def _cargar_datos(db):
+    lista = {stock.symbol.strip().upper() for stock in db.query(StockList.symbol)}
+    rsi_1d = precargar_por_simbolo(db, RSI_1D, "entry_date", "min_price", "candles_since_min")
+    tracking = precargar_por_simbolo(db, StockTracking, "alert_alcista", "alert_bajista")
+    return {
+        "lista": lista,
+        "rsi_1d": {symbol.strip().upper(): fila for symbol, fila in rsi_1d.items()},
+        "tracking": {symbol.strip().upper(): fila for symbol, fila in tracking.items()},
+    }
+
+def _imprimir_tiempos(tiempos):
+    print("⏱️ Tiempos por etapa:")
+    for nombre, segundos in tiempos.items():
+        print(f"   {nombre:<22} {segundos:>8.2f}s")
+
+def correr_pipeline(etapas=None, nombre="pipeline de scans", progreso=None):
+    """
+    Corre las etapas (por defecto todas) en una pasada.
+    Retorna {"tiempos": {...}, "simbolos": n, "alertas": n, "escrituras": {tabla: {"insertados", "actualizados"}}}
+    o None si falló. `progreso` (Progreso de src/jobs.py) sigue la pasada desde un job de la
+    API; en ese caso un error se propaga para que el job quede en error.
+    """
+    etapas = [etapa() for etapa in ETAPAS] if etapas is None else etapas
+    init_db()
+    db = SessionLocal()
+    tiempos = {}
+    marca = time.perf_counter()
+
+    def medir(fase):
+        nonlocal marca
+        ahora = time.perf_counter()
+        tiempos[fase] = tiempos.get(fase, 0.0) + ahora - marca
+        marca = ahora
+
+    try:
+        with cache_de_ejecucion(nombre):
+            # 1. Tablas de entrada, una consulta por tabla
+            datos = _cargar_datos(db)
+            universo = set()
+            for etapa in etapas:
+                universo |= etapa.universo(datos)
+            symbols = sorted(universo)
+            print(f"[{datetime.datetime.now()}] Inicio ejecución ({nombre}) | Total a procesar: {len(symbols)}")
+            if not symbols:
+                if config.PRINT_OUTPUT:
+                    print("No hay stocks para analizar.")
+                print(f"[{datetime.datetime.now()}] Finalización ejecución")
+                return {"tiempos": tiempos, "simbolos": 0, "alertas": 0, "escrituras": {}}
+            if progreso is not None:
+                progreso.iniciar(len(symbols))
+
+            workers = workers_scan()
+            # Modo bulk: si todas las etapas lo soportan, el universo se evalúa como un panel
+            por_panel = config.DAILY_BULK_MODE and all(etapa.por_panel for etapa in etapas)
+            # El estado incremental vive en este proceso: solo sin pool de workers
+            estados = cargar_estados(db) if config.INDICADORES_INCREMENTALES and workers == 1 and not por_panel else None
+            medir("carga")
+
+            # 2. Precio actual (snapshot) para las etapas que lo usan
+            precios = obtener_ultimos_precios(symbols) if any(etapa.usa_precio for etapa in etapas) else {}
+            medir("precios")
+
+            # 3. Velas 1D una vez por símbolo y todas las etapas sobre ellas
+            resultados = {etapa.nombre: {} for etapa in etapas}
+            tiempos_etapas = {etapa.nombre: 0.0 for etapa in etapas}
+            if por_panel:
+                # El backfill de grouped daily puede tardar más que JOBS_TIMEOUT_INACTIVO:
+                # cada día sincronizado cuenta como progreso del job
+                panel = panel_1d(symbols, al_avanzar=(lambda: progreso.guardar(forzar=True)) if progreso is not None else None)
+                medir("velas")
+                for etapa in etapas:
+                    inicio = time.perf_counter()
+                    resultados[etapa.nombre] = etapa.evaluar_panel(panel, datos)
+                    tiempos_etapas[etapa.nombre] = time.perf_counter() - inicio
+                if progreso is not None:
+                    progreso.avanzar(len(symbols))
+                medir("etapas")
+            else:
+                extras = {
+                    symbol: {
+                        "en_lista": symbol in datos["lista"],
+                        "rsi_1d": datos["rsi_1d"].get(symbol),
+                        "tracking": datos["tracking"].get(symbol),
+                        "ultimo": precios.get(symbol),
+                    }
+                    for symbol in symbols
+                }
+                if config.PRINT_OUTPUT and workers > 1:
+                    print(f"Calculando indicadores con {workers} workers")
+                for symbol, resultado, error in mapear_velas(iterar_velas_1d(symbols), evaluar_simbolo, extras, workers, etapas=etapas, estados=estados):
+                    if error:
+                        print(f"Error procesando {symbol}: {error}")
+                        if progreso is not None:
+                            progreso.avanzar(errores=1)
+                        continue
+                    por_etapa, segundos = resultado
+                    for etapa in etapas:
+                        tiempos_etapas[etapa.nombre] += segundos[etapa.nombre]
+                        if por_etapa[etapa.nombre] is not None:
+                            resultados[etapa.nombre][symbol] = por_etapa[etapa.nombre]
+                    if progreso is not None:
+                        progreso.avanzar()
+                medir("velas + etapas")
+            for etapa in etapas:
+                tiempos[f"  etapa {etapa.nombre}"] = tiempos_etapas[etapa.nombre]
+
+            # 4. Escrituras por tabla con las filas de todas las etapas. Los símbolos que ya
+            # estaban solo se actualizan (uno borrado durante la pasada no vuelve a aparecer);
+            # el upsert queda para los nuevos (hits RSI_1D, cruces alcistas nuevos)
+            escrituras = {}
+            alertas = [(etapa.canal, etapa.cerrar(datos, resultados[etapa.nombre], escrituras)) for etapa in etapas]
+            if estados is not None:
+                guardar_estados(db, estados)
+            escritas = {}
+            for modelo, (actualizables, existentes, filas) in escrituras.items():
+                nuevas, cambios = [], []
+                for symbol, fila in filas.items():
+                    if symbol.strip().upper() in existentes:
+                        cambios.append({col: fila[col] for col in ["symbol"] + actualizables})
+                    else:
+                        nuevas.append(fila)
+                resultado = {
+                    "insertados": upsert_por_simbolo(db, modelo, nuevas, actualizables, existentes=existentes)["insertados"],
+                    "actualizados": actualizar_por_simbolo(db, modelo, cambios),
+                }
+                escritas[modelo.__tablename__] = resultado
+                if config.PRINT_OUTPUT:
+                    print(f"{modelo.__tablename__}: {resultado['insertados']} nuevos, {resultado['actualizados']} actualizados")
+            db.commit()
+            if progreso is not None:
+                progreso.avanzar(0, hits=sum(resultado["insertados"] for resultado in escritas.values()))
+            medir("escritura")
+
+            # 5. Cada canal de alertas una vez
+            enviadas = 0
+            for canal, mensajes in alertas:
+                if canal and mensajes:
+                    enviar_alerta(*canal, mensajes)
+                    enviadas += len(mensajes)
+            medir("alertas")
+
+        print(f"[{datetime.datetime.now()}] Finalización ejecución")
+        _imprimir_tiempos(tiempos)
+        return {"tiempos": tiempos, "simbolos": len(symbols), "alertas": enviadas, "escrituras": escritas}
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error fatal en el pipeline: {e}")
+        if progreso is not None:
+            raise
+        return None
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    correr_pipeline()